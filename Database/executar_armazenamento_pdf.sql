@@ -0,0 +1,18 @@
+-- Script para mover os PDFs (FISPQ) para o armazenamento de arquivos
+-- Execute este script antes de rodar: python backend/migrar_pdfs.py
+
+USE laboratorio;
+
+-- O PDF passa a ser referenciado pelo hash SHA-256 do conteúdo
+ALTER TABLE materiais
+    ADD COLUMN pdf_hash CHAR(64) NULL,
+    ADD COLUMN pdf_tamanho BIGINT NULL;
+
+CREATE INDEX idx_materiais_pdf_hash ON materiais(pdf_hash);
+
+-- A coluna arquivo_pdf é mantida apenas para os registros ainda não migrados.
+-- Depois da migração (e de conferir que SELECT COUNT(*) FROM materiais
+-- WHERE arquivo_pdf IS NOT NULL retorna 0) ela pode ser removida:
+-- ALTER TABLE materiais DROP COLUMN arquivo_pdf;
+
+SELECT 'Colunas de armazenamento de PDF criadas com sucesso!' as resultado;
@@ -0,0 +1,18 @@
+-- Índices para a busca de materiais (/materiais/codigo/<codigo> e /materiais/busca)
+-- Execute este script no seu banco de dados MySQL (8.0+, parser ngram)
+
+USE laboratorio;
+
+-- Código vazio passa a ser NULL para não violar o índice único
+UPDATE materiais SET codigo_material = NULL WHERE codigo_material = '';
+
+-- Antes de criar o índice único, confira se não há códigos repetidos:
+-- SELECT codigo_material, COUNT(*) FROM materiais
+-- WHERE codigo_material IS NOT NULL GROUP BY codigo_material HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX uq_materiais_codigo_material ON materiais(codigo_material);
+
+-- Busca por trechos de nome e fabricante (mantidos automaticamente pelo InnoDB)
+CREATE FULLTEXT INDEX ft_materiais_nome ON materiais(nome) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ft_materiais_fabricante ON materiais(fabricante) WITH PARSER ngram;
+
+SELECT 'Índices de busca de materiais criados com sucesso!' as resultado;
@@ -0,0 +1,28 @@
+-- Script para criar os contadores de manutenções nos equipamentos
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- Mantidos pelas rotas de manutenção; a listagem de equipamentos não
+-- precisa mais agregar a tabela manutencoes
+ALTER TABLE equipamentos
+    ADD COLUMN total_manutencoes INT NOT NULL DEFAULT 0,
+    ADD COLUMN manutencoes_pendentes INT NOT NULL DEFAULT 0;
+
+-- Preenche os contadores com as manutenções existentes
+-- (o mesmo que `python contadores.py`)
+UPDATE equipamentos e
+LEFT JOIN (
+    SELECT equipamento_id,
+           COUNT(*) AS total,
+           SUM(status = 'agendada') AS pendentes
+    FROM manutencoes
+    GROUP BY equipamento_id
+) m ON m.equipamento_id = e.id
+SET e.total_manutencoes = COALESCE(m.total, 0),
+    e.manutencoes_pendentes = COALESCE(m.pendentes, 0);
+
+-- Listagem de equipamentos ordenada por nome
+CREATE INDEX idx_equipamentos_nome ON equipamentos(nome, id);
+
+SELECT 'Contadores de manutenções criados com sucesso!' as resultado;
@@ -0,0 +1,19 @@
+-- Script para criar o registro de alterações usado pelo feed /events
+-- Execute este script no seu banco de dados MySQL (depois de executar_versoes_tabelas.sql)
+
+USE laboratorio;
+
+-- Um evento por registro alterado (registro_id NULL: a tabela inteira,
+-- ex.: importação). O backend lê os novos pelo id e remove os antigos
+-- após EVENTOS_RETENCAO_HORAS.
+CREATE TABLE IF NOT EXISTS eventos_alteracoes (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    tabela VARCHAR(64) NOT NULL,
+    registro_id INT NULL,
+    operacao ENUM('criacao', 'atualizacao', 'exclusao') NOT NULL,
+    versao BIGINT NOT NULL,
+    data_evento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_eventos_data (data_evento)
+);
+
+SELECT 'Registro de alterações criado com sucesso!' as resultado;
@@ -0,0 +1,22 @@
+-- Script para criar a fila de envio de emails
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+CREATE TABLE IF NOT EXISTS fila_emails (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    destinatario VARCHAR(255) NOT NULL,
+    assunto VARCHAR(255) NOT NULL,
+    corpo MEDIUMTEXT NOT NULL,
+    status ENUM('pendente', 'enviando', 'enviado', 'falhou') DEFAULT 'pendente',
+    tentativas INT DEFAULT 0,
+    ultimo_erro TEXT,
+    proxima_tentativa TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_envio TIMESTAMP NULL
+);
+
+-- O worker busca por status + proxima_tentativa
+CREATE INDEX idx_fila_emails_status_proxima ON fila_emails(status, proxima_tentativa);
+
+SELECT 'Fila de emails criada com sucesso!' as resultado;
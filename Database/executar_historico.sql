@@ -0,0 +1,37 @@
+-- Script para ajustar o histórico de equipamentos e manutenções
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- Novo tipo de ação para exclusões
+ALTER TABLE historico_manutencoes
+    MODIFY tipo_acao ENUM('criacao', 'atualizacao', 'conclusao', 'cancelamento', 'exclusao') NOT NULL;
+
+-- O histórico é uma trilha de auditoria: precisa sobreviver à exclusão do
+-- equipamento ou da manutenção (e registrar a própria exclusão). Remove as
+-- chaves estrangeiras, mantendo os índices das colunas.
+SET @fk_equipamento := (
+    SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'historico_manutencoes'
+      AND COLUMN_NAME = 'equipamento_id' AND REFERENCED_TABLE_NAME IS NOT NULL
+    LIMIT 1
+);
+SET @sql := IF(@fk_equipamento IS NULL, 'SELECT 1',
+               CONCAT('ALTER TABLE historico_manutencoes DROP FOREIGN KEY ', @fk_equipamento));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @fk_manutencao := (
+    SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'historico_manutencoes'
+      AND COLUMN_NAME = 'manutencao_id' AND REFERENCED_TABLE_NAME IS NOT NULL
+    LIMIT 1
+);
+SET @sql := IF(@fk_manutencao IS NULL, 'SELECT 1',
+               CONCAT('ALTER TABLE historico_manutencoes DROP FOREIGN KEY ', @fk_manutencao));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SELECT 'Histórico ajustado com sucesso!' as resultado;
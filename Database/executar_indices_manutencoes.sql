@@ -0,0 +1,16 @@
+-- Script para criar os índices da listagem paginada de manutenções
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- /manutencoes ordena por (data_agendada, id). Sem filtros, ou filtrando
+-- apenas pela data, usa idx_manutencoes_data_agendada (o InnoDB já guarda
+-- o id em todo índice secundário)
+
+-- Combinação mais comum da tela: status + janela de datas
+CREATE INDEX idx_manutencoes_status_data ON manutencoes(status, data_agendada, id);
+
+-- Manutenções de um equipamento (/manutencoes/equipamento/:id no frontend)
+CREATE INDEX idx_manutencoes_equipamento_data ON manutencoes(equipamento_id, data_agendada, id);
+
+SELECT 'Índices de manutenções criados com sucesso!' as resultado;
@@ -0,0 +1,16 @@
+-- Índices para a listagem paginada de materiais (/materiaisList)
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- Paginação por cursor: ORDER BY nome, id
+CREATE INDEX idx_materiais_nome_id ON materiais(nome, id);
+
+-- Filtros combinados com a ordenação por nome
+CREATE INDEX idx_materiais_tipo_nome ON materiais(tipo, nome, id);
+CREATE INDEX idx_materiais_fabricante_nome ON materiais(fabricante, nome, id);
+
+-- Filtro por faixa de validade
+CREATE INDEX idx_materiais_validade ON materiais(validade);
+
+SELECT 'Índices de materiais criados com sucesso!' as resultado;
@@ -0,0 +1,15 @@
+-- Script para guardar o carimbo da última geração completa dos relatórios
+-- Execute este script no seu banco de dados MySQL (depois de executar_relatorios_equipamentos.sql)
+
+USE laboratorio;
+
+-- Dia e versões de equipamentos/manutencoes usados na última geração
+-- completa. Um processo que sobe (ou a verificação periódica) só regera
+-- tudo se o carimbo atual for diferente deste.
+CREATE TABLE IF NOT EXISTS relatorios_carimbo (
+    id TINYINT PRIMARY KEY,
+    carimbo VARCHAR(255) NOT NULL,
+    data_geracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+SELECT 'Carimbo dos relatórios criado com sucesso!' as resultado;
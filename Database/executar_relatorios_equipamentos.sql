@@ -0,0 +1,14 @@
+-- Script para preparar os relatórios pré-calculados de equipamentos
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- Relatórios do parque inteiro são gravados com equipamento_id NULL
+-- (a chave estrangeira com ON DELETE CASCADE continua valendo)
+ALTER TABLE relatorios_equipamentos MODIFY equipamento_id INT NULL;
+
+-- Último snapshot de um relatório: WHERE equipamento_id <=> ? AND
+-- tipo_relatorio = ? ORDER BY id DESC LIMIT 1, uma leitura pelo índice
+CREATE INDEX idx_relatorios_equipamento_tipo ON relatorios_equipamentos(equipamento_id, tipo_relatorio, id);
+
+SELECT 'Relatórios de equipamentos preparados com sucesso!' as resultado;
@@ -0,0 +1,29 @@
+-- Script para o controle de alterações usado pela sincronização incremental (/sync)
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- materiais passa a registrar a data da última alteração, como
+-- equipamentos e manutencoes (os registros existentes ficam com a data atual)
+ALTER TABLE materiais
+    ADD COLUMN data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+-- /sync lê as linhas alteradas desde o token por faixa de data_atualizacao
+-- (o InnoDB já guarda o id em todo índice secundário)
+CREATE INDEX idx_materiais_atualizacao ON materiais(data_atualizacao);
+CREATE INDEX idx_equipamentos_atualizacao ON equipamentos(data_atualizacao);
+CREATE INDEX idx_manutencoes_atualizacao ON manutencoes(data_atualizacao);
+
+-- Registros excluídos (inclusive as manutenções excluídas em cascata com o
+-- equipamento). O backend remove os antigos após SYNC_RETENCAO_DIAS; um
+-- token mais antigo que isso recebe a carga completa.
+CREATE TABLE IF NOT EXISTS registros_excluidos (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    tabela VARCHAR(64) NOT NULL,
+    registro_id INT NOT NULL,
+    data_exclusao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_excluidos_tabela_data (tabela, data_exclusao),
+    INDEX idx_excluidos_data (data_exclusao)
+);
+
+SELECT 'Controle de sincronização criado com sucesso!' as resultado;
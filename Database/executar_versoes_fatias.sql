@@ -0,0 +1,15 @@
+-- Script para dividir a versão de cada tabela em fatias
+-- Execute este script no seu banco de dados MySQL (depois de executar_versoes_tabelas.sql)
+
+USE laboratorio;
+
+-- Cada transação incrementa uma fatia sorteada (VERSOES_FATIAS no backend)
+-- e a versão da tabela é a soma das fatias: escritas simultâneas na mesma
+-- tabela não esperam mais pelo bloqueio de uma única linha até o commit.
+-- As linhas existentes viram a fatia 0 e a versão atual é preservada.
+ALTER TABLE versoes_tabelas
+    ADD COLUMN fatia SMALLINT NOT NULL DEFAULT 0 AFTER tabela,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (tabela, fatia);
+
+SELECT 'Fatias de versão criadas com sucesso!' as resultado;
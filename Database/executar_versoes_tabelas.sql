@@ -0,0 +1,20 @@
+-- Script para criar o controle de versão dos dados por tabela
+-- Execute este script no seu banco de dados MySQL
+
+USE laboratorio;
+
+-- Cada alteração em materiais, equipamentos ou manutencoes incrementa a
+-- versão da tabela; exportações e caches usam a versão como carimbo
+CREATE TABLE IF NOT EXISTS versoes_tabelas (
+    tabela VARCHAR(64) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO versoes_tabelas (tabela, versao) VALUES
+('materiais', 0),
+('equipamentos', 0),
+('manutencoes', 0)
+ON DUPLICATE KEY UPDATE tabela = tabela;
+
+SELECT 'Tabela de versões criada com sucesso!' as resultado;
@@ -1,52 +1,96 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
-from db import get_connection
+from db import get_connection, get_pool_stats
 import csv
+import hashlib
 import io
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import os
 import mysql.connector
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from email_config import EMAIL_CONFIG
+from fila_email import enfileirar_email, obter_status_email, garantir_worker
+from armazenamento_pdf import obter_armazenamento, ArquivoInvalido
+from cache_respostas import em_cache
+import consultas
+import repositorio
+from consultas import ParametroInvalido
+from serializacao import ProvedorJSON, formato_lista, codificar_lista
+from compressao import comprimir_resposta
+from versoes import incrementar_versao
+from eventos import registrar_alteracao, transmitir, reservar_conexao, liberar_conexao
+import sincronizacao
+from sincronizacao import registrar_exclusao
+from importacao import importar_csv, ImportacaoInvalida
+from contadores import ajustar_contadores, pendente
+from agendador import garantir_agendador
+import historico
+import relatorios
+from exportacao import (solicitar_exportacao, obter_situacao, interpretar_id, caminho_exportacao,
+                        mimetype_exportacao, FormatoIndisponivel)
 
 app = Flask(__name__)
+app.json = ProvedorJSON(app)
 CORS(app)
+app.after_request(comprimir_resposta)
 
 # Configuração para upload de arquivos
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-def enviar_email(destinatario, assunto, corpo):
-    """
-    Função para enviar email usando SMTP
+TAMANHO_MAXIMO_PDF = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = TAMANHO_MAXIMO_PDF
+
+@app.before_request
+def iniciar_workers():
+    # Workers em segundo plano são iniciados no processo que atende as
+    # requisições (inclusive em cada worker de um servidor multiprocesso)
+    garantir_worker()
+    garantir_agendador()
+    relatorios.garantir_gerador()
+
+
+def montar_solicitacao(mensagem):
+    """Assunto e corpo HTML do email de solicitação ao fornecedor."""
+    assunto = "Solicitação de Material/Equipamento - Sistema de Laboratório"
+
+    corpo_html = f"""
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #4ca1af; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
+            .content {{ background-color: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px; }}
+            .message {{ background-color: white; padding: 15px; border-left: 4px solid #4ca1af; margin: 15px 0; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>Sistema de Laboratório</h2>
+                <p>Solicitação de Material/Equipamento</p>
+            </div>
+            <div class="content">
+                <p>Prezado(a) Fornecedor,</p>
+                <p>Recebemos uma solicitação através do nosso sistema de gestão de laboratório:</p>
+                
+                <div class="message">
+                    <strong>Mensagem:</strong><br>
+                    {mensagem.replace('\n', '<br>')}
+                </div>
+                
+                <p>Por favor, entre em contato conosco para mais detalhes sobre esta solicitação.</p>
+                
+                <p>Atenciosamente,<br>
+                <strong>Sistema de Laboratório</strong></p>
+            </div>
+            <div class="footer">
+                <p>Este é um email automático do sistema. Por favor, não responda diretamente a este email.</p>
+            </div>
+        </div>
+    </body>
+    </html>
     """
-    try:
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = f"{EMAIL_CONFIG['sender_name']} <{EMAIL_CONFIG['sender_email']}>"
-        msg['To'] = destinatario
-        msg['Subject'] = assunto
-        
-        # Adicionar corpo do email
-        msg.attach(MIMEText(corpo, 'html', 'utf-8'))
-        
-        # Conectar ao servidor SMTP
-        server = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-        server.starttls()  # Habilitar criptografia TLS
-        server.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
-        
-        # Enviar email
-        text = msg.as_string()
-        server.sendmail(EMAIL_CONFIG['sender_email'], destinatario, text)
-        server.quit()
-        
-        return True, "Email enviado com sucesso!"
-        
-    except Exception as e:
-        return False, f"Erro ao enviar email: {str(e)}"
+    return assunto, corpo_html
 
 
 @app.route("/enviar-solicitacao", methods=["POST"])
@@ -62,62 +106,37 @@ def enviar_solicitacao():
         if not email_destino or not mensagem:
             return jsonify({"error": "Email destino e mensagem são obrigatórios"}), 400
         
-        # Criar assunto e corpo do email
-        assunto = "Solicitação de Material/Equipamento - Sistema de Laboratório"
-        
-        corpo_html = f"""
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #4ca1af; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
-                .content {{ background-color: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px; }}
-                .message {{ background-color: white; padding: 15px; border-left: 4px solid #4ca1af; margin: 15px 0; }}
-                .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>Sistema de Laboratório</h2>
-                    <p>Solicitação de Material/Equipamento</p>
-                </div>
-                <div class="content">
-                    <p>Prezado(a) Fornecedor,</p>
-                    <p>Recebemos uma solicitação através do nosso sistema de gestão de laboratório:</p>
-                    
-                    <div class="message">
-                        <strong>Mensagem:</strong><br>
-                        {mensagem.replace('\n', '<br>')}
-                    </div>
-                    
-                    <p>Por favor, entre em contato conosco para mais detalhes sobre esta solicitação.</p>
-                    
-                    <p>Atenciosamente,<br>
-                    <strong>Sistema de Laboratório</strong></p>
-                </div>
-                <div class="footer">
-                    <p>Este é um email automático do sistema. Por favor, não responda diretamente a este email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Enviar email
-        sucesso, resultado = enviar_email(email_destino, assunto, corpo_html)
+        assunto, corpo_html = montar_solicitacao(mensagem)
+
+        # O envio é feito pelo worker da fila; a requisição só registra o job
+        email_id = enfileirar_email(email_destino, assunto, corpo_html)
         
-        if sucesso:
-            return jsonify({"message": resultado}), 200
-        else:
-            return jsonify({"error": resultado}), 500
+        return jsonify({"message": "Email enfileirado para envio", "id": email_id}), 202
             
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
 
+@app.route("/emails/<int:id>", methods=["GET"])
+def status_email(id):
+    """
+    Situação de um email da fila (pendente, enviando, enviado ou falhou)
+    """
+    try:
+        email = obter_status_email(id)
+
+        if email:
+            for campo in ('proxima_tentativa', 'data_criacao', 'data_envio'):
+                if email[campo]:
+                    email[campo] = email[campo].isoformat()
+            return jsonify(email), 200
+        else:
+            return jsonify({"error": "Email não encontrado"}), 404
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/login", methods=["POST"])
 def login():
     data = request.json
@@ -158,7 +177,7 @@ def adicionar_material():
         # Verificar se é um formulário multipart (com arquivo)
         if request.content_type and 'multipart/form-data' in request.content_type:
             # Obter dados do formulário
-            codigo_material = request.form.get("codigo_material", "")
+            codigo_material = request.form.get("codigo_material", "") or None
             nome = request.form.get("nome")
             tipo = request.form.get("tipo")
             fabricante = request.form.get("fabricante")
@@ -170,7 +189,8 @@ def adicionar_material():
             estoque_minimo = request.form.get("estoque_minimo")
             
             # Obter arquivo PDF se existir
-            arquivo_pdf = None
+            pdf_hash = None
+            pdf_tamanho = None
             if 'arquivo_pdf' in request.files:
                 file = request.files['arquivo_pdf']
                 if file and file.filename != '':
@@ -178,28 +198,18 @@ def adicionar_material():
                     if file.content_type != 'application/pdf':
                         return jsonify({"error": "Apenas arquivos PDF são permitidos"}), 400
                     
-                    # Validar tamanho do arquivo (máximo 16MB)
-                    file.seek(0, 2)  # Ir para o final do arquivo
-                    file_size = file.tell()
-                    file.seek(0)  # Voltar para o início
-                    
-                    if file_size > 16 * 1024 * 1024:  # 16MB
-                        return jsonify({"error": "Arquivo muito grande. Tamanho máximo: 16MB"}), 400
-                    
                     try:
-                        # Ler o arquivo como bytes
-                        arquivo_pdf = file.read()
-                        
-                        # Validar se o arquivo não está vazio
-                        if len(arquivo_pdf) == 0:
-                            return jsonify({"error": "Arquivo PDF está vazio"}), 400
-                            
+                        # Copiar em blocos para o armazenamento, validando assinatura
+                        # e tamanho; a tabela guarda só o hash
+                        pdf_hash, pdf_tamanho = obter_armazenamento().salvar_stream(file.stream, TAMANHO_MAXIMO_PDF)
+                    except ArquivoInvalido as e:
+                        return jsonify({"error": str(e)}), 400
                     except Exception as e:
                         return jsonify({"error": f"Erro ao ler arquivo PDF: {str(e)}"}), 400
         else:
             # Dados JSON (sem arquivo)
             data = request.json
-            codigo_material = data.get("codigo_material", "")
+            codigo_material = data.get("codigo_material", "") or None
             nome = data.get("nome")
             tipo = data.get("tipo")
             fabricante = data.get("fabricante")
@@ -209,11 +219,12 @@ def adicionar_material():
             preco = data.get("preco")
             estoque_atual = data.get("estoque_atual")
             estoque_minimo = data.get("estoque_minimo")
-            arquivo_pdf = None
+            pdf_hash = None
+            pdf_tamanho = None
 
         query = """
-        INSERT INTO materiais (codigo_material, nome, tipo, fabricante, quantidade, unidade, validade, preco, estoque_atual, estoque_minimo, arquivo_pdf)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO materiais (codigo_material, nome, tipo, fabricante, quantidade, unidade, validade, preco, estoque_atual, estoque_minimo, pdf_hash, pdf_tamanho)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         values = (
             codigo_material,
@@ -226,14 +237,20 @@ def adicionar_material():
             preco,
             estoque_atual, 
             estoque_minimo,
-            arquivo_pdf
+            pdf_hash,
+            pdf_tamanho
         )
 
         cursor.execute(query, values)
+        material_id = cursor.lastrowid
+        incrementar_versao(cursor, 'materiais')
+        registrar_alteracao(cursor, 'materiais', 'criacao', material_id)
         conn.commit()
 
         return jsonify({"message": "Material inserido com sucesso!"}), 201
 
+    except mysql.connector.IntegrityError:
+        return jsonify({"error": "Já existe um material com este código"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -242,60 +259,36 @@ def adicionar_material():
         conn.close()
 
 
+def _resposta_lista(dados, formato, chave=None):
+    """Resposta de uma listagem no formato pedido (?formato=)."""
+    corpo, mimetype = codificar_lista(app.json, dados, formato, chave)
+    return Response(corpo, mimetype=mimetype)
+
+
 @app.route("/materiaisList", methods=["GET"])
+@em_cache('materiais')
 def listar_materiais():
+    """
+    Lista materiais ordenados por nome, paginados por cursor (nome, id).
+
+    Parâmetros: limite, cursor (proximo_cursor da página anterior), tipo,
+    fabricante, validade_de, validade_ate, estoque_baixo=1,
+    incluir_total=1 (acrescenta a contagem total com os mesmos filtros),
+    fields (campos retornados) e formato (json, colunar ou msgpack).
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)  # retorna dados em formato de dicionário
+        plano = consultas.listar_materiais(request.args)
+        formato = formato_lista(request.args)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except FormatoIndisponivel as e:
+        return jsonify({"error": str(e)}), 501
 
-        # Consulta mais específica para evitar problemas com campos nulos
-        query = """
-            SELECT 
-                id, 
-                codigo_material, 
-                nome, 
-                tipo, 
-                fabricante, 
-                quantidade, 
-                unidade, 
-                validade, 
-                preco, 
-                estoque_atual, 
-                estoque_minimo,
-                CASE 
-                    WHEN arquivo_pdf IS NOT NULL THEN 1 
-                    ELSE 0 
-                END as tem_pdf
-            FROM materiais 
-            ORDER BY nome ASC
-        """
-        cursor.execute(query)
-        materiais = cursor.fetchall()
-
-        # Converter os dados para garantir compatibilidade
-        materiais_processados = []
-        for material in materiais:
-            try:
-                material_processado = {
-                    'id': material['id'],
-                    'codigo_material': material['codigo_material'] if material['codigo_material'] else '',
-                    'nome': material['nome'] if material['nome'] else '',
-                    'tipo': material['tipo'] if material['tipo'] else '',
-                    'fabricante': material['fabricante'] if material['fabricante'] else '',
-                    'quantidade': float(material['quantidade']) if material['quantidade'] else 0,
-                    'unidade': material['unidade'] if material['unidade'] else '',
-                    'validade': material['validade'].isoformat() if material['validade'] else None,
-                    'preco': float(material['preco']) if material['preco'] else 0,
-                    'estoque_atual': float(material['estoque_atual']) if material['estoque_atual'] else 0,
-                    'estoque_minimo': float(material['estoque_minimo']) if material['estoque_minimo'] else 0,
-                    'tem_pdf': bool(material['tem_pdf'])
-                }
-                materiais_processados.append(material_processado)
-            except Exception as e:
-                # Continuar processando outros materiais
-                continue
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
 
-        return jsonify(materiais_processados), 200
+        return _resposta_lista(consultas.executar(cursor, plano), formato, "materiais")
 
     except mysql.connector.Error as e:
         return jsonify({"error": f"Erro de conexão com banco de dados: {str(e)}"}), 500
@@ -310,62 +303,17 @@ def listar_materiais():
 
 
 @app.route("/materiais/codigo/<codigo>", methods=["GET"])
+@em_cache('materiais')
 def buscar_material_por_codigo(codigo):
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        # Primeiro, tenta buscar por código exato
-        cursor.execute("""
-            SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade, 
-                   validade, preco, estoque_atual, estoque_minimo,
-                   CASE WHEN arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
-            FROM materiais 
-            WHERE codigo_material = %s
-        """, (codigo,))
-        
-        material = cursor.fetchone()
-
-        # Se não encontrou por código exato, busca por nome (case insensitive)
-        if not material:
-            cursor.execute("""
-                SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade, 
-                       validade, preco, estoque_atual, estoque_minimo,
-                       CASE WHEN arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
-                FROM materiais 
-                WHERE LOWER(nome) LIKE LOWER(%s)
-                ORDER BY nome ASC
-                LIMIT 1
-            """, (f"%{codigo}%",))
-            material = cursor.fetchone()
-
-        # Se ainda não encontrou, busca por fabricante
-        if not material:
-            cursor.execute("""
-                SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade, 
-                       validade, preco, estoque_atual, estoque_minimo,
-                       CASE WHEN arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
-                FROM materiais 
-                WHERE LOWER(fabricante) LIKE LOWER(%s)
-                ORDER BY nome ASC
-                LIMIT 1
-            """, (f"%{codigo}%",))
-            material = cursor.fetchone()
+        # Código exato primeiro; senão, o material mais relevante por nome/fabricante
+        materiais = consultas.executar(cursor, consultas.buscar_materiais(codigo.strip(), 1))
 
-        if material:
-            # Converter tipos de dados para garantir serialização JSON
-            if material['validade']:
-                material['validade'] = material['validade'].isoformat()
-            if material['preco'] is not None:
-                material['preco'] = float(material['preco'])
-            if material['quantidade'] is not None:
-                material['quantidade'] = float(material['quantidade'])
-            if material['estoque_atual'] is not None:
-                material['estoque_atual'] = float(material['estoque_atual'])
-            if material['estoque_minimo'] is not None:
-                material['estoque_minimo'] = float(material['estoque_minimo'])
-            
-            return jsonify(material), 200
+        if materiais:
+            return jsonify(materiais[0]), 200
         else:
             return jsonify({"error": "Material não encontrado"}), 404
 
@@ -381,35 +329,56 @@ def buscar_material_por_codigo(codigo):
             conn.close()
 
 
+@app.route("/materiais/busca", methods=["GET"])
+@em_cache('materiais')
+def buscar_materiais():
+    """
+    Lista os materiais que correspondem a ?q= (código, nome ou fabricante),
+    ordenados por relevância. Parâmetro opcional: limite (padrão 10).
+    """
+    termo = request.args.get("q", "").strip()
+    if not termo:
+        return jsonify({"error": "Parâmetro 'q' é obrigatório"}), 400
+    try:
+        limite = min(max(int(request.args.get("limite", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'limite' inválido"}), 400
+
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        return jsonify(consultas.executar(cursor, consultas.buscar_materiais(termo, limite))), 200
+
+    except mysql.connector.Error as e:
+        return jsonify({"error": f"Erro de conexão com banco de dados: {str(e)}"}), 500
+    except Exception as e:
+        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
+
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+
+
 @app.route("/materiais/<int:id>", methods=["GET"])
+@em_cache('materiais')
 def buscar_material_por_id(id):
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         # Query modificada para não retornar o arquivo_pdf diretamente
         query = """
         SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade, 
                validade, preco, estoque_atual, estoque_minimo,
-               CASE WHEN arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
+               CASE WHEN pdf_hash IS NOT NULL OR arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
         FROM materiais WHERE id = %s
         """
-        cursor.execute(query, (id,))
-        material = cursor.fetchone()
+        material = repositorio.buscar_um(cursor, query, (id,), repositorio.MATERIAL)
 
         if material:
-            # Converter tipos de dados para garantir serialização JSON
-            if material['validade']:
-                material['validade'] = material['validade'].isoformat()
-            if material['preco'] is not None:
-                material['preco'] = float(material['preco'])
-            if material['quantidade'] is not None:
-                material['quantidade'] = float(material['quantidade'])
-            if material['estoque_atual'] is not None:
-                material['estoque_atual'] = float(material['estoque_atual'])
-            if material['estoque_minimo'] is not None:
-                material['estoque_minimo'] = float(material['estoque_minimo'])
-            
             return jsonify(material), 200
         else:
             return jsonify({"error": "Material não encontrado"}), 404
@@ -431,7 +400,7 @@ def atualizar_material(id):
         # Verificar se é um formulário multipart (com arquivo)
         if request.content_type and 'multipart/form-data' in request.content_type:
             # Obter dados do formulário
-            codigo_material = request.form.get("codigo_material", "")
+            codigo_material = request.form.get("codigo_material", "") or None
             nome = request.form.get("nome")
             tipo = request.form.get("tipo")
             fabricante = request.form.get("fabricante")
@@ -443,19 +412,20 @@ def atualizar_material(id):
             estoque_minimo = request.form.get("estoque_minimo")
             
             # Obter arquivo PDF se existir
-            arquivo_pdf = None
+            pdf_hash = None
             if 'arquivo_pdf' in request.files:
                 file = request.files['arquivo_pdf']
                 if file and file.filename != '' and file.content_type == 'application/pdf':
                     try:
-                        # Ler o arquivo como bytes
-                        arquivo_pdf = file.read()
+                        pdf_hash, pdf_tamanho = obter_armazenamento().salvar_stream(file.stream, TAMANHO_MAXIMO_PDF)
+                    except ArquivoInvalido as e:
+                        return jsonify({"error": str(e)}), 400
                     except Exception as e:
                         return jsonify({"error": f"Erro ao ler arquivo PDF: {str(e)}"}), 400
         else:
             # Dados JSON (sem arquivo)
             data = request.json
-            codigo_material = data.get("codigo_material", "")
+            codigo_material = data.get("codigo_material", "") or None
             nome = data.get("nome")
             tipo = data.get("tipo")
             fabricante = data.get("fabricante")
@@ -465,14 +435,15 @@ def atualizar_material(id):
             preco = data.get("preco")
             estoque_atual = data.get("estoque_atual")
             estoque_minimo = data.get("estoque_minimo")
-            arquivo_pdf = None
+            pdf_hash = None
 
         # Se há arquivo PDF, atualizar incluindo o arquivo
-        if arquivo_pdf is not None:
+        if pdf_hash is not None:
             query = """
             UPDATE materiais 
             SET codigo_material = %s, nome = %s, tipo = %s, fabricante = %s, quantidade = %s, unidade = %s, 
-                validade = %s, preco = %s, estoque_atual = %s, estoque_minimo = %s, arquivo_pdf = %s
+                validade = %s, preco = %s, estoque_atual = %s, estoque_minimo = %s,
+                pdf_hash = %s, pdf_tamanho = %s, arquivo_pdf = NULL
             WHERE id = %s
             """
             values = (
@@ -486,7 +457,8 @@ def atualizar_material(id):
                 preco,
                 estoque_atual, 
                 estoque_minimo,
-                arquivo_pdf,
+                pdf_hash,
+                pdf_tamanho,
                 id
             )
         else:
@@ -512,13 +484,19 @@ def atualizar_material(id):
             )
 
         cursor.execute(query, values)
+        atualizado = cursor.rowcount > 0
+        if atualizado:
+            incrementar_versao(cursor, 'materiais')
+            registrar_alteracao(cursor, 'materiais', 'atualizacao', id)
         conn.commit()
 
-        if cursor.rowcount > 0:
+        if atualizado:
             return jsonify({"message": "Material atualizado com sucesso!"}), 200
         else:
             return jsonify({"error": "Material não encontrado"}), 404
 
+    except mysql.connector.IntegrityError:
+        return jsonify({"error": "Já existe um material com este código"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -533,23 +511,47 @@ def download_pdf(id):
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("SELECT arquivo_pdf FROM materiais WHERE id = %s", (id,))
+        # O blob só é lido para materiais ainda não migrados para o armazenamento
+        cursor.execute("""
+            SELECT pdf_hash, CASE WHEN pdf_hash IS NULL THEN arquivo_pdf END AS arquivo_pdf
+            FROM materiais WHERE id = %s
+        """, (id,))
         result = cursor.fetchone()
 
-        if result and result['arquivo_pdf']:
+        if result and result['pdf_hash']:
+            # O hash do conteúdo é um ETag forte: PDFs iguais têm o mesmo ETag
+            armazenamento = obter_armazenamento()
+            caminho = armazenamento.caminho_local(result['pdf_hash'])
+            resposta = send_file(
+                caminho if caminho else armazenamento.abrir(result['pdf_hash']),
+                mimetype='application/pdf',
+                as_attachment=True,
+                download_name=f'fispq_material_{id}.pdf',
+                conditional=True,
+                etag=result['pdf_hash']
+            )
+        elif result and result['arquivo_pdf']:
             # Criar um buffer de memória com o arquivo PDF
             pdf_buffer = io.BytesIO(result['arquivo_pdf'])
             pdf_buffer.seek(0)
             
-            return send_file(
+            resposta = send_file(
                 pdf_buffer,
                 mimetype='application/pdf',
                 as_attachment=True,
-                download_name=f'fispq_material_{id}.pdf'
+                download_name=f'fispq_material_{id}.pdf',
+                conditional=True,
+                etag=hashlib.sha256(result['arquivo_pdf']).hexdigest()
             )
         else:
             return jsonify({"error": "Arquivo PDF não encontrado"}), 404
 
+        # O PDF de um material pode ser trocado, então o navegador deve
+        # sempre revalidar (If-None-Match -> 304 quando nada mudou)
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+        return resposta
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -571,6 +573,9 @@ def excluir_material(id):
 
         # Exclui o material
         cursor.execute("DELETE FROM materiais WHERE id = %s", (id,))
+        incrementar_versao(cursor, 'materiais')
+        registrar_alteracao(cursor, 'materiais', 'exclusao', id)
+        registrar_exclusao(cursor, 'materiais', id)
         conn.commit()
 
         return jsonify({"message": "Material excluído com sucesso!"}), 200
@@ -583,32 +588,195 @@ def excluir_material(id):
         conn.close()
 
 
+def _quantidade_decimal(valor):
+    """
+    Converte a quantidade recebida para Decimal com 2 casas (mesma escala da
+    coluna DECIMAL(10,2)), evitando os arredondamentos de float.
+    """
+    try:
+        quantidade = Decimal(str(valor)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("Quantidade inválida")
+    if quantidade <= 0:
+        raise ValueError("Quantidade deve ser maior que zero")
+    return quantidade
+
+
 @app.route("/materiais/<int:id>/baixa", methods=["PATCH"])
 def dar_baixa(id):
     data = request.json
-    quantidade_baixa = float(data.get("quantidade"))
+    try:
+        quantidade_baixa = _quantidade_decimal(data.get("quantidade"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
         conn = get_connection()
         cursor = conn.cursor()
 
-        # Verifica estoque atual
+        # Baixa atômica: o próprio UPDATE confere e desconta o estoque, então
+        # baixas simultâneas no mesmo material não se sobrescrevem
+        cursor.execute("""
+            UPDATE materiais
+            SET estoque_atual = estoque_atual - %s
+            WHERE id = %s AND estoque_atual >= %s
+        """, (quantidade_baixa, id, quantidade_baixa))
+
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT id FROM materiais WHERE id = %s", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "Material não encontrado"}), 404
+            return jsonify({"error": "Quantidade insuficiente no estoque"}), 400
+
+        # A linha continua bloqueada por esta transação até o commit
         cursor.execute("SELECT estoque_atual FROM materiais WHERE id = %s", (id,))
-        result = cursor.fetchone()
-        if not result:
-            return jsonify({"error": "Material não encontrado"}), 404
+        novo_estoque = cursor.fetchone()[0]
+        incrementar_versao(cursor, 'materiais')
+        registrar_alteracao(cursor, 'materiais', 'atualizacao', id)
+        conn.commit()
 
-        estoque_atual = float(result[0])
-        if quantidade_baixa > estoque_atual:
-            return jsonify({"error": "Quantidade insuficiente no estoque"}), 400
+        return jsonify({"message": "Baixa realizada com sucesso", "estoque_atual": float(novo_estoque)}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        cursor.close()
+        conn.close()
 
-        novo_estoque = estoque_atual - quantidade_baixa
 
-        # Atualiza estoque
-        cursor.execute("UPDATE materiais SET estoque_atual = %s WHERE id = %s", (novo_estoque, id))
-        conn.commit()
+MAXIMO_ITENS_BAIXA_LOTE = 500
+
+
+@app.route("/materiais/baixa-lote", methods=["POST"])
+def dar_baixa_lote():
+    """
+    Baixa de vários materiais em uma única transação.
+
+    Corpo: {"itens": [{"id": 1, "quantidade": 2}, {"codigo_material": "0001", "quantidade": 1}],
+            "modo": "tudo_ou_nada" (padrão) ou "parcial"}
+    No modo tudo_ou_nada qualquer linha com erro cancela o lote inteiro; no
+    parcial as linhas válidas são aplicadas e as demais retornam o erro.
+    """
+    data = request.json or {}
+    itens = data.get("itens")
+    modo = data.get("modo", "tudo_ou_nada")
+
+    if modo not in ("tudo_ou_nada", "parcial"):
+        return jsonify({"error": "Modo deve ser 'tudo_ou_nada' ou 'parcial'"}), 400
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"error": "Informe a lista de itens"}), 400
+    if len(itens) > MAXIMO_ITENS_BAIXA_LOTE:
+        return jsonify({"error": f"Máximo de {MAXIMO_ITENS_BAIXA_LOTE} itens por lote"}), 400
+
+    # Validação das linhas (sem acessar o banco)
+    resultados = []
+    for linha, item in enumerate(itens):
+        resultado = {"linha": linha, "id": None, "codigo_material": None}
+        resultados.append(resultado)
+        if not isinstance(item, dict) or (item.get("id") is None and not item.get("codigo_material")):
+            resultado["erro"] = "Informe 'id' ou 'codigo_material'"
+            continue
+        resultado["codigo_material"] = item.get("codigo_material")
+        try:
+            resultado["id"] = int(item["id"]) if item.get("id") is not None else None
+        except (TypeError, ValueError):
+            resultado["erro"] = "'id' inválido"
+            continue
+        try:
+            resultado["quantidade"] = _quantidade_decimal(item.get("quantidade"))
+        except ValueError as e:
+            resultado["erro"] = str(e)
+
+    ids = sorted({r["id"] for r in resultados if "erro" not in r and r["id"] is not None})
+    codigos = sorted({r["codigo_material"] for r in resultados if "erro" not in r and r["id"] is None})
 
-        return jsonify({"message": "Baixa realizada com sucesso", "estoque_atual": novo_estoque}), 200
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        # Uma consulta valida todas as linhas e bloqueia os materiais até o commit
+        condicoes = []
+        parametros = []
+        if ids:
+            condicoes.append(f"id IN ({', '.join(['%s'] * len(ids))})")
+            parametros.extend(ids)
+        if codigos:
+            condicoes.append(f"codigo_material IN ({', '.join(['%s'] * len(codigos))})")
+            parametros.extend(codigos)
+
+        materiais_por_id = {}
+        materiais_por_codigo = {}
+        if condicoes:
+            cursor.execute(f"""
+                SELECT id, codigo_material, estoque_atual
+                FROM materiais
+                WHERE {' OR '.join(condicoes)}
+                ORDER BY id
+                FOR UPDATE
+            """, parametros)
+            for material_id, codigo_material, estoque_atual in cursor.fetchall():
+                material = {"id": material_id, "codigo_material": codigo_material,
+                            "estoque": estoque_atual if estoque_atual is not None else Decimal("0")}
+                materiais_por_id[material_id] = material
+                if codigo_material:
+                    # A collation do MySQL ignora maiúsculas/minúsculas na comparação
+                    materiais_por_codigo[codigo_material.lower()] = material
+
+        # Aplica as linhas em ordem sobre o estoque bloqueado (um mesmo
+        # material pode aparecer em várias linhas)
+        baixas = {}
+        for resultado in resultados:
+            if "erro" in resultado:
+                continue
+            if resultado["id"] is not None:
+                material = materiais_por_id.get(resultado["id"])
+            else:
+                material = materiais_por_codigo.get(str(resultado["codigo_material"]).lower())
+            if material is None:
+                resultado["erro"] = "Material não encontrado"
+                continue
+
+            resultado["id"] = material["id"]
+            resultado["codigo_material"] = material["codigo_material"]
+            if resultado["quantidade"] > material["estoque"]:
+                resultado["erro"] = "Quantidade insuficiente no estoque"
+                continue
+
+            material["estoque"] -= resultado["quantidade"]
+            baixas[material["id"]] = baixas.get(material["id"], Decimal("0")) + resultado["quantidade"]
+
+        houve_erro = any("erro" in r for r in resultados)
+        if houve_erro and modo == "tudo_ou_nada":
+            conn.rollback()
+            baixas = {}
+        elif baixas:
+            casos = " ".join(["WHEN %s THEN %s"] * len(baixas))
+            parametros = [valor for par in baixas.items() for valor in par]
+            cursor.execute(f"""
+                UPDATE materiais
+                SET estoque_atual = estoque_atual - CASE id {casos} END
+                WHERE id IN ({', '.join(['%s'] * len(baixas))})
+            """, parametros + list(baixas.keys()))
+            incrementar_versao(cursor, 'materiais')
+            registrar_alteracao(cursor, 'materiais', 'atualizacao', *baixas.keys())
+            conn.commit()
+
+        for resultado in resultados:
+            resultado["status"] = "erro" if "erro" in resultado else ("ok" if baixas else "cancelado")
+            if "quantidade" in resultado:
+                resultado["quantidade"] = float(resultado["quantidade"])
+            if resultado["status"] == "ok":
+                resultado["estoque_atual"] = float(materiais_por_id[resultado["id"]]["estoque"])
+
+        resposta = {
+            "resultados": resultados,
+            "estoques": {str(material_id): float(materiais_por_id[material_id]["estoque"]) for material_id in baixas}
+        }
+        if houve_erro and modo == "tudo_ou_nada":
+            resposta["error"] = "Lote cancelado: há linhas com erro"
+            return jsonify(resposta), 400
+        return jsonify(resposta), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -619,12 +787,13 @@ def dar_baixa(id):
 
 
 @app.route("/materiais/vencidos", methods=["GET"])
+@em_cache('materiais', por_dia=True)
 def listar_materiais_vencidos():
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("""
+        vencidos = repositorio.buscar_todos(cursor, """
             SELECT 
                 id,
                 nome,
@@ -639,21 +808,9 @@ def listar_materiais_vencidos():
             FROM materiais
             WHERE validade < CURDATE()
             ORDER BY nome ASC
-        """)
-        vencidos = cursor.fetchall()
-
-        # Converter tipos de dados para garantir serialização JSON
-        materiais_serializados = []
-        for material in vencidos:
-            material_serializado = {}
-            for key, value in material.items():
-                if isinstance(value, (int, float, str, bool)) or value is None:
-                    material_serializado[key] = value
-                else:
-                    material_serializado[key] = str(value)
-            materiais_serializados.append(material_serializado)
+        """, mapeador=repositorio.MATERIAL)
 
-        return jsonify(materiais_serializados), 200
+        return jsonify(vencidos), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -663,148 +820,261 @@ def listar_materiais_vencidos():
         conn.close()
 
 
-@app.route("/materiais/valor-estoque", methods=["GET"])
-def calcular_valor_estoque():
+def _calcular_indicadores_materiais():
+    """
+    Calcula todos os indicadores do dashboard numa única passada sobre
+    materiais (agregação condicional), mais a lista de vencidos.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("""
-            SELECT 
-                SUM(estoque_atual * preco) as valor_total,
-                COUNT(*) as total_materiais,
-                AVG(preco) as preco_medio
+        resultado = repositorio.buscar_um(cursor, """
+            SELECT
+                COUNT(*) AS total,
+                SUM(validade < CURDATE()) AS vencidos,
+                SUM(validade >= CURDATE() AND validade <= CURDATE() + INTERVAL 30 DAY) AS proximos_vencimento,
+                SUM(estoque_atual <= estoque_minimo) AS estoque_baixo,
+                SUM(CASE WHEN estoque_atual > 0 THEN estoque_atual * preco END) AS valor_total,
+                COUNT(CASE WHEN estoque_atual > 0 THEN 1 END) AS total_materiais,
+                AVG(CASE WHEN estoque_atual > 0 THEN preco END) AS preco_medio
             FROM materiais
-            WHERE estoque_atual > 0
         """)
-        
-        resultado = cursor.fetchone()
-        
-        if resultado:
-            valor_total = float(resultado['valor_total']) if resultado['valor_total'] else 0
-            total_materiais = int(resultado['total_materiais']) if resultado['total_materiais'] else 0
-            preco_medio = float(resultado['preco_medio']) if resultado['preco_medio'] else 0
-            
-            return jsonify({
-                "valor_total": valor_total,
-                "total_materiais": total_materiais,
-                "preco_medio": preco_medio
-            }), 200
-        else:
-            return jsonify({
-                "valor_total": 0,
-                "total_materiais": 0,
-                "preco_medio": 0
-            }), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
+        vencidos = repositorio.buscar_todos(cursor, """
+            SELECT id, nome, tipo, quantidade, unidade, validade
+            FROM materiais
+            WHERE validade < CURDATE()
+            ORDER BY nome ASC
+            LIMIT 50
+        """, mapeador=repositorio.MATERIAL)
     finally:
         cursor.close()
         conn.close()
 
+    return {
+        "total": int(resultado['total'] or 0),
+        "vencidos": int(resultado['vencidos'] or 0),
+        "proximosVencimento": int(resultado['proximos_vencimento'] or 0),
+        "estoqueBaixo": int(resultado['estoque_baixo'] or 0),
+        "valor_total": float(resultado['valor_total'] or 0),
+        "total_materiais": int(resultado['total_materiais'] or 0),
+        "preco_medio": float(resultado['preco_medio'] or 0),
+        "materiais_vencidos": vencidos
+    }
 
-@app.route("/materiais/stats", methods=["GET"])
-def obter_estatisticas():
+
+def _indicadores_materiais():
+    # Sem cache próprio: as rotas abaixo já guardam a resposta por versão de
+    # materiais (em_cache), válida em todos os workers. Um cache por
+    # processo aqui devolveria indicadores antigos sob o ETag novo.
+    return _calcular_indicadores_materiais()
+
+
+@app.route("/dashboard", methods=["GET"])
+@em_cache('materiais', por_dia=True)
+def obter_dashboard():
+    """
+    Todos os indicadores da HomePage em uma requisição
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        return jsonify(_indicadores_materiais()), 200
 
-        cursor.execute("SELECT COUNT(*) AS total FROM materiais")
-        total = cursor.fetchone()["total"]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        cursor.execute("SELECT COUNT(*) AS vencidos FROM materiais WHERE validade < CURDATE()")
-        vencidos = cursor.fetchone()["vencidos"]
 
-        cursor.execute("""
-            SELECT COUNT(*) AS proximos_vencimento FROM materiais 
-            WHERE validade >= CURDATE() AND validade <= CURDATE() + INTERVAL 30 DAY
-        """)
-        proximos_vencimento = cursor.fetchone()["proximos_vencimento"]
+@app.route("/materiais/valor-estoque", methods=["GET"])
+@em_cache('materiais')
+def calcular_valor_estoque():
+    try:
+        indicadores = _indicadores_materiais()
 
-        cursor.execute("""
-            SELECT COUNT(*) AS estoque_baixo FROM materiais 
-            WHERE estoque_atual <= estoque_minimo
-        """)
-        estoque_baixo = cursor.fetchone()["estoque_baixo"]
+        return jsonify({
+            "valor_total": indicadores["valor_total"],
+            "total_materiais": indicadores["total_materiais"],
+            "preco_medio": indicadores["preco_medio"]
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/materiais/stats", methods=["GET"])
+@em_cache('materiais', por_dia=True)
+def obter_estatisticas():
+    try:
+        indicadores = _indicadores_materiais()
 
         return jsonify({
-            "total": total,
-            "vencidos": vencidos,
-            "proximosVencimento": proximos_vencimento,
-            "estoqueBaixo": estoque_baixo
+            "total": indicadores["total"],
+            "vencidos": indicadores["vencidos"],
+            "proximosVencimento": indicadores["proximosVencimento"],
+            "estoqueBaixo": indicadores["estoqueBaixo"]
         }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+# Linhas acumuladas antes de enviar cada pedaço do CSV ao cliente
+LINHAS_POR_BLOCO_CSV = 500
+
+CABECALHO_CSV_MATERIAIS = [
+    'ID', 'Código do Material', 'Nome', 'Tipo', 'Fabricante', 'Quantidade', 'Unidade',
+    'Validade', 'Preço (R$)', 'Estoque Atual', 'Estoque Mínimo'
+]
+
+
+def _gerar_csv_materiais(conn, cursor):
+    """
+    Gera o CSV em blocos conforme as linhas chegam do banco, sem carregar a
+    tabela inteira na memória. Fecha cursor e conexão ao terminar (ou se o
+    cliente desconectar no meio do download).
+    """
+    try:
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=';', quoting=csv.QUOTE_ALL)
+        writer.writerow(CABECALHO_CSV_MATERIAIS)
+        # UTF-8 com BOM para Excel
+        yield output.getvalue().encode('utf-8-sig')
+
+        while True:
+            linhas = cursor.fetchmany(LINHAS_POR_BLOCO_CSV)
+            if not linhas:
+                break
+
+            output.seek(0)
+            output.truncate()
+            for (material_id, codigo_material, nome, tipo, fabricante, quantidade, unidade,
+                 validade, preco, estoque_atual, estoque_minimo) in linhas:
+                # Formatar data
+                data_formatada = validade.strftime('%d/%m/%Y') if validade else ''
+
+                # Formatar preço
+                preco_formatado = f"R$ {preco:.2f}".replace('.', ',') if preco else ''
+
+                writer.writerow([
+                    material_id, codigo_material, nome, tipo, fabricante, quantidade, unidade,
+                    data_formatada, preco_formatado, estoque_atual, estoque_minimo
+                ])
+            yield output.getvalue().encode('utf-8')
     finally:
-        cursor.close()
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            # Download interrompido: as linhas restantes são descartadas
+            # quando a conexão volta ao pool
+            pass
         conn.close()
 
 
 @app.route("/materiais/exportar-csv", methods=["GET"])
 def exportar_materiais_csv():
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Cursor sem buffer: as linhas são lidas do servidor sob demanda
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("""
+            SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade,
+                   validade, preco, estoque_atual, estoque_minimo
+            FROM materiais
+            ORDER BY nome ASC
+        """)
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        return jsonify({"error": str(e)}), 500
 
-        cursor.execute("SELECT * FROM materiais ORDER BY nome ASC")
-        materiais = cursor.fetchall()
+    # Nome do arquivo com timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'materiais_laboratorio_{timestamp}.csv'
 
-        # Criar um buffer de memória para o CSV
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';', quoting=csv.QUOTE_ALL)
+    return Response(
+        _gerar_csv_materiais(conn, cursor),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
-        # Cabeçalho do CSV
-        writer.writerow([
-            'ID', 'Código do Material', 'Nome', 'Tipo', 'Fabricante', 'Quantidade', 'Unidade', 
-            'Validade', 'Preço (R$)', 'Estoque Atual', 'Estoque Mínimo'
-        ])
 
-        # Dados dos materiais
-        for material in materiais:
-            # Formatar data
-            data_formatada = material['validade'].strftime('%d/%m/%Y') if material['validade'] else ''
-            
-            # Formatar preço
-            preco_formatado = f"R$ {material['preco']:.2f}".replace('.', ',') if material['preco'] else ''
-            
-            writer.writerow([
-                material['id'],
-                material.get('codigo_material', ''),
-                material['nome'],
-                material['tipo'],
-                material['fabricante'],
-                material['quantidade'],
-                material['unidade'],
-                data_formatada,
-                preco_formatado,
-                material['estoque_atual'],
-                material['estoque_minimo']
-            ])
-
-        # Configurar o buffer para leitura
-        output.seek(0)
-        
-        # Nome do arquivo com timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'materiais_laboratorio_{timestamp}.csv'
-
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8-sig')),  # UTF-8 com BOM para Excel
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
-        )
+def _importar_csv(tabela):
+    if 'arquivo' not in request.files or not request.files['arquivo'].filename:
+        return jsonify({"error": "Envie o arquivo CSV no campo 'arquivo'"}), 400
 
+    try:
+        resultado = importar_csv(tabela, request.files['arquivo'].stream, request.form.get("separador", ";"),
+                                 mesma_base=request.form.get("mesma_base") == "1")
+    except (ImportacaoInvalida, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": f"Arquivo inválido: {e}"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
     finally:
-        cursor.close()
-        conn.close()
+        if tabela != 'materiais':
+            relatorios.marcar_alterado()
+
+    return jsonify(resultado), 200
+
+
+@app.route("/materiais/importar-csv", methods=["POST"])
+def importar_materiais_csv():
+    """
+    Importa materiais de um CSV no layout da exportação. Materiais com o
+    mesmo código são atualizados; os demais são inseridos. mesma_base=1
+    atualiza pelo ID os materiais sem código (CSV exportado deste banco).
+    """
+    return _importar_csv('materiais')
+
+
+@app.route("/equipamentos/importar-csv", methods=["POST"])
+def importar_equipamentos_csv():
+    """Importa equipamentos de um CSV, atualizando os que já têm o mesmo código."""
+    return _importar_csv('equipamentos')
+
+
+@app.route("/exportacoes", methods=["POST"])
+def criar_exportacao():
+    """
+    Solicita a exportação de uma tabela (materiais, equipamentos ou
+    manutencoes) em xlsx ou parquet. Se os dados não mudaram desde a última
+    exportação o arquivo já está pronto (200); senão é gerado em segundo
+    plano (202) e acompanhado por GET /exportacoes/<id>.
+    """
+    data = request.json or {}
+    try:
+        situacao = solicitar_exportacao(data.get("tabela"), data.get("formato"))
+    except FormatoIndisponivel as e:
+        return jsonify({"error": str(e)}), 501
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(situacao), 200 if situacao["status"] == "concluida" else 202
+
+
+@app.route("/exportacoes/<exportacao_id>", methods=["GET"])
+def status_exportacao(exportacao_id):
+    situacao = obter_situacao(exportacao_id)
+    if situacao is None:
+        return jsonify({"error": "Exportação não encontrada"}), 404
+    return jsonify(situacao), 200
+
+
+@app.route("/exportacoes/<exportacao_id>/arquivo", methods=["GET"])
+def download_exportacao(exportacao_id):
+    situacao = obter_situacao(exportacao_id)
+    if situacao is None or situacao["status"] != "concluida":
+        return jsonify({"error": "Exportação não encontrada ou ainda não concluída"}), 404
+
+    tabela, carimbo, formato = interpretar_id(exportacao_id)
+    return send_file(
+        caminho_exportacao(exportacao_id),
+        mimetype=mimetype_exportacao(exportacao_id),
+        as_attachment=True,
+        download_name=f"{tabela}_laboratorio_{carimbo}.{formato}",
+        conditional=True,
+        etag=exportacao_id
+    )
 
 
 # ==================== ROTAS DE EQUIPAMENTOS ====================
@@ -842,7 +1112,12 @@ def adicionar_equipamento():
         )
 
         cursor.execute(query, values)
+        equipamento_id = cursor.lastrowid
+        incrementar_versao(cursor, 'equipamentos')
+        registrar_alteracao(cursor, 'equipamentos', 'criacao', equipamento_id)
         conn.commit()
+        historico.registrar(equipamento_id, None, 'criacao', 'Equipamento cadastrado')
+        relatorios.marcar_alterado(equipamento_id)
 
         return jsonify({"message": "Equipamento adicionado com sucesso!"}), 201
 
@@ -855,33 +1130,22 @@ def adicionar_equipamento():
 
 
 @app.route("/equipamentos", methods=["GET"])
+@em_cache('equipamentos')
 def listar_equipamentos():
+    """Lista equipamentos por nome. Parâmetros: fields e formato."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        plano = consultas.listar_equipamentos(request.args)
+        formato = formato_lista(request.args)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except FormatoIndisponivel as e:
+        return jsonify({"error": str(e)}), 501
 
-        query = """
-        SELECT e.*, 
-               COUNT(m.id) as total_manutencoes,
-               COUNT(CASE WHEN m.status = 'agendada' THEN 1 END) as manutencoes_pendentes
-        FROM equipamentos e
-        LEFT JOIN manutencoes m ON e.id = m.equipamento_id
-        GROUP BY e.id
-        ORDER BY e.nome ASC
-        """
-        cursor.execute(query)
-        equipamentos = cursor.fetchall()
-
-        # Converter tipos de dados
-        for equipamento in equipamentos:
-            if equipamento['data_aquisicao']:
-                equipamento['data_aquisicao'] = equipamento['data_aquisicao'].isoformat()
-            if equipamento['garantia_ate']:
-                equipamento['garantia_ate'] = equipamento['garantia_ate'].isoformat()
-            if equipamento['valor_aquisicao']:
-                equipamento['valor_aquisicao'] = float(equipamento['valor_aquisicao'])
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
 
-        return jsonify(equipamentos), 200
+        return _resposta_lista(consultas.executar(cursor, plano), formato)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -892,23 +1156,16 @@ def listar_equipamentos():
 
 
 @app.route("/equipamentos/<int:id>", methods=["GET"])
+@em_cache('equipamentos')
 def buscar_equipamento_por_id(id):
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM equipamentos WHERE id = %s", (id,))
-        equipamento = cursor.fetchone()
+        equipamento = repositorio.buscar_um(cursor, "SELECT * FROM equipamentos WHERE id = %s", (id,),
+                                            repositorio.EQUIPAMENTO)
 
         if equipamento:
-            # Converter tipos de dados
-            if equipamento['data_aquisicao']:
-                equipamento['data_aquisicao'] = equipamento['data_aquisicao'].isoformat()
-            if equipamento['garantia_ate']:
-                equipamento['garantia_ate'] = equipamento['garantia_ate'].isoformat()
-            if equipamento['valor_aquisicao']:
-                equipamento['valor_aquisicao'] = float(equipamento['valor_aquisicao'])
-            
             return jsonify(equipamento), 200
         else:
             return jsonify({"error": "Equipamento não encontrado"}), 404
@@ -955,9 +1212,15 @@ def atualizar_equipamento(id):
         )
 
         cursor.execute(query, values)
+        atualizado = cursor.rowcount > 0
+        if atualizado:
+            incrementar_versao(cursor, 'equipamentos')
+            registrar_alteracao(cursor, 'equipamentos', 'atualizacao', id)
         conn.commit()
 
-        if cursor.rowcount > 0:
+        if atualizado:
+            historico.registrar(id, None, 'atualizacao', 'Equipamento atualizado')
+            relatorios.marcar_alterado(id)
             return jsonify({"message": "Equipamento atualizado com sucesso!"}), 200
         else:
             return jsonify({"error": "Equipamento não encontrado"}), 404
@@ -976,14 +1239,28 @@ def excluir_equipamento(id):
         conn = get_connection()
         cursor = conn.cursor()
 
-        # Verifica se o equipamento existe
-        cursor.execute("SELECT id FROM equipamentos WHERE id = %s", (id,))
-        if not cursor.fetchone():
+        # Verifica se o equipamento existe (o bloqueio impede que novas
+        # manutenções sejam criadas para ele até a exclusão)
+        cursor.execute("SELECT codigo, nome FROM equipamentos WHERE id = %s FOR UPDATE", (id,))
+        equipamento = cursor.fetchone()
+        if not equipamento:
             return jsonify({"error": "Equipamento não encontrado"}), 404
 
+        # As manutenções do equipamento são excluídas em cascata
+        cursor.execute("SELECT id FROM manutencoes WHERE equipamento_id = %s", (id,))
+        manutencao_ids = [linha[0] for linha in cursor.fetchall()]
+
         # Exclui o equipamento
         cursor.execute("DELETE FROM equipamentos WHERE id = %s", (id,))
+        incrementar_versao(cursor, 'equipamentos', 'manutencoes')
+        registrar_alteracao(cursor, 'equipamentos', 'exclusao', id)
+        registrar_exclusao(cursor, 'equipamentos', id)
+        if manutencao_ids:
+            registrar_alteracao(cursor, 'manutencoes', 'exclusao', *manutencao_ids)
+            registrar_exclusao(cursor, 'manutencoes', *manutencao_ids)
         conn.commit()
+        historico.registrar(id, None, 'exclusao', f"Equipamento excluído ({equipamento[0]} - {equipamento[1]})")
+        relatorios.marcar_alterado(id)
 
         return jsonify({"message": "Equipamento excluído com sucesso!"}), 200
 
@@ -1015,6 +1292,13 @@ def adicionar_manutencao():
         custo = data.get("custo")
         observacoes = data.get("observacoes")
 
+        # Contadores antes do INSERT: o bloqueio exclusivo no equipamento
+        # serializa inserções simultâneas (só o bloqueio compartilhado da
+        # chave estrangeira levaria a deadlock ao atualizar os contadores)
+        if not ajustar_contadores(cursor, equipamento_id, total=1, pendentes=pendente(status)):
+            conn.rollback()
+            return jsonify({"error": "Equipamento não encontrado"}), 404
+
         query = """
         INSERT INTO manutencoes (equipamento_id, tipo, descricao, data_agendada, status, 
                                 prioridade, responsavel, fornecedor, custo, observacoes)
@@ -1027,14 +1311,13 @@ def adicionar_manutencao():
 
         cursor.execute(query, values)
         manutencao_id = cursor.lastrowid
-
-        # Registrar no histórico
-        cursor.execute("""
-        INSERT INTO historico_manutencoes (equipamento_id, manutencao_id, tipo_acao, descricao, usuario)
-        VALUES (%s, %s, 'criacao', 'Manutenção criada', 'Sistema')
-        """, (equipamento_id, manutencao_id))
+        incrementar_versao(cursor, 'manutencoes', 'equipamentos')
+        registrar_alteracao(cursor, 'manutencoes', 'criacao', manutencao_id)
+        registrar_alteracao(cursor, 'equipamentos', 'atualizacao', equipamento_id)
 
         conn.commit()
+        historico.registrar(equipamento_id, manutencao_id, 'criacao', 'Manutenção criada')
+        relatorios.marcar_alterado(equipamento_id)
 
         return jsonify({"message": "Manutenção agendada com sucesso!", "id": manutencao_id}), 201
 
@@ -1047,30 +1330,29 @@ def adicionar_manutencao():
 
 
 @app.route("/manutencoes", methods=["GET"])
+@em_cache('manutencoes', 'equipamentos')
 def listar_manutencoes():
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+    """
+    Lista manutenções por data agendada (sem data primeiro), paginadas por
+    cursor (data_agendada, id).
 
-        query = """
-        SELECT m.*, e.nome as nome_equipamento, e.codigo as codigo_equipamento
-        FROM manutencoes m
-        JOIN equipamentos e ON m.equipamento_id = e.id
-        ORDER BY m.data_agendada ASC
-        """
-        cursor.execute(query)
-        manutencoes = cursor.fetchall()
+    Parâmetros: limite, cursor (proximo_cursor da página anterior), status,
+    prioridade e tipo (um valor ou vários separados por vírgula),
+    equipamento_id, data_de, data_ate, incluir_total=1, fields e formato.
+    """
+    try:
+        plano = consultas.listar_manutencoes(request.args)
+        formato = formato_lista(request.args)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except FormatoIndisponivel as e:
+        return jsonify({"error": str(e)}), 501
 
-        # Converter tipos de dados
-        for manutencao in manutencoes:
-            if manutencao['data_agendada']:
-                manutencao['data_agendada'] = manutencao['data_agendada'].isoformat()
-            if manutencao['data_realizada']:
-                manutencao['data_realizada'] = manutencao['data_realizada'].isoformat()
-            if manutencao['custo']:
-                manutencao['custo'] = float(manutencao['custo'])
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
 
-        return jsonify(manutencoes), 200
+        return _resposta_lista(consultas.executar(cursor, plano), formato, "manutencoes")
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1081,10 +1363,11 @@ def listar_manutencoes():
 
 
 @app.route("/manutencoes/<int:id>", methods=["GET"])
+@em_cache('manutencoes', 'equipamentos')
 def buscar_manutencao(id):
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         query = """
         SELECT m.*, e.nome as nome_equipamento, e.codigo as codigo_equipamento
@@ -1092,18 +1375,9 @@ def buscar_manutencao(id):
         JOIN equipamentos e ON m.equipamento_id = e.id
         WHERE m.id = %s
         """
-        cursor.execute(query, (id,))
-        manutencao = cursor.fetchone()
+        manutencao = repositorio.buscar_um(cursor, query, (id,), repositorio.MANUTENCAO)
 
         if manutencao:
-            # Converter tipos de dados
-            if manutencao['data_agendada']:
-                manutencao['data_agendada'] = manutencao['data_agendada'].isoformat()
-            if manutencao['data_realizada']:
-                manutencao['data_realizada'] = manutencao['data_realizada'].isoformat()
-            if manutencao['custo']:
-                manutencao['custo'] = float(manutencao['custo'])
-            
             return jsonify(manutencao), 200
         else:
             return jsonify({"error": "Manutenção não encontrada"}), 404
@@ -1116,6 +1390,35 @@ def buscar_manutencao(id):
         conn.close()
 
 
+def _registrar_atualizacao_manutencao(equipamento_id, manutencao_id, status_anterior, status):
+    relatorios.marcar_alterado(equipamento_id)
+    if status == status_anterior:
+        historico.registrar(equipamento_id, manutencao_id, 'atualizacao', 'Manutenção atualizada')
+        return
+    tipo_acao = {'concluida': 'conclusao', 'cancelada': 'cancelamento'}.get(status, 'atualizacao')
+    historico.registrar(equipamento_id, manutencao_id, tipo_acao,
+                        f"Manutenção atualizada (status: {status_anterior} -> {status})")
+
+
+def _bloquear_manutencao(cursor, manutencao_id):
+    """
+    Bloqueia o equipamento e depois a manutenção, a mesma ordem de
+    excluir_equipamento e POST /manutencoes: na ordem inversa, uma alteração
+    da manutenção e a exclusão do equipamento podiam esperar uma pela outra
+    (deadlock). Retorna (equipamento_id, status) ou None se a manutenção
+    não existe.
+    """
+    cursor.execute("SELECT equipamento_id FROM manutencoes WHERE id = %s", (manutencao_id,))
+    linha = cursor.fetchone()
+    if not linha:
+        return None
+    cursor.execute("SELECT id FROM equipamentos WHERE id = %s FOR UPDATE", (linha[0],))
+    cursor.fetchone()
+    # Relida com bloqueio: a manutenção pode ter sido excluída nesse meio tempo
+    cursor.execute("SELECT equipamento_id, status FROM manutencoes WHERE id = %s FOR UPDATE", (manutencao_id,))
+    return cursor.fetchone()
+
+
 @app.route("/manutencoes/<int:id>", methods=["PUT"])
 def atualizar_manutencao(id):
     try:
@@ -1134,6 +1437,11 @@ def atualizar_manutencao(id):
         custo = data.get("custo")
         observacoes = data.get("observacoes")
 
+        atual = _bloquear_manutencao(cursor, id)
+        if not atual:
+            return jsonify({"error": "Manutenção não encontrada"}), 404
+        equipamento_id, status_anterior = atual
+
         query = """
         UPDATE manutencoes 
         SET tipo = %s, descricao = %s, data_agendada = %s, data_realizada = %s, status = %s,
@@ -1146,12 +1454,19 @@ def atualizar_manutencao(id):
         )
 
         cursor.execute(query, values)
-        conn.commit()
 
-        if cursor.rowcount > 0:
-            return jsonify({"message": "Manutenção atualizada com sucesso!"}), 200
+        delta_pendentes = pendente(status) - pendente(status_anterior)
+        if delta_pendentes:
+            ajustar_contadores(cursor, equipamento_id, pendentes=delta_pendentes)
+            incrementar_versao(cursor, 'manutencoes', 'equipamentos')
+            registrar_alteracao(cursor, 'equipamentos', 'atualizacao', equipamento_id)
         else:
-            return jsonify({"error": "Manutenção não encontrada"}), 404
+            incrementar_versao(cursor, 'manutencoes')
+        registrar_alteracao(cursor, 'manutencoes', 'atualizacao', id)
+        conn.commit()
+        _registrar_atualizacao_manutencao(equipamento_id, id, status_anterior, status)
+
+        return jsonify({"message": "Manutenção atualizada com sucesso!"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1172,6 +1487,11 @@ def concluir_manutencao(id):
         custo = data.get("custo")
         observacoes = data.get("observacoes")
 
+        result = _bloquear_manutencao(cursor, id)
+        if not result:
+            return jsonify({"error": "Manutenção não encontrada"}), 404
+        equipamento_id, status_anterior = result
+
         # Atualizar manutenção
         query = """
         UPDATE manutencoes 
@@ -1180,16 +1500,19 @@ def concluir_manutencao(id):
         """
         cursor.execute(query, (data_realizada, custo, observacoes, id))
 
-        # Obter equipamento_id para atualizar status
-        cursor.execute("SELECT equipamento_id FROM manutencoes WHERE id = %s", (id,))
-        result = cursor.fetchone()
-        if result:
-            equipamento_id = result[0]
-            
-            # Atualizar status do equipamento para ativo
-            cursor.execute("UPDATE equipamentos SET status = 'ativo' WHERE id = %s", (equipamento_id,))
+        # Atualizar status do equipamento para ativo e os contadores
+        cursor.execute("""
+            UPDATE equipamentos
+            SET status = 'ativo', manutencoes_pendentes = manutencoes_pendentes - %s
+            WHERE id = %s
+        """, (pendente(status_anterior), equipamento_id))
+        incrementar_versao(cursor, 'manutencoes', 'equipamentos')
+        registrar_alteracao(cursor, 'manutencoes', 'atualizacao', id)
+        registrar_alteracao(cursor, 'equipamentos', 'atualizacao', equipamento_id)
 
         conn.commit()
+        historico.registrar(equipamento_id, id, 'conclusao', 'Manutenção concluída')
+        relatorios.marcar_alterado(equipamento_id)
 
         return jsonify({"message": "Manutenção concluída com sucesso!"}), 200
 
@@ -1201,56 +1524,162 @@ def concluir_manutencao(id):
         conn.close()
 
 
-@app.route("/equipamentos/stats", methods=["GET"])
-def obter_estatisticas_equipamentos():
+@app.route("/manutencoes/<int:id>", methods=["DELETE"])
+def excluir_manutencao(id):
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        # Total de equipamentos
-        cursor.execute("SELECT COUNT(*) AS total FROM equipamentos")
-        total = cursor.fetchone()["total"]
+        manutencao = _bloquear_manutencao(cursor, id)
+        if not manutencao:
+            return jsonify({"error": "Manutenção não encontrada"}), 404
+        equipamento_id, status = manutencao
+
+        cursor.execute("DELETE FROM manutencoes WHERE id = %s", (id,))
+        ajustar_contadores(cursor, equipamento_id, total=-1, pendentes=-pendente(status))
+        incrementar_versao(cursor, 'manutencoes', 'equipamentos')
+        registrar_alteracao(cursor, 'manutencoes', 'exclusao', id)
+        registrar_alteracao(cursor, 'equipamentos', 'atualizacao', equipamento_id)
+        registrar_exclusao(cursor, 'manutencoes', id)
+        conn.commit()
+        historico.registrar(equipamento_id, id, 'exclusao', 'Manutenção excluída')
+        relatorios.marcar_alterado(equipamento_id)
 
-        # Equipamentos por status
-        cursor.execute("""
-            SELECT status, COUNT(*) as quantidade 
-            FROM equipamentos 
-            GROUP BY status
-        """)
-        status_stats = cursor.fetchall()
+        return jsonify({"message": "Manutenção excluída com sucesso!"}), 200
 
-        # Manutenções pendentes
-        cursor.execute("""
-            SELECT COUNT(*) AS pendentes 
-            FROM manutencoes 
-            WHERE status IN ('agendada', 'em_andamento')
-        """)
-        manutencoes_pendentes = cursor.fetchone()["pendentes"]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Valor total dos equipamentos
-        cursor.execute("""
-            SELECT SUM(valor_aquisicao) as valor_total 
-            FROM equipamentos 
-            WHERE status = 'ativo'
-        """)
-        valor_total = cursor.fetchone()["valor_total"] or 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route("/equipamentos/stats", methods=["GET"])
+@em_cache('relatorios_equipamentos')
+def obter_estatisticas_equipamentos():
+    try:
+        # Lê o relatório de status do parque, pré-calculado por relatorios.py
+        try:
+            relatorio = relatorios.obter_relatorio('status')
+        except relatorios.RelatorioPendente as e:
+            resposta = jsonify({"error": str(e)})
+            resposta.headers['Retry-After'] = '5'
+            return resposta, 503
+        dados = relatorio["dados"]
 
         return jsonify({
-            "total": total,
-            "status_stats": status_stats,
-            "manutencoes_pendentes": manutencoes_pendentes,
-            "valor_total": float(valor_total)
+            "total": dados["total"],
+            "status_stats": dados["status_stats"],
+            "manutencoes_pendentes": dados["manutencoes_pendentes"],
+            "valor_total": dados["valor_total"]
         }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/relatorios/<tipo>", methods=["GET"])
+@em_cache('relatorios_equipamentos')
+def obter_relatorio(tipo):
+    """
+    Último relatório pré-calculado (status, manutencao, calibracao ou
+    inventario) do parque inteiro ou, com ?equipamento_id=, de um equipamento.
+    """
+    if tipo not in relatorios.TIPOS_RELATORIO:
+        return jsonify({"error": f"Tipo de relatório inválido. Use: {', '.join(relatorios.TIPOS_RELATORIO)}"}), 400
+    equipamento_id = request.args.get("equipamento_id", type=int)
+
+    try:
+        relatorio = relatorios.obter_relatorio(tipo, equipamento_id)
+        if relatorio is None:
+            return jsonify({"error": "Equipamento não encontrado"}), 404
+        return jsonify(relatorio), 200
+
+    except relatorios.RelatorioPendente as e:
+        resposta = jsonify({"status": "gerando", "message": str(e)})
+        resposta.headers['Retry-After'] = '5'
+        return resposta, 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/relatorios/gerar", methods=["POST"])
+def gerar_relatorios():
+    """Agenda a regeneração de todos os relatórios (ex.: após alterações feitas direto no banco)."""
+    relatorios.marcar_alterado()
+    return jsonify({"message": "Regeneração dos relatórios agendada"}), 202
+
+
+@app.route("/events", methods=["GET"])
+def transmitir_eventos():
+    """
+    Feed de alterações (Server-Sent Events): um evento "alteracao" com
+    {tabela, id, operacao, versao} por registro alterado. ?tabelas=materiais,manutencoes
+    limita as tabelas; reconexões enviam Last-Event-ID e recebem o que perderam.
+    """
+    ultimo_id = request.headers.get("Last-Event-ID") or request.args.get("ultimo_id")
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID inválido"}), 400
+    tabelas = [t for t in request.args.get("tabelas", "").split(",") if t]
+
+    # Cada conexão prende uma thread até o cliente sair: acima do limite o
+    # cliente tenta de novo mais tarde (no modo ASGI não há limite)
+    if not reservar_conexao():
+        resposta = jsonify({"error": "Limite de conexões em /events atingido, tente mais tarde"})
+        resposta.headers['Retry-After'] = '30'
+        return resposta, 503
+
+    resposta = Response(
+        transmitir(ultimo_id, tabelas),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Chamado pelo servidor ao fechar a resposta, mesmo que o stream nem
+    # tenha começado
+    resposta.call_on_close(liberar_conexao)
+    return resposta
+
+
+@app.route("/sync", methods=["GET"])
+def sincronizar():
+    """
+    Sincronização incremental (ver sincronizacao.py): sem since retorna
+    todos os registros; com since=<token da resposta anterior>, só os
+    alterados e os ids excluídos desde então. ?tabelas= limita as tabelas.
+    """
+    try:
+        plano = sincronizacao.sincronizar(request.args)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        return jsonify(consultas.executar(cursor, plano)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
     finally:
-        cursor.close()
-        conn.close()
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
 
 
+@app.route("/db/pool-stats", methods=["GET"])
+def estatisticas_pool():
+    """
+    Ocupação e tempos de espera do pool de conexões (para monitoramento)
+    """
+    return jsonify(get_pool_stats()), 200
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Servidor de desenvolvimento; em produção use servidor.py (gunicorn/waitress)
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1", threaded=True)
@@ -0,0 +1,195 @@
+"""
+Agendador de manutenções preventivas e calibrações.
+
+Periodicamente lê as entradas vencidas de calendario_manutencoes (pelo
+índice de proxima_agendada), cria a manutenção e avança proxima_agendada
+na mesma transação por lote (o histórico é registrado após o commit). Um lock
+nomeado do MySQL (GET_LOCK) garante uma única execução por vez, mesmo com
+vários processos ou servidores; como a data é avançada junto com a
+criação, rodar de novo não duplica manutenções.
+
+Para executar uma vez pela linha de comando (ex.: via cron):
+    python agendador.py
+    python agendador.py --antecedencia 7
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from contadores import ajustar_contadores
+from db import get_connection
+from eventos import registrar_alteracao
+import historico
+import relatorios
+from versoes import incrementar_versao
+
+NOME_LOCK = "laboratorio.agendador_manutencoes"
+TAMANHO_LOTE = 100
+
+# Dias de antecedência com que a manutenção é criada antes da data prevista
+ANTECEDENCIA_DIAS = int(os.getenv("AGENDADOR_ANTECEDENCIA_DIAS", "0"))
+# Segundos entre verificações do calendário
+INTERVALO = float(os.getenv("AGENDADOR_INTERVALO", "3600"))
+
+DESCRICOES = {
+    'preventiva': 'Manutenção preventiva programada',
+    'calibracao': 'Calibração programada',
+}
+
+
+def _proxima_data(proxima_agendada, frequencia_dias, limite):
+    """
+    Primeira data do ciclo depois do limite. Períodos perdidos (agendador
+    parado por muito tempo) geram uma única manutenção, não uma por período.
+    """
+    periodos = (limite - proxima_agendada).days // frequencia_dias + 1
+    return proxima_agendada + timedelta(days=periodos * frequencia_dias)
+
+
+def _processar_lote(cursor, limite):
+    """Cria as manutenções de um lote do calendário. Retorna [(equipamento_id, manutencao_id)]."""
+    cursor.execute("""
+        SELECT id, equipamento_id, tipo_manutencao, frequencia_dias, proxima_agendada, observacoes
+        FROM calendario_manutencoes
+        WHERE proxima_agendada <= %s AND ativo = TRUE AND frequencia_dias > 0
+        ORDER BY proxima_agendada, id
+        LIMIT %s
+        FOR UPDATE
+    """, (limite, TAMANHO_LOTE))
+    entradas = cursor.fetchall()
+    if not entradas:
+        return []
+
+    # Contadores primeiro: o bloqueio exclusivo no equipamento vem antes do
+    # bloqueio compartilhado da chave estrangeira, como em POST /manutencoes
+    novas_por_equipamento = {}
+    for entrada in entradas:
+        novas_por_equipamento[entrada[1]] = novas_por_equipamento.get(entrada[1], 0) + 1
+    for equipamento_id, quantidade in sorted(novas_por_equipamento.items()):
+        ajustar_contadores(cursor, equipamento_id, total=quantidade, pendentes=quantidade)
+
+    criadas = []
+    novas_datas = []
+    for calendario_id, equipamento_id, tipo, frequencia_dias, proxima_agendada, observacoes in entradas:
+        cursor.execute("""
+            INSERT INTO manutencoes (equipamento_id, tipo, descricao, data_agendada, status, prioridade, observacoes)
+            VALUES (%s, %s, %s, %s, 'agendada', 'media', %s)
+        """, (
+            equipamento_id, tipo,
+            f"{DESCRICOES.get(tipo, 'Manutenção programada')} (a cada {frequencia_dias} dias)",
+            proxima_agendada, observacoes
+        ))
+        criadas.append((equipamento_id, cursor.lastrowid))
+        novas_datas.append((calendario_id, _proxima_data(proxima_agendada, frequencia_dias, limite)))
+
+    casos = " ".join(["WHEN %s THEN %s"] * len(novas_datas))
+    cursor.execute(f"""
+        UPDATE calendario_manutencoes
+        SET proxima_agendada = CASE id {casos} END
+        WHERE id IN ({', '.join(['%s'] * len(novas_datas))})
+    """, [valor for par in novas_datas for valor in par] + [calendario_id for calendario_id, _ in novas_datas])
+
+    incrementar_versao(cursor, 'manutencoes', 'equipamentos')
+    registrar_alteracao(cursor, 'manutencoes', 'criacao', *[manutencao_id for _, manutencao_id in criadas])
+    registrar_alteracao(cursor, 'equipamentos', 'atualizacao', *sorted(novas_por_equipamento))
+    return criadas
+
+
+def executar_agendamento(antecedencia_dias=None):
+    """
+    Cria as manutenções vencidas do calendário. Retorna quantas foram
+    criadas, ou None se outra execução já está em andamento.
+    """
+    if antecedencia_dias is None:
+        antecedencia_dias = ANTECEDENCIA_DIAS
+    limite = date.today() + timedelta(days=antecedencia_dias)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (NOME_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            return None
+
+        try:
+            criadas = 0
+            while True:
+                lote = _processar_lote(cursor, limite)
+                conn.commit()
+                if not lote:
+                    return criadas
+                criadas += len(lote)
+                for equipamento_id, manutencao_id in lote:
+                    historico.registrar(equipamento_id, manutencao_id, 'criacao',
+                                        'Manutenção gerada pelo calendário', 'Agendador')
+                    relatorios.marcar_alterado(equipamento_id)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (NOME_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class Agendador:
+    """Thread que executa o agendamento a cada INTERVALO segundos."""
+
+    def __init__(self):
+        self._thread = None
+        self._pid = None
+
+    def _executar(self):
+        while True:
+            try:
+                criadas = executar_agendamento()
+                if criadas:
+                    print(f"Agendador: {criadas} manutenção(ões) criada(s) pelo calendário")
+            except Exception as e:
+                print(f"Erro no agendador de manutenções: {e}")
+
+            time.sleep(INTERVALO)
+
+    def ativo(self):
+        # Threads não sobrevivem a um fork: cada processo precisa da sua
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def iniciar(self):
+        if self.ativo():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._executar, name="agendador-manutencoes", daemon=True)
+        self._thread.start()
+
+
+_agendador = Agendador()
+_agendador_lock = threading.Lock()
+
+
+def garantir_agendador():
+    """Inicia o agendador deste processo, se ainda não estiver rodando."""
+    if _agendador.ativo() or os.getenv("AGENDADOR_ATIVO", "1") != "1":
+        return
+    with _agendador_lock:
+        _agendador.iniciar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria as manutenções vencidas do calendário de manutenções")
+    parser.add_argument("--antecedencia", type=int, default=ANTECEDENCIA_DIAS,
+                        help="criar manutenções previstas para os próximos N dias")
+    args = parser.parse_args()
+
+    criadas = executar_agendamento(args.antecedencia)
+    if criadas is None:
+        print("Outra execução do agendador está em andamento")
+    else:
+        print(f"Manutenções criadas: {criadas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import tempfile
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Diretório padrão dos PDFs (FISPQ) quando o armazenamento local é usado
+DIRETORIO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "arquivos_pdf")
+
+# Uploads são copiados em blocos, nunca carregados inteiros na memória
+TAMANHO_BLOCO = 64 * 1024
+ASSINATURA_PDF = b"%PDF-"
+
+
+class ArquivoInvalido(ValueError):
+    """Upload recusado na validação (não é PDF, vazio ou grande demais)."""
+
+
+def copiar_validando(origem, destino, tamanho_maximo=None):
+    """
+    Copia o fluxo origem para o arquivo destino em blocos, calculando o
+    SHA-256 e validando assinatura e tamanho durante a cópia.
+    Retorna (hash, tamanho em bytes).
+    """
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    cabecalho = b""
+
+    while True:
+        bloco = origem.read(TAMANHO_BLOCO)
+        if not bloco:
+            break
+
+        tamanho += len(bloco)
+        if tamanho_maximo is not None and tamanho > tamanho_maximo:
+            raise ArquivoInvalido(f"Arquivo muito grande. Tamanho máximo: {tamanho_maximo // (1024 * 1024)}MB")
+
+        if len(cabecalho) < len(ASSINATURA_PDF):
+            cabecalho += bloco[:len(ASSINATURA_PDF) - len(cabecalho)]
+            if len(cabecalho) == len(ASSINATURA_PDF) and cabecalho != ASSINATURA_PDF:
+                raise ArquivoInvalido("O arquivo enviado não é um PDF válido")
+
+        sha256.update(bloco)
+        destino.write(bloco)
+
+    if tamanho == 0:
+        raise ArquivoInvalido("Arquivo PDF está vazio")
+    if cabecalho != ASSINATURA_PDF:
+        raise ArquivoInvalido("O arquivo enviado não é um PDF válido")
+
+    return sha256.hexdigest(), tamanho
+
+
+class ArmazenamentoPDF(ABC):
+    """
+    Interface dos armazenamentos de PDF. Os arquivos são endereçados pelo
+    SHA-256 do conteúdo, então PDFs idênticos são gravados uma única vez.
+    Salvar um conteúdo já gravado renova o timestamp de modificação, que
+    protege o arquivo da limpeza de órfãos (migrar_pdfs.limpar_orfaos)
+    enquanto o registro que o referencia não é confirmado.
+
+    Uma implementação sem algum dos métodos abstratos falha já ao ser
+    instanciada (em obter_armazenamento), não no meio de uma requisição.
+    """
+
+    @abstractmethod
+    def salvar(self, dados):
+        """Grava o conteúdo e retorna o hash SHA-256 (hex) que o identifica."""
+
+    @abstractmethod
+    def salvar_stream(self, fluxo, tamanho_maximo=None):
+        """
+        Grava um upload lendo-o em blocos e validando que é um PDF.
+        Retorna (hash, tamanho); lança ArquivoInvalido se a validação falhar.
+        """
+
+    @abstractmethod
+    def abrir(self, pdf_hash):
+        """Retorna um arquivo binário aberto para leitura."""
+
+    @abstractmethod
+    def existe(self, pdf_hash):
+        ...
+
+    @abstractmethod
+    def remover(self, pdf_hash):
+        ...
+
+    @abstractmethod
+    def listar(self):
+        """Retorna (hash, timestamp de modificação) de todos os arquivos gravados."""
+
+    def caminho_local(self, pdf_hash):
+        """
+        Caminho do arquivo no disco, quando existir. Permite servir o PDF
+        direto do sistema de arquivos (com suporte a Range); armazenamentos
+        remotos retornam None e são lidos por abrir().
+        """
+        return None
+
+
+class ArmazenamentoLocal(ArmazenamentoPDF):
+    """
+    Guarda os PDFs no sistema de arquivos, em subpastas pelos dois primeiros
+    caracteres do hash (ex.: arquivos_pdf/ab/abcdef....pdf).
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def caminho(self, pdf_hash):
+        return os.path.join(self.diretorio, pdf_hash[:2], f"{pdf_hash}.pdf")
+
+    def _reaproveitar(self, destino):
+        """
+        Renova o timestamp de um arquivo já gravado: um órfão antigo que volta
+        a ser referenciado não pode ser removido pela limpeza antes do commit.
+        Retorna False se o arquivo não existe (ou acabou de ser removido).
+        """
+        try:
+            os.utime(destino)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def salvar(self, dados):
+        pdf_hash = hashlib.sha256(dados).hexdigest()
+        destino = self.caminho(pdf_hash)
+        if self._reaproveitar(destino):
+            return pdf_hash
+
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Grava num arquivo temporário da mesma pasta e renomeia: quem lê
+        # nunca encontra um PDF pela metade
+        fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, destino)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return pdf_hash
+
+    def salvar_stream(self, fluxo, tamanho_maximo=None):
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as arquivo:
+                pdf_hash, tamanho = copiar_validando(fluxo, arquivo, tamanho_maximo)
+
+            destino = self.caminho(pdf_hash)
+            if self._reaproveitar(destino):
+                # Mesmo conteúdo já armazenado: descarta a cópia
+                os.remove(temporario)
+            else:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(temporario, destino)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return pdf_hash, tamanho
+
+    def abrir(self, pdf_hash):
+        return open(self.caminho(pdf_hash), "rb")
+
+    def caminho_local(self, pdf_hash):
+        return self.caminho(pdf_hash)
+
+    def existe(self, pdf_hash):
+        return os.path.exists(self.caminho(pdf_hash))
+
+    def remover(self, pdf_hash):
+        try:
+            os.remove(self.caminho(pdf_hash))
+        except FileNotFoundError:
+            pass
+
+    def listar(self):
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if nome.endswith(".pdf"):
+                    caminho = os.path.join(raiz, nome)
+                    yield nome[:-4], os.path.getmtime(caminho)
+
+
+# Implementações disponíveis, escolhidas por PDF_STORAGE_BACKEND no .env
+ARMAZENAMENTOS = {
+    'local': lambda: ArmazenamentoLocal(os.getenv("PDF_STORAGE_DIR", DIRETORIO_PADRAO)),
+}
+
+_armazenamento = None
+_armazenamento_lock = threading.Lock()
+
+
+def obter_armazenamento():
+    global _armazenamento
+    if _armazenamento is None:
+        with _armazenamento_lock:
+            if _armazenamento is None:
+                tipo = os.getenv("PDF_STORAGE_BACKEND", "local")
+                if tipo not in ARMAZENAMENTOS:
+                    raise ValueError(f"Armazenamento de PDF desconhecido: {tipo}")
+                _armazenamento = ARMAZENAMENTOS[tipo]()
+    return _armazenamento
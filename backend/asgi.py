@@ -0,0 +1,337 @@
+"""
+Modo assíncrono (ASGI) da API.
+
+As rotas de leitura mais usadas (/materiaisList, /materiais/codigo/<codigo>,
+/equipamentos e /manutencoes), o envio de solicitações por email e o feed
+/events são atendidos por corrotinas com aiomysql e aiosmtplib: uma consulta
+lenta ou um servidor SMTP lento não prendem uma thread, e um único processo
+mantém milhares de conexões abertas (inclusive SSE) com pouca memória.
+
+As demais rotas continuam sendo as do Flask (Backend.py), montadas via WSGI
+e executadas num pool de threads. As consultas (consultas.py), o JSON, os
+ETags e o cache de respostas são os mesmos nos dois modos.
+
+    pip install uvicorn starlette aiomysql aiosmtplib a2wsgi
+    SERVIDOR_MODO=asgi python servidor.py
+    # ou: uvicorn asgi:app --workers 4
+"""
+import asyncio
+import contextlib
+import functools
+import os
+
+import aiomysql
+import pymysql
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import consultas
+import relatorios
+from agendador import garantir_agendador
+from Backend import app as app_flask, montar_solicitacao
+from cache_respostas import calcular_etag, chave_requisicao, guardar_resposta, resposta_guardada
+from compressao import comprimir_se_aceito
+from consultas import ParametroInvalido
+from db import POOL_CONFIG
+from eventos import transmitir_async
+from exportacao import FormatoIndisponivel
+from fila_email_async import WorkerEmailAsync, enfileirar_email
+from serializacao import codificar_lista, formato_lista
+from versoes import consulta_versoes, montar_versoes
+
+# Conexões assíncronas por processo: cada uma atende muitas requisições
+# seguidas, então bem menos que o número de conexões simultâneas
+TAMANHO_POOL = int(os.getenv("DB_ASYNC_POOL_SIZE", "20"))
+# Threads que executam as rotas do Flask montadas neste processo
+THREADS_WSGI = int(os.getenv("SERVIDOR_THREADS", "8"))
+
+_pool = None
+
+
+async def _criar_pool():
+    return await aiomysql.create_pool(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        db=os.getenv("DB_NAME", "inventario"),
+        minsize=0,  # o servidor sobe mesmo com o banco fora do ar
+        maxsize=TAMANHO_POOL,
+        # Sem autocommit cada leitura abriria uma transação e o pool
+        # descartaria a conexão na devolução
+        autocommit=True,
+        pool_recycle=int(POOL_CONFIG['vida_maxima']),
+    )
+
+
+@contextlib.asynccontextmanager
+async def _cursor():
+    try:
+        conn = await asyncio.wait_for(_pool.acquire(), POOL_CONFIG['timeout_espera'])
+    except asyncio.TimeoutError:
+        raise RuntimeError("Tempo esgotado aguardando uma conexão livre do pool")
+    try:
+        async with conn.cursor() as cursor:
+            yield cursor
+    except BaseException:
+        # Consulta interrompida (ex.: cliente desconectou): o estado da
+        # conexão é incerto, então ela é fechada em vez de voltar ao pool
+        conn.close()
+        raise
+    finally:
+        _pool.release(conn)
+
+
+async def _executar_plano(plano):
+    async with _cursor() as cursor:
+        return await consultas.executar_async(cursor, plano)
+
+
+def _json(dados, status=200):
+    # Mesma serialização do jsonify: respostas (e ETags) iguais às do Flask
+    corpo = app_flask.json.response(dados).get_data()
+    return Response(corpo, status_code=status, media_type="application/json")
+
+
+def _lista(dados, formato, chave=None):
+    corpo, mimetype = codificar_lista(app_flask.json, dados, formato, chave)
+    return Response(corpo, media_type=mimetype)
+
+
+def _formato(request):
+    """Formato pedido, ou a resposta de erro (400/501)."""
+    try:
+        return formato_lista(request.query_params), None
+    except ParametroInvalido as e:
+        return None, _json({"error": str(e)}, 400)
+    except FormatoIndisponivel as e:
+        return None, _json({"error": str(e)}, 501)
+
+
+# ---------- cache (mesmo de cache_respostas.py) ----------
+
+def _etag_confere(cabecalho, etag):
+    if not cabecalho:
+        return False
+    for valor in cabecalho.split(","):
+        valor = valor.strip()
+        if valor == "*" or valor.removeprefix("W/").strip('"') == etag:
+            return True
+    return False
+
+
+def _com_validacao(resposta, etag):
+    resposta.headers["ETag"] = f'"{etag}"'
+    # O navegador guarda a resposta mas sempre revalida com If-None-Match
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta
+
+
+def _comprimida(request, corpo, mimetype, etag):
+    """Resposta 200 validada e comprimida como em compressao.comprimir_resposta."""
+    corpo, codificacao = comprimir_se_aceito(corpo, mimetype, request.headers.get("accept-encoding"))
+    resposta = _com_validacao(Response(corpo, media_type=mimetype), etag)
+    resposta.headers["Vary"] = "Accept-Encoding"
+    if codificacao:
+        resposta.headers["Content-Encoding"] = codificacao
+        resposta.headers["ETag"] = f'W/"{etag}"'
+    return resposta
+
+
+async def _versoes(tabelas):
+    async with _cursor() as cursor:
+        await cursor.execute(*consulta_versoes(tabelas))
+        return montar_versoes(tabelas, await cursor.fetchall())
+
+
+def em_cache(*tabelas, por_dia=False):
+    """Equivalente assíncrono de cache_respostas.em_cache."""
+    def decorador(rota):
+        @functools.wraps(rota)
+        async def rota_em_cache(request):
+            chave = chave_requisicao(request.url.path, request.query_params.multi_items())
+            try:
+                versoes = await _versoes(tabelas)
+            except Exception:
+                # Sem as versões não há como validar: responde sem cache
+                return await rota(request)
+            etag = calcular_etag(chave, versoes, por_dia)
+
+            if _etag_confere(request.headers.get("if-none-match"), etag):
+                return _com_validacao(Response(status_code=304), etag)
+
+            guardada = resposta_guardada(chave, etag)
+            if guardada is not None:
+                return _comprimida(request, *guardada, etag)
+
+            resposta = await rota(request)
+            if resposta.status_code != 200:
+                return resposta
+            guardar_resposta(chave, etag, resposta.body, resposta.media_type)
+            return _comprimida(request, resposta.body, resposta.media_type, etag)
+        return rota_em_cache
+    return decorador
+
+
+# ---------- rotas ----------
+
+@em_cache('materiais')
+async def listar_materiais(request):
+    """Mesma rota de Backend.listar_materiais."""
+    try:
+        plano = consultas.listar_materiais(request.query_params)
+    except ParametroInvalido as e:
+        return _json({"error": str(e)}, 400)
+    formato, erro = _formato(request)
+    if erro is not None:
+        return erro
+
+    try:
+        return _lista(await _executar_plano(plano), formato, "materiais")
+    except pymysql.Error as e:
+        return _json({"error": f"Erro de conexão com banco de dados: {str(e)}"}, 500)
+    except Exception as e:
+        return _json({"error": f"Erro interno do servidor: {str(e)}"}, 500)
+
+
+@em_cache('materiais')
+async def buscar_material_por_codigo(request):
+    codigo = request.path_params["codigo"]
+    try:
+        # Código exato primeiro; senão, o material mais relevante por nome/fabricante
+        materiais = await _executar_plano(consultas.buscar_materiais(codigo.strip(), 1))
+
+        if materiais:
+            return _json(materiais[0])
+        else:
+            return _json({"error": "Material não encontrado"}, 404)
+
+    except pymysql.Error as e:
+        return _json({"error": f"Erro de conexão com banco de dados: {str(e)}"}, 500)
+    except Exception as e:
+        return _json({"error": f"Erro interno do servidor: {str(e)}"}, 500)
+
+
+@em_cache('equipamentos')
+async def listar_equipamentos(request):
+    try:
+        plano = consultas.listar_equipamentos(request.query_params)
+    except ParametroInvalido as e:
+        return _json({"error": str(e)}, 400)
+    formato, erro = _formato(request)
+    if erro is not None:
+        return erro
+
+    try:
+        return _lista(await _executar_plano(plano), formato)
+    except Exception as e:
+        return _json({"error": str(e)}, 500)
+
+
+@em_cache('manutencoes', 'equipamentos')
+async def listar_manutencoes(request):
+    """Mesma rota de Backend.listar_manutencoes."""
+    try:
+        plano = consultas.listar_manutencoes(request.query_params)
+    except ParametroInvalido as e:
+        return _json({"error": str(e)}, 400)
+    formato, erro = _formato(request)
+    if erro is not None:
+        return erro
+
+    try:
+        return _lista(await _executar_plano(plano), formato, "manutencoes")
+    except Exception as e:
+        return _json({"error": str(e)}, 500)
+
+
+async def enviar_solicitacao(request):
+    """Enfileira a solicitação por email; o envio é feito pelo worker assíncrono."""
+    try:
+        data = await request.json()
+        email_destino = data.get("emailFornecedor")
+        mensagem = data.get("mensagem")
+
+        if not email_destino or not mensagem:
+            return _json({"error": "Email destino e mensagem são obrigatórios"}, 400)
+
+        assunto, corpo_html = montar_solicitacao(mensagem)
+        email_id = await enfileirar_email(_pool, email_destino, assunto, corpo_html)
+
+        return _json({"message": "Email enfileirado para envio", "id": email_id}, 202)
+
+    except Exception as e:
+        return _json({"error": f"Erro interno: {str(e)}"}, 500)
+
+
+async def transmitir_eventos(request):
+    """Feed de alterações (SSE); cada conexão aberta é só uma fila do asyncio."""
+    ultimo_id = request.headers.get("last-event-id") or request.query_params.get("ultimo_id")
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        return _json({"error": "Last-Event-ID inválido"}, 400)
+    tabelas = [t for t in request.query_params.get("tabelas", "").split(",") if t]
+
+    return StreamingResponse(
+        transmitir_async(ultimo_id, tabelas, _executar_plano),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------- aplicação ----------
+
+@contextlib.asynccontextmanager
+async def ciclo_de_vida(app):
+    global _pool
+    _pool = await _criar_pool()
+
+    worker = None
+    if os.getenv("EMAIL_WORKER_ATIVO", "1") == "1":
+        worker = WorkerEmailAsync(_pool)
+        worker.iniciar()
+    # Em modo ASGI as rotas acima não passam pelo before_request do Flask
+    garantir_agendador()
+    relatorios.garantir_gerador()
+
+    try:
+        yield
+    finally:
+        if worker is not None:
+            await worker.parar()
+        _pool.close()
+        await _pool.wait_closed()
+
+
+def _montar_wsgi():
+    try:
+        return WSGIMiddleware(app_flask, workers=THREADS_WSGI)
+    except TypeError:
+        # starlette.middleware.wsgi não recebe o número de threads
+        return WSGIMiddleware(app_flask)
+
+
+app = Starlette(
+    routes=[
+        Route("/materiaisList", listar_materiais, methods=["GET"]),
+        Route("/materiais/codigo/{codigo}", buscar_material_por_codigo, methods=["GET"]),
+        Route("/equipamentos", listar_equipamentos, methods=["GET"]),
+        Route("/manutencoes", listar_manutencoes, methods=["GET"]),
+        Route("/enviar-solicitacao", enviar_solicitacao, methods=["POST"]),
+        Route("/events", transmitir_eventos, methods=["GET"]),
+        # Todo o resto (inclusive POST /equipamentos e /manutencoes) é do Flask
+        Mount("/", _montar_wsgi()),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ],
+    lifespan=ciclo_de_vida,
+)
@@ -0,0 +1,125 @@
+"""
+Benchmark de vazão da API: requisições por segundo e latências em
+GET /materiaisList e PATCH /materiais/<id>/baixa, com N clientes
+simultâneos usando conexões keep-alive.
+
+Rode a mesma medição contra o servidor de desenvolvimento e contra o de
+produção (veja SERVIDOR_PRODUCAO.md):
+    python benchmark.py --api http://localhost:5000 --clientes 32 --duracao 30
+    python benchmark.py --cenario baixa --material 9 --quantidade 0.01
+
+A baixa altera o estoque: use um material de teste com estoque suficiente.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def _cenario_lista(args):
+    return "GET", "/materiaisList?limite=50", None
+
+
+def _cenario_baixa(args):
+    if args.material is None:
+        sys.exit("O cenário baixa precisa de --material")
+    corpo = json.dumps({"quantidade": args.quantidade})
+    return "PATCH", f"/materiais/{args.material}/baixa", corpo
+
+
+CENARIOS = {
+    "lista": _cenario_lista,
+    "baixa": _cenario_baixa,
+}
+
+
+def _cliente(endereco, metodo, caminho, corpo, fim, latencias, status, lock):
+    conexao = None
+    minhas_latencias = []
+    meus_status = {}
+    while time.monotonic() < fim:
+        inicio = time.monotonic()
+        try:
+            if conexao is None:
+                conexao = http.client.HTTPConnection(endereco.hostname, endereco.port or 80, timeout=30)
+            conexao.request(metodo, caminho, body=corpo, headers={"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            resposta.read()
+            codigo = resposta.status
+            if resposta.getheader("Connection", "").lower() == "close":
+                conexao.close()
+                conexao = None
+        except (OSError, http.client.HTTPException):
+            codigo = "erro"
+            if conexao is not None:
+                conexao.close()
+            conexao = None
+        minhas_latencias.append(time.monotonic() - inicio)
+        meus_status[codigo] = meus_status.get(codigo, 0) + 1
+
+    if conexao is not None:
+        conexao.close()
+    with lock:
+        latencias.extend(minhas_latencias)
+        for codigo, quantidade in meus_status.items():
+            status[codigo] = status.get(codigo, 0) + quantidade
+
+
+def _percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def executar(args):
+    metodo, caminho, corpo = CENARIOS[args.cenario](args)
+    endereco = urlparse(args.api)
+
+    latencias = []
+    status = {}
+    lock = threading.Lock()
+    fim = time.monotonic() + args.duracao
+    clientes = [
+        threading.Thread(target=_cliente, args=(endereco, metodo, caminho, corpo, fim, latencias, status, lock))
+        for _ in range(args.clientes)
+    ]
+    inicio = time.monotonic()
+    for cliente in clientes:
+        cliente.start()
+    for cliente in clientes:
+        cliente.join()
+    duracao = time.monotonic() - inicio
+
+    if not latencias:
+        sys.exit("Nenhuma requisição concluída")
+    latencias.sort()
+    print(f"{metodo} {caminho} | {args.clientes} clientes | {duracao:.1f}s")
+    print(f"Requisições: {len(latencias)} ({len(latencias) / duracao:.1f} req/s)")
+    print(f"Status: {dict(sorted(status.items(), key=str))}")
+    print("Latência (ms): "
+          f"média {statistics.mean(latencias) * 1000:.1f} | "
+          f"p50 {_percentil(latencias, 50) * 1000:.1f} | "
+          f"p95 {_percentil(latencias, 95) * 1000:.1f} | "
+          f"p99 {_percentil(latencias, 99) * 1000:.1f} | "
+          f"máx {latencias[-1] * 1000:.1f}")
+    falhas = sum(quantidade for codigo, quantidade in status.items() if codigo == "erro" or codigo >= 400)
+    if falhas:
+        print(f"Atenção: {falhas} respostas de erro; a medição não representa o caminho normal")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede requisições por segundo da API")
+    parser.add_argument("--api", default="http://localhost:5000")
+    parser.add_argument("--cenario", choices=sorted(CENARIOS), default="lista")
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de medição")
+    parser.add_argument("--material", type=int, help="material usado no cenário baixa")
+    parser.add_argument("--quantidade", default="0.01",
+                        help="quantidade de cada baixa (a API arredonda para 2 casas; menos que 0.01 vira 400)")
+    executar(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
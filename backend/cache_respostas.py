@@ -0,0 +1,136 @@
+"""
+Cache das respostas das rotas de leitura, validado pelas versões das
+tabelas (versoes.py).
+
+O ETag de uma resposta é derivado da rota, dos parâmetros e das versões
+das tabelas que ela lê: enquanto nenhuma rota de escrita alterar essas
+tabelas o ETag não muda. Uma requisição com If-None-Match igual recebe 304
+sem executar a consulta; as demais são servidas do cache LRU do processo
+quando o ETag guardado ainda vale. O custo de uma requisição repetida fica
+em uma leitura de versoes_tabelas. As rotas do modo assíncrono (asgi.py)
+usam as mesmas chaves, ETags e cache.
+
+Alterações feitas por fora da API (SQL manual) não incrementam as versões;
+depois delas, incremente uma das fatias da tabela em versoes_tabelas.
+"""
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from flask import Response, make_response, request
+
+from db import get_connection
+from versoes import obter_versoes
+
+# Respostas guardadas por processo e tamanho máximo de cada uma
+MAXIMO_ITENS = int(os.getenv("RESPOSTAS_CACHE_ITENS", "256"))
+MAXIMO_BYTES = int(os.getenv("RESPOSTAS_CACHE_MAX_BYTES", str(2 * 1024 * 1024)))
+
+
+class CacheLRU:
+    """Dicionário limitado que descarta o item usado há mais tempo."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+_respostas = CacheLRU(MAXIMO_ITENS)
+
+
+def _versoes(tabelas):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        return obter_versoes(cursor, tabelas)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def chave_requisicao(caminho, argumentos):
+    """Chave da resposta: caminho e parâmetros da query string (pares nome, valor)."""
+    return (caminho, tuple(sorted(argumentos)))
+
+
+def calcular_etag(chave, versoes, por_dia=False):
+    dia = date.today() if por_dia else None
+    return hashlib.sha1(repr((chave, sorted(versoes.items()), dia)).encode("utf-8")).hexdigest()
+
+
+def resposta_guardada(chave, etag):
+    """(corpo, mimetype) guardados para a chave, se ainda valem para o ETag."""
+    guardada = _respostas.obter(chave)
+    if guardada is not None and guardada[0] == etag:
+        return guardada[1], guardada[2]
+    return None
+
+
+def guardar_resposta(chave, etag, corpo, mimetype):
+    if len(corpo) <= MAXIMO_BYTES:
+        _respostas.guardar(chave, (etag, corpo, mimetype))
+
+
+def _com_validacao(resposta, etag):
+    resposta.set_etag(etag)
+    # O navegador guarda a resposta mas sempre revalida com If-None-Match
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta
+
+
+def em_cache(*tabelas, por_dia=False):
+    """
+    Decorator para rotas GET cujo resultado depende apenas dos parâmetros e
+    das tabelas informadas. por_dia=True para rotas que usam a data atual
+    (ex.: vencidos), cujo ETag muda também na virada do dia.
+    """
+    def decorador(rota):
+        @functools.wraps(rota)
+        def rota_em_cache(*args, **kwargs):
+            chave = chave_requisicao(request.path, request.args.items(multi=True))
+            try:
+                versoes = _versoes(tabelas)
+            except Exception:
+                # Sem as versões não há como validar: responde sem cache
+                return rota(*args, **kwargs)
+            etag = calcular_etag(chave, versoes, por_dia)
+
+            # contains_weak: respostas comprimidas levam o ETag como fraco
+            if request.if_none_match.contains_weak(etag):
+                return _com_validacao(Response(status=304), etag)
+
+            guardada = resposta_guardada(chave, etag)
+            if guardada is not None:
+                return _com_validacao(Response(guardada[0], mimetype=guardada[1]), etag)
+
+            # As versões foram lidas antes da consulta: se uma escrita ocorrer
+            # no meio, a resposta fica com o ETag antigo e é refeita depois
+            resposta = make_response(rota(*args, **kwargs))
+            if resposta.status_code != 200 or resposta.is_streamed:
+                return resposta
+            guardar_resposta(chave, etag, resposta.get_data(), resposta.mimetype)
+            return _com_validacao(resposta, etag)
+        return rota_em_cache
+    return decorador
@@ -0,0 +1,103 @@
+"""
+Teste de carga da baixa de estoque: dispara muitas baixas simultâneas no
+mesmo material e confere que:
+- nenhuma se perdeu (estoque final = estoque inicial - soma das baixas aceitas);
+- o estoque nunca ficou negativo (nem no final nem em nenhuma resposta);
+- cada baixa aceita viu um estoque diferente (as baixas foram serializadas).
+
+Com --esgotar, o número de baixas passa do estoque disponível: as baixas
+aceitas têm de ser exatamente as que cabiam no estoque e as demais, recusadas
+com 400.
+
+Use um material de teste e a API rodando:
+    python carga_baixa.py --material 9 --threads 50 --baixas 1000 --quantidade 0.01
+    python carga_baixa.py --material 9 --threads 50 --quantidade 1 --esgotar
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+
+def _requisicao(url, metodo="GET", corpo=None):
+    dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+    req = urllib.request.Request(url, data=dados, method=metodo, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def _estoque(api, material_id):
+    status, material = _requisicao(f"{api}/materiais/{material_id}")
+    if status != 200:
+        sys.exit(f"Material {material_id} não encontrado (HTTP {status})")
+    return Decimal(str(material["estoque_atual"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixas concorrentes em um único material")
+    parser.add_argument("--api", default="http://localhost:5000")
+    parser.add_argument("--material", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--baixas", type=int, default=1000)
+    parser.add_argument("--quantidade", default="0.01")
+    parser.add_argument("--esgotar", action="store_true",
+                        help="dispara mais baixas do que o estoque comporta (ignora --baixas)")
+    args = parser.parse_args()
+
+    quantidade = Decimal(args.quantidade)
+    inicial = _estoque(args.api, args.material)
+    url_baixa = f"{args.api}/materiais/{args.material}/baixa"
+
+    cabem = int(inicial // quantidade)
+    total = cabem + max(args.threads, cabem // 10) if args.esgotar else args.baixas
+
+    def baixa(_):
+        status, corpo = _requisicao(url_baixa, "PATCH", {"quantidade": str(quantidade)})
+        return status, corpo.get("estoque_atual")
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        resultados = list(executor.map(baixa, range(total)))
+    duracao = time.monotonic() - inicio
+
+    status = [s for s, _ in resultados]
+    aceitas = status.count(200)
+    recusadas = status.count(400)
+    erros = len(status) - aceitas - recusadas
+    # Estoques devolvidos pelas baixas aceitas (a coluna tem 2 casas)
+    vistos = [Decimal(str(e)).quantize(Decimal("0.01")) for s, e in resultados if s == 200]
+    final = _estoque(args.api, args.material)
+    esperado = inicial - aceitas * quantidade
+
+    print(f"Estoque inicial: {inicial}")
+    print(f"Baixas: {total} | aceitas: {aceitas} | sem estoque: {recusadas} | erros: {erros}")
+    print(f"Duração: {duracao:.2f}s ({total / duracao:.1f} req/s)")
+    print(f"Estoque final: {final} (esperado: {esperado})")
+
+    falhas = []
+    if final != esperado:
+        falhas.append("baixas perdidas (estoque final diferente do esperado)")
+    if final < 0 or any(e < 0 for e in vistos):
+        falhas.append("estoque negativo")
+    if len(set(vistos)) != len(vistos):
+        falhas.append("duas baixas aceitas viram o mesmo estoque")
+    if args.esgotar and (aceitas != cabem or recusadas != total - cabem):
+        falhas.append(f"esperadas {cabem} baixas aceitas e {total - cabem} recusadas")
+    if erros:
+        falhas.append("erros durante a carga")
+
+    if falhas:
+        print("FALHOU: " + "; ".join(falhas))
+        sys.exit(1)
+    print("OK: nenhuma baixa perdida e o estoque nunca ficou negativo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compressão das respostas (gzip, ou brotli se instalado: pip install brotli).
+
+Respostas 200 de texto, JSON ou MessagePack com pelo menos
+COMPRESSAO_MINIMO bytes são comprimidas quando o cliente aceita
+(Accept-Encoding); abaixo disso o ganho não paga o custo. O ETag de uma
+resposta comprimida passa a ser fraco (W/"..."), como exige o HTTP para
+representações com outra codificação; a validação (If-None-Match) aceita
+as duas formas.
+
+Streams (CSV, /events) e arquivos enviados com send_file não passam por aqui.
+"""
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TAMANHO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))
+NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "6"))
+QUALIDADE_BROTLI = int(os.getenv("COMPRESSAO_QUALIDADE_BROTLI", "5"))
+
+TIPOS_COMPRIMIVEIS = ("application/json", "application/x-msgpack", "text/")
+
+
+def comprimivel(mimetype):
+    return bool(mimetype) and mimetype.startswith(TIPOS_COMPRIMIVEIS)
+
+
+def escolher_codificacao(accept_encoding):
+    """'br', 'gzip' ou None, conforme o cabeçalho Accept-Encoding."""
+    aceitas = {}
+    for parte in (accept_encoding or "").split(","):
+        nome, _, parametro = parte.partition(";")
+        qualidade = 1.0
+        parametro = parametro.strip()
+        if parametro.startswith("q="):
+            try:
+                qualidade = float(parametro[2:])
+            except ValueError:
+                qualidade = 0.0
+        aceitas[nome.strip().lower()] = qualidade
+
+    for codificacao in (("br",) if brotli is not None else ()) + ("gzip",):
+        if aceitas.get(codificacao, aceitas.get("*", 0.0)) > 0:
+            return codificacao
+    return None
+
+
+def comprimir_se_aceito(corpo, mimetype, accept_encoding):
+    """Retorna (corpo, codificação); codificação None se vai sem compressão."""
+    if len(corpo) < TAMANHO_MINIMO or not comprimivel(mimetype):
+        return corpo, None
+    codificacao = escolher_codificacao(accept_encoding)
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI), codificacao
+    if codificacao == "gzip":
+        return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0), codificacao
+    return corpo, None
+
+
+def comprimir_resposta(resposta):
+    """after_request do Flask."""
+    if (resposta.status_code != 200 or resposta.direct_passthrough or resposta.is_streamed
+            or "Content-Encoding" in resposta.headers or not comprimivel(resposta.mimetype)):
+        return resposta
+
+    # Caches intermediários guardam uma versão por Accept-Encoding
+    resposta.vary.add("Accept-Encoding")
+    corpo, codificacao = comprimir_se_aceito(resposta.get_data(), resposta.mimetype,
+                                             request.headers.get("Accept-Encoding"))
+    if codificacao:
+        resposta.set_data(corpo)
+        resposta.headers["Content-Encoding"] = codificacao
+        etag, fraco = resposta.get_etag()
+        if etag and not fraco:
+            resposta.set_etag(etag, weak=True)
+    return resposta
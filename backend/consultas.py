@@ -0,0 +1,440 @@
+"""
+Consultas das rotas de leitura mais usadas, independentes do driver.
+
+Cada consulta é um "plano": um gerador que produz Consulta(sql, parâmetros),
+recebe as linhas de volta (já convertidas pelo mapeador da tabela, ver
+repositorio.py) e, ao final, retorna o corpo da resposta. O mesmo
+plano é executado pelo Flask com o mysql.connector (executar) e pelo modo
+assíncrono com o aiomysql (executar_async, usado em asgi.py), então as duas
+versões das rotas respondem igual.
+
+Os parâmetros são validados ao montar o plano, antes de abrir conexão
+(ParametroInvalido vira 400 nas rotas).
+"""
+import base64
+import json
+from datetime import datetime
+
+import repositorio
+
+# Paginação de /materiaisList
+LIMITE_PADRAO_MATERIAIS = 50
+LIMITE_MAXIMO_MATERIAIS = 500
+
+# Paginação de /manutencoes
+LIMITE_PADRAO_MANUTENCOES = 50
+LIMITE_MAXIMO_MANUTENCOES = 500
+
+# Filtros de /manutencoes que aceitam um ou mais valores separados por vírgula
+FILTROS_MANUTENCOES = ("status", "prioridade", "tipo")
+
+# Campos que ?fields= aceita em cada listagem: nome no JSON -> expressão SQL
+CAMPOS_MATERIAIS = {
+    'id': 'id',
+    'codigo_material': 'codigo_material',
+    'nome': 'nome',
+    'tipo': 'tipo',
+    'fabricante': 'fabricante',
+    'quantidade': 'quantidade',
+    'unidade': 'unidade',
+    'validade': 'validade',
+    'preco': 'preco',
+    'estoque_atual': 'estoque_atual',
+    'estoque_minimo': 'estoque_minimo',
+    'tem_pdf': "CASE WHEN pdf_hash IS NOT NULL OR arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END",
+}
+
+CAMPOS_EQUIPAMENTOS = {campo: campo for campo in (
+    'id', 'codigo', 'nome', 'modelo', 'fabricante', 'numero_serie', 'categoria', 'localizacao',
+    'status', 'data_aquisicao', 'valor_aquisicao', 'garantia_ate', 'especificacoes_tecnicas',
+    'observacoes', 'total_manutencoes', 'manutencoes_pendentes', 'data_criacao', 'data_atualizacao',
+)}
+
+CAMPOS_MANUTENCOES = {campo: f'm.{campo}' for campo in (
+    'id', 'equipamento_id', 'tipo', 'descricao', 'data_agendada', 'data_realizada', 'status',
+    'prioridade', 'responsavel', 'fornecedor', 'custo', 'observacoes', 'data_criacao', 'data_atualizacao',
+)}
+CAMPOS_MANUTENCOES['nome_equipamento'] = 'e.nome'
+CAMPOS_MANUTENCOES['codigo_equipamento'] = 'e.codigo'
+
+# Busca de materiais (leitor de código de barras / digitação)
+COLUNAS_BUSCA_MATERIAL = """
+    id, codigo_material, nome, tipo, fabricante, quantidade, unidade,
+    validade, preco, estoque_atual, estoque_minimo,
+    CASE WHEN pdf_hash IS NOT NULL OR arquivo_pdf IS NOT NULL THEN 1 ELSE 0 END as tem_pdf
+"""
+TAMANHO_MINIMO_FULLTEXT = 2  # ngram_token_size padrão do MySQL
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+class Consulta:
+    """
+    Uma consulta do plano. Com mapeador o plano recebe dicionários, sem ele
+    as tuplas do cursor; unica=True devolve só a primeira linha.
+    """
+
+    def __init__(self, sql, parametros=(), mapeador=None, unica=False):
+        self.sql = sql
+        self.parametros = list(parametros)
+        self.mapeador = mapeador
+        self.unica = unica
+
+    def resultado(self, descricao, linhas):
+        if self.mapeador is None:
+            return linhas
+        if self.unica:
+            return self.mapeador.mapear_uma(descricao, linhas)
+        return self.mapeador.mapear(descricao, linhas)
+
+
+def executar(cursor, plano):
+    """Executa o plano num cursor de tuplas do mysql.connector."""
+    try:
+        consulta = next(plano)
+        while True:
+            cursor.execute(consulta.sql, consulta.parametros)
+            linhas = cursor.fetchone() if consulta.unica else cursor.fetchall()
+            consulta = plano.send(consulta.resultado(cursor.description, linhas))
+    except StopIteration as fim:
+        return fim.value
+
+
+async def executar_async(cursor, plano):
+    """Executa o plano num cursor de tuplas assíncrono (aiomysql.Cursor)."""
+    try:
+        consulta = next(plano)
+        while True:
+            await cursor.execute(consulta.sql, consulta.parametros)
+            linhas = await cursor.fetchone() if consulta.unica else await cursor.fetchall()
+            consulta = plano.send(consulta.resultado(cursor.description, linhas))
+    except StopIteration as fim:
+        return fim.value
+
+
+# ---------- parâmetros ----------
+
+def _codificar_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise ParametroInvalido("Cursor inválido")
+
+
+def _data_parametro(args, nome):
+    valor = args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' deve estar no formato AAAA-MM-DD")
+
+
+def _limite(args, padrao, maximo):
+    try:
+        return min(max(int(args.get("limite", padrao)), 1), maximo)
+    except ValueError as e:
+        raise ParametroInvalido(str(e))
+
+
+def _campos(args, disponiveis, paginacao=()):
+    """
+    Colunas do SELECT para ?fields=campo1,campo2 (projeção), ou None sem o
+    parâmetro. O id vem sempre; os campos da paginação (paginacao) são lidos
+    mesmo sem serem pedidos e voltam em ocultos, para o plano removê-los.
+    Retorna (colunas, ocultos).
+    """
+    if not args.get("fields"):
+        return None, ()
+    pedidos = {campo.strip() for campo in args.get("fields").split(",") if campo.strip()}
+    invalidos = sorted(pedidos - disponiveis.keys())
+    if invalidos:
+        raise ParametroInvalido(f"Campo(s) inválido(s) em 'fields': {', '.join(invalidos)}")
+
+    pedidos.add("id")
+    lidos = [campo for campo in disponiveis if campo in pedidos or campo in paginacao]
+    return _colunas_sql(disponiveis, lidos), tuple(campo for campo in paginacao if campo not in pedidos)
+
+
+def _colunas_sql(disponiveis, campos):
+    return ", ".join(
+        campo if disponiveis[campo] == campo else f"{disponiveis[campo]} AS {campo}" for campo in campos
+    )
+
+
+def _remover_campos(registros, campos):
+    for registro in registros:
+        for campo in campos:
+            del registro[campo]
+
+
+def _posicao_cursor(args):
+    """Valores do último registro da página anterior, ou None na primeira página."""
+    if not args.get("cursor"):
+        return None
+    try:
+        anterior, id_anterior = _decodificar_cursor(args.get("cursor"))
+    except (ValueError, TypeError):
+        raise ParametroInvalido("Cursor inválido")
+    return anterior, id_anterior
+
+
+# ---------- materiais ----------
+
+def _filtros_materiais(args):
+    """
+    Monta as condições WHERE de /materiaisList a partir da query string.
+    Retorna (lista de condições, lista de parâmetros).
+    """
+    condicoes = []
+    parametros = []
+
+    if args.get("tipo"):
+        condicoes.append("tipo = %s")
+        parametros.append(args.get("tipo"))
+    if args.get("fabricante"):
+        condicoes.append("fabricante = %s")
+        parametros.append(args.get("fabricante"))
+
+    validade_de = _data_parametro(args, "validade_de")
+    if validade_de:
+        condicoes.append("validade >= %s")
+        parametros.append(validade_de)
+    validade_ate = _data_parametro(args, "validade_ate")
+    if validade_ate:
+        condicoes.append("validade <= %s")
+        parametros.append(validade_ate)
+
+    if args.get("estoque_baixo") in ("1", "true"):
+        condicoes.append("estoque_atual <= estoque_minimo")
+
+    return condicoes, parametros
+
+
+def listar_materiais(args):
+    """
+    Plano de /materiaisList: materiais ordenados por nome, paginados por
+    cursor (nome, id).
+    """
+    limite = _limite(args, LIMITE_PADRAO_MATERIAIS, LIMITE_MAXIMO_MATERIAIS)
+    condicoes, parametros = _filtros_materiais(args)
+    colunas, ocultos = _campos(args, CAMPOS_MATERIAIS, paginacao=("nome",))
+
+    condicoes_pagina = list(condicoes)
+    parametros_pagina = list(parametros)
+    posicao = _posicao_cursor(args)
+    if posicao:
+        nome_cursor, id_cursor = posicao
+        # Keyset: continua logo após o último (nome, id) da página anterior
+        condicoes_pagina.append("(nome > %s OR (nome = %s AND id > %s))")
+        parametros_pagina.extend([nome_cursor, nome_cursor, id_cursor])
+
+    return _plano_lista_materiais(limite, condicoes, parametros, condicoes_pagina, parametros_pagina,
+                                  args.get("incluir_total") in ("1", "true"), colunas, ocultos)
+
+
+def _plano_lista_materiais(limite, condicoes, parametros, condicoes_pagina, parametros_pagina, incluir_total,
+                           colunas, ocultos):
+    # Colunas explícitas: o blob arquivo_pdf nunca é lido
+    if colunas is None:
+        colunas = _colunas_sql(CAMPOS_MATERIAIS, CAMPOS_MATERIAIS)
+    query = f"SELECT {colunas} FROM materiais"
+    if condicoes_pagina:
+        query += " WHERE " + " AND ".join(condicoes_pagina)
+    # Busca um registro a mais para saber se existe próxima página
+    query += " ORDER BY nome ASC, id ASC LIMIT %s"
+    materiais = yield Consulta(query, parametros_pagina + [limite + 1], repositorio.MATERIAL_LISTA)
+
+    proximo_cursor = None
+    if len(materiais) > limite:
+        materiais = materiais[:limite]
+        proximo_cursor = _codificar_cursor([materiais[-1]['nome'], materiais[-1]['id']])
+    _remover_campos(materiais, ocultos)
+
+    resposta = {
+        "materiais": materiais,
+        "proximo_cursor": proximo_cursor
+    }
+
+    if incluir_total:
+        query_total = "SELECT COUNT(*) FROM materiais"
+        if condicoes:
+            query_total += " WHERE " + " AND ".join(condicoes)
+        resposta["total"] = (yield Consulta(query_total, parametros, unica=True))[0]
+
+    return resposta
+
+
+def buscar_materiais(termo, limite):
+    """
+    Plano da busca de materiais em uma única consulta, em ordem de relevância:
+    código exato (índice único), depois nome e fabricante (índices FULLTEXT
+    ngram, mantidos pelo próprio InnoDB a cada insert/update/delete).
+    """
+    if len(termo) < TAMANHO_MINIMO_FULLTEXT:
+        # Termos curtos demais para o ngram: prefixo do nome (usa o índice de nome)
+        linhas = yield Consulta(f"""
+            (SELECT {COLUNAS_BUSCA_MATERIAL}, 0 AS prioridade, 0 AS relevancia
+             FROM materiais WHERE codigo_material = %s)
+            UNION ALL
+            (SELECT {COLUNAS_BUSCA_MATERIAL}, 1 AS prioridade, 0 AS relevancia
+             FROM materiais WHERE nome LIKE %s ORDER BY nome LIMIT %s)
+            ORDER BY prioridade, nome
+            LIMIT %s
+        """, (termo, termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%", limite, limite),
+            repositorio.MATERIAL)
+    else:
+        # Frase entre aspas: no parser ngram equivale a buscar o trecho
+        frase = '"' + termo.replace('"', ' ') + '"'
+        linhas = yield Consulta(f"""
+            (SELECT {COLUNAS_BUSCA_MATERIAL}, 0 AS prioridade, 0 AS relevancia
+             FROM materiais WHERE codigo_material = %s)
+            UNION ALL
+            (SELECT {COLUNAS_BUSCA_MATERIAL}, 1 AS prioridade,
+                    MATCH(nome) AGAINST (%s IN BOOLEAN MODE) AS relevancia
+             FROM materiais WHERE MATCH(nome) AGAINST (%s IN BOOLEAN MODE)
+             ORDER BY relevancia DESC LIMIT %s)
+            UNION ALL
+            (SELECT {COLUNAS_BUSCA_MATERIAL}, 2 AS prioridade,
+                    MATCH(fabricante) AGAINST (%s IN BOOLEAN MODE) AS relevancia
+             FROM materiais WHERE MATCH(fabricante) AGAINST (%s IN BOOLEAN MODE)
+             ORDER BY relevancia DESC LIMIT %s)
+            ORDER BY prioridade, relevancia DESC, nome
+            LIMIT %s
+        """, (termo, frase, frase, limite, frase, frase, limite, limite * 3), repositorio.MATERIAL)
+
+    # Um material pode aparecer em mais de um critério: mantém o mais relevante
+    materiais = []
+    vistos = set()
+    for material in linhas:
+        if material['id'] in vistos:
+            continue
+        vistos.add(material['id'])
+        del material['prioridade'], material['relevancia']
+        materiais.append(material)
+        if len(materiais) == limite:
+            break
+    return materiais
+
+
+# ---------- equipamentos ----------
+
+def listar_equipamentos(args):
+    """Plano de /equipamentos (fields= limita as colunas lidas)."""
+    colunas, _ = _campos(args, CAMPOS_EQUIPAMENTOS)
+    return _plano_lista_equipamentos(colunas or "*")
+
+
+def _plano_lista_equipamentos(colunas):
+    # total_manutencoes e manutencoes_pendentes são mantidos pelas rotas
+    # de manutenção (contadores.py), sem agregar a tabela manutencoes
+    query = f"SELECT {colunas} FROM equipamentos ORDER BY nome ASC"
+    return (yield Consulta(query, mapeador=repositorio.EQUIPAMENTO))
+
+
+# ---------- manutenções ----------
+
+def _filtros_manutencoes(args):
+    """
+    Monta as condições WHERE de /manutencoes a partir da query string.
+    Retorna (lista de condições, lista de parâmetros).
+    """
+    condicoes = []
+    parametros = []
+
+    for filtro in FILTROS_MANUTENCOES:
+        valores = [v for v in (args.get(filtro) or "").split(",") if v]
+        if len(valores) == 1:
+            condicoes.append(f"m.{filtro} = %s")
+            parametros.append(valores[0])
+        elif valores:
+            condicoes.append(f"m.{filtro} IN ({', '.join(['%s'] * len(valores))})")
+            parametros.extend(valores)
+
+    if args.get("equipamento_id"):
+        try:
+            parametros.append(int(args.get("equipamento_id")))
+        except ValueError:
+            raise ParametroInvalido("Parâmetro 'equipamento_id' deve ser um número")
+        condicoes.append("m.equipamento_id = %s")
+
+    data_de = _data_parametro(args, "data_de")
+    if data_de:
+        condicoes.append("m.data_agendada >= %s")
+        parametros.append(data_de)
+    data_ate = _data_parametro(args, "data_ate")
+    if data_ate:
+        condicoes.append("m.data_agendada <= %s")
+        parametros.append(data_ate)
+
+    return condicoes, parametros
+
+
+def listar_manutencoes(args):
+    """
+    Plano de /manutencoes: manutenções por data agendada (sem data
+    primeiro), paginadas por cursor (data_agendada, id).
+    """
+    limite = _limite(args, LIMITE_PADRAO_MANUTENCOES, LIMITE_MAXIMO_MANUTENCOES)
+    condicoes, parametros = _filtros_manutencoes(args)
+    colunas, ocultos = _campos(args, CAMPOS_MANUTENCOES, paginacao=("data_agendada",))
+
+    condicoes_pagina = list(condicoes)
+    parametros_pagina = list(parametros)
+    posicao = _posicao_cursor(args)
+    if posicao:
+        data_cursor, id_cursor = posicao
+        # Keyset: continua logo após o último (data_agendada, id); no MySQL
+        # NULL vem antes de qualquer data na ordem crescente
+        if data_cursor is None:
+            condicoes_pagina.append("(m.data_agendada IS NOT NULL OR m.id > %s)")
+            parametros_pagina.append(id_cursor)
+        else:
+            condicoes_pagina.append("(m.data_agendada > %s OR (m.data_agendada = %s AND m.id > %s))")
+            parametros_pagina.extend([data_cursor, data_cursor, id_cursor])
+
+    return _plano_lista_manutencoes(limite, condicoes, parametros, condicoes_pagina, parametros_pagina,
+                                    args.get("incluir_total") in ("1", "true"), colunas, ocultos)
+
+
+def _plano_lista_manutencoes(limite, condicoes, parametros, condicoes_pagina, parametros_pagina, incluir_total,
+                             colunas, ocultos):
+    if colunas is None:
+        colunas = "m.*, e.nome as nome_equipamento, e.codigo as codigo_equipamento"
+    query = f"""
+    SELECT {colunas}
+    FROM manutencoes m
+    JOIN equipamentos e ON m.equipamento_id = e.id
+    """
+    if condicoes_pagina:
+        query += " WHERE " + " AND ".join(condicoes_pagina)
+    # Busca um registro a mais para saber se existe próxima página
+    query += " ORDER BY m.data_agendada ASC, m.id ASC LIMIT %s"
+    manutencoes = yield Consulta(query, parametros_pagina + [limite + 1], repositorio.MANUTENCAO)
+
+    proximo_cursor = None
+    if len(manutencoes) > limite:
+        manutencoes = manutencoes[:limite]
+        # data_agendada já vem como "AAAA-MM-DD" (ou None)
+        proximo_cursor = _codificar_cursor([manutencoes[-1]['data_agendada'], manutencoes[-1]['id']])
+    _remover_campos(manutencoes, ocultos)
+
+    resposta = {
+        "manutencoes": manutencoes,
+        "proximo_cursor": proximo_cursor
+    }
+
+    if incluir_total:
+        query_total = "SELECT COUNT(*) FROM manutencoes m"
+        if condicoes:
+            query_total += " WHERE " + " AND ".join(condicoes)
+        resposta["total"] = (yield Consulta(query_total, parametros, unica=True))[0]
+
+    return resposta
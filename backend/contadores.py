@@ -0,0 +1,88 @@
+"""
+Contadores de manutenções por equipamento (total_manutencoes e
+manutencoes_pendentes). São mantidos pelas rotas de manutenção na mesma
+transação da alteração, então a listagem de equipamentos não precisa
+agregar a tabela de manutenções.
+
+Para reconstruir os contadores a partir das manutenções:
+    python contadores.py
+    python contadores.py --equipamento 3
+"""
+import argparse
+
+from db import get_connection
+from eventos import registrar_alteracao
+from versoes import incrementar_versao
+
+# Status que conta como manutenção pendente
+STATUS_PENDENTE = 'agendada'
+
+
+def pendente(status):
+    return 1 if status == STATUS_PENDENTE else 0
+
+
+def ajustar_contadores(cursor, equipamento_id, total=0, pendentes=0):
+    """
+    Soma os deltas aos contadores do equipamento dentro da transação do
+    chamador. Retorna False se o equipamento não existe.
+    """
+    if not total and not pendentes:
+        return True
+    cursor.execute("""
+        UPDATE equipamentos
+        SET total_manutencoes = total_manutencoes + %s,
+            manutencoes_pendentes = manutencoes_pendentes + %s
+        WHERE id = %s
+    """, (total, pendentes, equipamento_id))
+    return cursor.rowcount > 0
+
+
+def reconciliar_contadores(cursor, equipamento_id=None):
+    """
+    Recalcula os contadores a partir de manutencoes, na transação do
+    chamador. Retorna quantos equipamentos estavam divergentes.
+    """
+    filtro = "WHERE e.id = %s" if equipamento_id is not None else ""
+    cursor.execute(f"""
+        UPDATE equipamentos e
+        LEFT JOIN (
+            SELECT equipamento_id,
+                   COUNT(*) AS total,
+                   SUM(status = %s) AS pendentes
+            FROM manutencoes
+            GROUP BY equipamento_id
+        ) m ON m.equipamento_id = e.id
+        SET e.total_manutencoes = COALESCE(m.total, 0),
+            e.manutencoes_pendentes = COALESCE(m.pendentes, 0)
+        {filtro}
+    """, (STATUS_PENDENTE,) + ((equipamento_id,) if equipamento_id is not None else ()))
+    corrigidos = cursor.rowcount
+    if corrigidos:
+        # Sem isso o cache das listagens (em_cache) continuaria servindo
+        # os contadores antigos até a próxima alteração em equipamentos
+        incrementar_versao(cursor, 'equipamentos')
+        registrar_alteracao(cursor, 'equipamentos', 'atualizacao',
+                            *((equipamento_id,) if equipamento_id is not None else ()))
+    return corrigidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói os contadores de manutenções dos equipamentos")
+    parser.add_argument("--equipamento", type=int, help="reconciliar apenas este equipamento")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        corrigidos = reconciliar_contadores(cursor, args.equipamento)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"Equipamentos com contadores corrigidos: {corrigidos}")
+
+
+if __name__ == "__main__":
+    main()
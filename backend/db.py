@@ -1,13 +1,208 @@
 import mysql.connector
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connection():
+# Configuração do pool de conexões (pode ser ajustada pelo .env)
+POOL_CONFIG = {
+    'tamanho': int(os.getenv("DB_POOL_SIZE", "5")),              # conexões mantidas abertas
+    'overflow': int(os.getenv("DB_POOL_OVERFLOW", "10")),        # conexões extras em picos
+    'timeout_espera': float(os.getenv("DB_POOL_TIMEOUT", "10")), # segundos esperando uma conexão livre
+    'vida_maxima': float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),  # segundos até reciclar a conexão
+    'verificar_apos': float(os.getenv("DB_POOL_PING_AFTER", "30")),   # ociosidade que exige ping no empréstimo
+}
+
+
+def _nova_conexao():
     return mysql.connector.connect(
         host=os.getenv("DB_HOST", "localhost"),
         user=os.getenv("DB_USER", "root"),
         password=os.getenv("DB_PASSWORD", ""),
         database=os.getenv("DB_NAME", "inventario")
     )
+
+
+class ConexaoDoPool:
+    """
+    Envolve uma conexão do mysql.connector. O close() devolve a conexão ao
+    pool em vez de encerrá-la; o restante é repassado à conexão real.
+    """
+
+    def __init__(self, pool, conexao, criada_em):
+        self._pool = pool
+        self._conexao = conexao
+        self._criada_em = criada_em
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def close(self):
+        if not self._devolvida:
+            self._devolvida = True
+            self._pool._devolver(self._conexao, self._criada_em)
+
+
+class PoolDeConexoes:
+    """
+    Pool de conexões MySQL com overflow, verificação no empréstimo,
+    tempo de vida máximo e descarte de conexões com erro.
+    """
+
+    def __init__(self, tamanho, overflow, timeout_espera, vida_maxima, verificar_apos):
+        self.tamanho = tamanho
+        self.overflow = overflow
+        self.timeout_espera = timeout_espera
+        self.vida_maxima = vida_maxima
+        self.verificar_apos = verificar_apos
+
+        self._ociosas = []  # (conexao, criada_em, devolvida_em)
+        self._abertas = 0
+        self._condicao = threading.Condition()
+
+        self._estatisticas = {
+            'emprestimos': 0,
+            'esperas': 0,
+            'tempo_espera_total_ms': 0.0,
+            'tempo_espera_max_ms': 0.0,
+            'timeouts': 0,
+            'conexoes_criadas': 0,
+            'conexoes_descartadas': 0,
+        }
+
+    def obter(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout_espera
+        esperou = False
+
+        with self._condicao:
+            while True:
+                if self._ociosas:
+                    conexao, criada_em, devolvida_em = self._ociosas.pop()
+                    break
+                if self._abertas < self.tamanho + self.overflow:
+                    self._abertas += 1
+                    conexao = None
+                    break
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._estatisticas['timeouts'] += 1
+                    raise mysql.connector.errors.PoolError(
+                        "Nenhuma conexão disponível no pool (tempo de espera esgotado)"
+                    )
+                esperou = True
+                self._condicao.wait(restante)
+
+            espera_ms = (time.monotonic() - inicio) * 1000
+            self._estatisticas['emprestimos'] += 1
+            if esperou:
+                self._estatisticas['esperas'] += 1
+            self._estatisticas['tempo_espera_total_ms'] += espera_ms
+            self._estatisticas['tempo_espera_max_ms'] = max(self._estatisticas['tempo_espera_max_ms'], espera_ms)
+
+        # Conexões ociosas são verificadas fora do lock para não bloquear o pool
+        if conexao is not None:
+            agora = time.monotonic()
+            if agora - criada_em > self.vida_maxima:
+                self._descartar(conexao)
+                conexao = None
+            elif agora - devolvida_em > self.verificar_apos:
+                try:
+                    conexao.ping(reconnect=False)
+                except mysql.connector.Error:
+                    self._descartar(conexao)
+                    conexao = None
+
+        if conexao is None:
+            try:
+                conexao = _nova_conexao()
+            except Exception:
+                with self._condicao:
+                    self._abertas -= 1
+                    self._condicao.notify()
+                raise
+            criada_em = time.monotonic()
+            with self._condicao:
+                self._estatisticas['conexoes_criadas'] += 1
+
+        return ConexaoDoPool(self, conexao, criada_em)
+
+    def _devolver(self, conexao, criada_em):
+        # Transações abertas (ou erro no meio de uma consulta) são desfeitas;
+        # se nem isso funcionar, a conexão é descartada.
+        reutilizavel = True
+        try:
+            if conexao.unread_result:
+                conexao.consume_results()
+            if conexao.in_transaction:
+                conexao.rollback()
+        except Exception:
+            reutilizavel = False
+
+        if reutilizavel and time.monotonic() - criada_em > self.vida_maxima:
+            reutilizavel = False
+
+        with self._condicao:
+            if reutilizavel and len(self._ociosas) < self.tamanho:
+                self._ociosas.append((conexao, criada_em, time.monotonic()))
+                self._condicao.notify()
+                return
+
+        self._fechar(conexao)
+
+    def _descartar(self, conexao):
+        # Encerra a conexão mas mantém a vaga reservada (será aberta outra)
+        try:
+            conexao.close()
+        except Exception:
+            pass
+        with self._condicao:
+            self._estatisticas['conexoes_descartadas'] += 1
+
+    def _fechar(self, conexao):
+        self._descartar(conexao)
+        with self._condicao:
+            self._abertas -= 1
+            self._condicao.notify()
+
+    def estatisticas(self):
+        with self._condicao:
+            dados = dict(self._estatisticas)
+            dados.update({
+                'tamanho': self.tamanho,
+                'overflow': self.overflow,
+                'abertas': self._abertas,
+                'ociosas': len(self._ociosas),
+                'em_uso': self._abertas - len(self._ociosas),
+            })
+        emprestimos = dados['emprestimos']
+        dados['tempo_espera_medio_ms'] = dados['tempo_espera_total_ms'] / emprestimos if emprestimos else 0.0
+        return dados
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool():
+    global _pool, _pool_pid
+    # Um processo filho (fork) não pode reaproveitar os sockets do pai
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PoolDeConexoes(**POOL_CONFIG)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_connection():
+    return _obter_pool().obter()
+
+
+def get_pool_stats():
+    return _obter_pool().estatisticas()
@@ -1,10 +1,19 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Configurações de Email
 # Substitua os valores abaixo pelas suas credenciais reais
+# (ou defina SMTP_SERVER, SMTP_PORT, SMTP_STARTTLS e SMTP_LOGIN no .env,
+# por exemplo para apontar para um servidor SMTP local de testes)
 
 EMAIL_CONFIG = {
     # Para Gmail
-    'smtp_server': 'smtp.gmail.com',
-    'smtp_port': 587,
+    'smtp_server': os.getenv("SMTP_SERVER", 'smtp.gmail.com'),
+    'smtp_port': int(os.getenv("SMTP_PORT", "587")),
+    'usar_starttls': os.getenv("SMTP_STARTTLS", "1") == "1",
+    'usar_login': os.getenv("SMTP_LOGIN", "1") == "1",
     
     # SUAS CREDENCIAIS - SUBSTITUA AQUi
     'sender_email': 'dsmtablets2@gmail.com ',  # Seu email Gmail
@@ -12,6 +21,15 @@ EMAIL_CONFIG = {
     'sender_name': 'Sistema de Laboratório'
 }
 
+# Fila de envio (fila_email.py)
+FILA_EMAIL_CONFIG = {
+    'max_tentativas': int(os.getenv("EMAIL_MAX_TENTATIVAS", "5")),
+    'espera_inicial': int(os.getenv("EMAIL_ESPERA_INICIAL", "30")),   # segundos antes da 1ª nova tentativa
+    'espera_maxima': int(os.getenv("EMAIL_ESPERA_MAXIMA", "3600")),   # teto do backoff exponencial
+    'intervalo_verificacao': float(os.getenv("EMAIL_INTERVALO", "5")),  # segundos entre verificações da fila
+    'smtp_ocioso': float(os.getenv("EMAIL_SMTP_OCIOSO", "60")),       # fecha a sessão SMTP após esse tempo parada
+}
+
 # INSTRUÇÕES PARA CONFIGURAR O GMAIL:
 # 1. Ative a verificação em duas etapas na sua conta Google
 # 2. Gere uma "Senha de app" específica para este sistema:
@@ -0,0 +1,375 @@
+"""
+Feed de alterações para os clientes (Server-Sent Events em /events).
+
+As rotas de escrita chamam registrar_alteracao() na mesma transação da
+alteração, gravando em eventos_alteracoes (tabela, id do registro,
+operação e a nova versão da tabela). Em cada processo uma única thread
+lê os eventos novos a cada EVENTOS_INTERVALO segundos e os distribui para
+as filas das conexões abertas: conexões ociosas não fazem consultas ao
+banco, e alterações feitas por qualquer processo chegam a todos.
+
+Um cliente que reconecta com Last-Event-ID recebe os eventos perdidos;
+se não for possível (muitos eventos ou já removidos pela retenção) recebe
+um evento "reset" e deve recarregar tudo.
+
+transmitir() ocupa uma thread por conexão (Flask); por isso cada processo
+WSGI aceita no máximo EVENTOS_MAXIMO_CONEXOES conexões abertas (padrão: um
+quarto de SERVIDOR_THREADS) e responde 503 acima disso, deixando as demais
+threads para a API. transmitir_async() é a versão do modo assíncrono
+(asgi.py), sem esse limite: as conexões abertas são apenas filas do
+asyncio alimentadas pela mesma thread de leitura.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+
+from consultas import Consulta, executar
+from db import get_connection
+from versoes import obter_versoes
+
+OPERACOES = ('criacao', 'atualizacao', 'exclusao')
+
+# Segundos entre leituras de eventos novos
+INTERVALO = float(os.getenv("EVENTOS_INTERVALO", "1"))
+# Segundos sem eventos até enviar um comentário (mantém a conexão e detecta clientes que saíram)
+HEARTBEAT = float(os.getenv("EVENTOS_HEARTBEAT", "15"))
+# Horas que os eventos ficam guardados para reconexões
+RETENCAO_HORAS = int(os.getenv("EVENTOS_RETENCAO_HORAS", "24"))
+# Conexões abertas por processo no modo WSGI (cada uma prende uma thread)
+MAXIMO_CONEXOES_WSGI = int(os.getenv(
+    "EVENTOS_MAXIMO_CONEXOES", str(max(1, int(os.getenv("SERVIDOR_THREADS", "8")) // 4))))
+
+# Eventos reenviados a uma reconexão; acima disso o cliente recebe "reset"
+MAXIMO_REENVIO = 1000
+# Eventos pendentes por conexão; um cliente lento demais recebe "reset"
+TAMANHO_FILA = 1000
+# Segundos que um id pulado (transação ainda não confirmada) é aguardado
+ESPERA_LACUNA = 10
+# Segundos entre limpezas dos eventos antigos
+INTERVALO_LIMPEZA = 3600
+
+RESET = object()
+
+_vagas_wsgi = threading.BoundedSemaphore(MAXIMO_CONEXOES_WSGI)
+
+
+def reservar_conexao():
+    """Reserva uma vaga para um stream WSGI; False se o limite foi atingido."""
+    return _vagas_wsgi.acquire(blocking=False)
+
+
+def liberar_conexao():
+    _vagas_wsgi.release()
+
+
+def registrar_alteracao(cursor, tabela, operacao, *registro_ids):
+    """
+    Registra a alteração na transação do chamador, depois de
+    incrementar_versao(cursor, tabela). Sem registro_ids, o evento vale
+    para a tabela inteira (ex.: importação, exclusão em cascata).
+    """
+    versao = obter_versoes(cursor, [tabela])[tabela]
+    cursor.executemany("""
+        INSERT INTO eventos_alteracoes (tabela, registro_id, operacao, versao)
+        VALUES (%s, %s, %s, %s)
+    """, [(tabela, registro_id, operacao, versao) for registro_id in (registro_ids or (None,))])
+
+
+def _formatar(evento_id, tabela, registro_id, operacao, versao):
+    dados = json.dumps({"tabela": tabela, "id": registro_id, "operacao": operacao, "versao": versao})
+    return f"id: {evento_id}\nevent: alteracao\ndata: {dados}\n\n"
+
+
+def _formatar_reset():
+    return "event: reset\ndata: {}\n\n"
+
+
+class Assinatura:
+    """
+    Fila de uma conexão. ultimo_id é o Last-Event-ID da reconexão: o
+    distribuidor parado volta a ler a partir do menor ultimo_id das
+    conexões abertas.
+    """
+
+    def __init__(self, tabelas, ultimo_id=None):
+        self.tabelas = tabelas
+        self.ultimo_id = ultimo_id
+        self.fila = queue.Queue(maxsize=TAMANHO_FILA)
+
+    def entregar(self, evento):
+        if self.tabelas and evento[1] not in self.tabelas:
+            return
+        self._colocar(evento)
+
+    def _colocar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            # Cliente não acompanha: descarta o atrasado e pede recarga
+            while True:
+                try:
+                    self.fila.get_nowait()
+                except queue.Empty:
+                    break
+            self.fila.put_nowait(RESET)
+
+
+class AssinaturaAsync(Assinatura):
+    """Assinatura lida por uma corrotina: a entrega é feita no loop do asyncio."""
+
+    def __init__(self, tabelas, loop, ultimo_id=None):
+        super().__init__(tabelas, ultimo_id)
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self._loop = loop
+
+    def _colocar(self, evento):
+        # Chamado pela thread do distribuidor; asyncio.Queue não é thread-safe
+        try:
+            self._loop.call_soon_threadsafe(self._colocar_no_loop, evento)
+        except RuntimeError:
+            pass  # loop já encerrado
+
+    def _colocar_no_loop(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(RESET)
+
+
+class DistribuidorEventos:
+    """Thread que lê eventos_alteracoes e entrega às conexões deste processo."""
+
+    def __init__(self):
+        self._assinaturas = set()
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._ultimo = None
+        self._lacunas = {}
+        self._proxima_limpeza = 0
+
+    def assinar(self, tabelas, ultimo_id=None):
+        return self.registrar(Assinatura(tabelas, ultimo_id))
+
+    def registrar(self, assinatura):
+        self._garantir_thread()
+        with self._condicao:
+            self._assinaturas.add(assinatura)
+            self._condicao.notify()
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._condicao:
+            self._assinaturas.discard(assinatura)
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem a um fork: cada processo precisa da sua
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._condicao:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._assinaturas = set()
+                self._ultimo = None
+                self._lacunas = {}
+                self._thread = threading.Thread(target=self._executar, name="eventos", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _iniciar(self, cursor):
+        """
+        Posição inicial da leitura, quando o distribuidor estava parado.
+
+        Começa no menor Last-Event-ID das conexões abertas (o reenvio de
+        transmitir() e esta leitura se sobrepõem, sem buraco entre os dois)
+        ou, sem reconexões, no último evento existente. Os ids que faltam
+        logo abaixo do início podem ser de transações ainda não confirmadas
+        e entram nas lacunas.
+        """
+        with self._condicao:
+            pedidos = [a.ultimo_id for a in self._assinaturas if a.ultimo_id is not None]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM eventos_alteracoes")
+        maximo = cursor.fetchone()[0]
+        # Quem pediu mais que MAXIMO_REENVIO eventos recebeu "reset"
+        inicio = max(min(pedidos + [maximo]), maximo - MAXIMO_REENVIO, 0)
+
+        cursor.execute("""
+            SELECT id FROM eventos_alteracoes WHERE id > %s AND id <= %s
+        """, (max(inicio - MAXIMO_REENVIO, 0), inicio))
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        agora = time.monotonic()
+        self._lacunas = {i: agora for i in range(max(inicio - MAXIMO_REENVIO, 0) + 1, inicio + 1)
+                         if i not in existentes}
+        self._ultimo = inicio
+
+    def _ler_novos(self, cursor):
+        if self._ultimo is None:
+            self._iniciar(cursor)
+
+        # Ids são reservados no INSERT mas ficam visíveis no commit: um id
+        # pulado pode aparecer depois, então é procurado por ESPERA_LACUNA
+        agora = time.monotonic()
+        self._lacunas = {i: t for i, t in self._lacunas.items() if agora - t < ESPERA_LACUNA}
+        inicio = min(self._lacunas) - 1 if self._lacunas else self._ultimo
+        cursor.execute("""
+            SELECT id, tabela, registro_id, operacao, versao FROM eventos_alteracoes
+            WHERE id > %s ORDER BY id
+        """, (inicio,))
+
+        novos = []
+        for evento in cursor.fetchall():
+            evento_id = evento[0]
+            if evento_id <= self._ultimo:
+                if self._lacunas.pop(evento_id, None) is None:
+                    continue
+            else:
+                for pulado in range(self._ultimo + 1, evento_id):
+                    self._lacunas[pulado] = agora
+                self._ultimo = evento_id
+            novos.append(evento)
+        return novos
+
+    def _limpar_antigos(self, cursor, conn):
+        if time.monotonic() < self._proxima_limpeza:
+            return
+        self._proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+        cursor.execute("""
+            DELETE FROM eventos_alteracoes
+            WHERE data_evento < NOW() - INTERVAL %s HOUR
+            LIMIT 10000
+        """, (RETENCAO_HORAS,))
+        conn.commit()
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                # Sem conexões abertas não há o que ler; volta a ler do
+                # último evento existente quando alguém se conectar
+                while not self._assinaturas:
+                    self._ultimo = None
+                    self._condicao.wait()
+
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                try:
+                    novos = self._ler_novos(cursor)
+                    self._limpar_antigos(cursor, conn)
+                finally:
+                    cursor.close()
+                    conn.close()
+
+                if novos:
+                    with self._condicao:
+                        assinaturas = list(self._assinaturas)
+                    for assinatura in assinaturas:
+                        for evento in novos:
+                            assinatura.entregar(evento)
+            except Exception as e:
+                print(f"Erro ao ler eventos de alterações: {e}")
+
+            time.sleep(INTERVALO)
+
+
+_distribuidor = DistribuidorEventos()
+
+
+def _plano_eventos_desde(ultimo_id, tabelas):
+    """Eventos após ultimo_id, ou None se não for possível reenviar todos."""
+    menor = (yield Consulta("SELECT MIN(id) FROM eventos_alteracoes", unica=True))[0]
+    if menor is not None and menor > ultimo_id + 1:
+        # Eventos posteriores ao do cliente já foram removidos
+        return None
+
+    filtro = f"AND tabela IN ({', '.join(['%s'] * len(tabelas))})" if tabelas else ""
+    eventos = yield Consulta(f"""
+        SELECT id, tabela, registro_id, operacao, versao FROM eventos_alteracoes
+        WHERE id > %s {filtro}
+        ORDER BY id LIMIT %s
+    """, [ultimo_id] + list(tabelas) + [MAXIMO_REENVIO + 1])
+
+    return eventos if len(eventos) <= MAXIMO_REENVIO else None
+
+
+def _eventos_desde(ultimo_id, tabelas):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        return executar(cursor, _plano_eventos_desde(ultimo_id, tabelas))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def transmitir(ultimo_id=None, tabelas=()):
+    """
+    Gerador do stream SSE. ultimo_id vem do cabeçalho Last-Event-ID
+    (reconexão); tabelas limita os eventos enviados.
+    """
+    tabelas = frozenset(tabelas)
+    # Assina antes de ler o que foi perdido para não haver buraco entre os dois
+    assinatura = _distribuidor.assinar(tabelas, ultimo_id)
+    try:
+        yield f"retry: {int(INTERVALO * 1000) + 2000}\n\n"
+
+        reenviados = set()
+        if ultimo_id is not None:
+            perdidos = _eventos_desde(ultimo_id, tabelas)
+            if perdidos is None:
+                yield _formatar_reset()
+            else:
+                for evento in perdidos:
+                    reenviados.add(evento[0])
+                    yield _formatar(*evento)
+
+        while True:
+            try:
+                evento = assinatura.fila.get(timeout=HEARTBEAT)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if evento is RESET:
+                yield _formatar_reset()
+            elif evento[0] not in reenviados:
+                yield _formatar(*evento)
+    finally:
+        _distribuidor.cancelar(assinatura)
+
+
+async def transmitir_async(ultimo_id=None, tabelas=(), executar_plano=None):
+    """
+    Gerador assíncrono do stream SSE, equivalente a transmitir().
+    executar_plano é a corrotina que executa um plano de consultas.py no
+    banco, usada para ler os eventos perdidos.
+    """
+    tabelas = frozenset(tabelas)
+    assinatura = _distribuidor.registrar(AssinaturaAsync(tabelas, asyncio.get_running_loop(), ultimo_id))
+    try:
+        yield f"retry: {int(INTERVALO * 1000) + 2000}\n\n"
+
+        reenviados = set()
+        if ultimo_id is not None:
+            perdidos = await executar_plano(_plano_eventos_desde(ultimo_id, tabelas))
+            if perdidos is None:
+                yield _formatar_reset()
+            else:
+                for evento in perdidos:
+                    reenviados.add(evento[0])
+                    yield _formatar(*evento)
+
+        while True:
+            try:
+                evento = await asyncio.wait_for(assinatura.fila.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if evento is RESET:
+                yield _formatar_reset()
+            elif evento[0] not in reenviados:
+                yield _formatar(*evento)
+    finally:
+        _distribuidor.cancelar(assinatura)
@@ -0,0 +1,341 @@
+"""
+Exportação de materiais, equipamentos e manutenções em XLSX e Parquet.
+
+A geração roda num pool de processos separado, então exportações grandes
+não ocupam os workers da API. O arquivo pronto fica em disco com o nome
+<tabela>-<carimbo>.<formato>, em que o carimbo vem das versões das tabelas
+(versoes.py): enquanto os dados não mudam, novas solicitações reaproveitam
+o arquivo já gerado. A situação de cada exportação é lida do próprio
+diretório, então funciona com vários processos da API.
+"""
+import glob
+import importlib.util
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from db import get_connection
+from versoes import obter_versoes
+
+DIRETORIO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exportacoes")
+
+# Linhas lidas do banco por vez; a memória usada não cresce com a tabela
+LINHAS_POR_LOTE = 5000
+
+# Geração sem sinal de vida por mais que isso (processo morto) pode ser refeita
+TEMPO_MAXIMO_GERACAO = int(os.getenv("EXPORT_TIMEOUT", "1800"))
+
+LIMITE_LINHAS_XLSX = 1048576
+
+# Tipos das colunas: inteiro, texto, decimal, data, datahora
+EXPORTACOES = {
+    'materiais': {
+        'tabelas': ('materiais',),
+        'consulta': """
+            SELECT id, codigo_material, nome, tipo, fabricante, quantidade, unidade,
+                   validade, preco, estoque_atual, estoque_minimo
+            FROM materiais
+            ORDER BY nome, id
+        """,
+        'colunas': [
+            ('id', 'inteiro'), ('codigo_material', 'texto'), ('nome', 'texto'),
+            ('tipo', 'texto'), ('fabricante', 'texto'), ('quantidade', 'decimal'),
+            ('unidade', 'texto'), ('validade', 'data'), ('preco', 'decimal'),
+            ('estoque_atual', 'decimal'), ('estoque_minimo', 'decimal'),
+        ],
+    },
+    'equipamentos': {
+        'tabelas': ('equipamentos',),
+        'consulta': """
+            SELECT id, codigo, nome, modelo, fabricante, numero_serie, categoria,
+                   localizacao, status, data_aquisicao, valor_aquisicao, garantia_ate,
+                   especificacoes_tecnicas, observacoes, data_criacao, data_atualizacao
+            FROM equipamentos
+            ORDER BY nome, id
+        """,
+        'colunas': [
+            ('id', 'inteiro'), ('codigo', 'texto'), ('nome', 'texto'), ('modelo', 'texto'),
+            ('fabricante', 'texto'), ('numero_serie', 'texto'), ('categoria', 'texto'),
+            ('localizacao', 'texto'), ('status', 'texto'), ('data_aquisicao', 'data'),
+            ('valor_aquisicao', 'decimal'), ('garantia_ate', 'data'),
+            ('especificacoes_tecnicas', 'texto'), ('observacoes', 'texto'),
+            ('data_criacao', 'datahora'), ('data_atualizacao', 'datahora'),
+        ],
+    },
+    'manutencoes': {
+        # Inclui código e nome do equipamento, então depende das duas tabelas
+        'tabelas': ('manutencoes', 'equipamentos'),
+        'consulta': """
+            SELECT m.id, m.equipamento_id, e.codigo, e.nome, m.tipo, m.descricao,
+                   m.data_agendada, m.data_realizada, m.status, m.prioridade,
+                   m.responsavel, m.fornecedor, m.custo, m.observacoes,
+                   m.data_criacao, m.data_atualizacao
+            FROM manutencoes m
+            JOIN equipamentos e ON m.equipamento_id = e.id
+            ORDER BY m.id
+        """,
+        'colunas': [
+            ('id', 'inteiro'), ('equipamento_id', 'inteiro'), ('codigo_equipamento', 'texto'),
+            ('nome_equipamento', 'texto'), ('tipo', 'texto'), ('descricao', 'texto'),
+            ('data_agendada', 'data'), ('data_realizada', 'data'), ('status', 'texto'),
+            ('prioridade', 'texto'), ('responsavel', 'texto'), ('fornecedor', 'texto'),
+            ('custo', 'decimal'), ('observacoes', 'texto'),
+            ('data_criacao', 'datahora'), ('data_atualizacao', 'datahora'),
+        ],
+    },
+}
+
+# formato: (pacote necessário, mimetype)
+FORMATOS = {
+    'xlsx': ('xlsxwriter', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('pyarrow', 'application/vnd.apache.parquet'),
+}
+
+ID_EXPORTACAO = re.compile(r"^(materiais|equipamentos|manutencoes)-([0-9.]+)\.(xlsx|parquet)$")
+
+
+class FormatoIndisponivel(Exception):
+    """O pacote que gera o formato pedido não está instalado."""
+
+
+def _diretorio():
+    diretorio = os.getenv("EXPORT_DIR", DIRETORIO_PADRAO)
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def formato_disponivel(formato):
+    return importlib.util.find_spec(FORMATOS[formato][0]) is not None
+
+
+def interpretar_id(exportacao_id):
+    """Retorna (tabela, carimbo, formato) ou None se o id não for válido."""
+    correspondencia = ID_EXPORTACAO.match(exportacao_id)
+    return correspondencia.groups() if correspondencia else None
+
+
+def caminho_exportacao(exportacao_id):
+    return os.path.join(_diretorio(), exportacao_id)
+
+
+def mimetype_exportacao(exportacao_id):
+    return FORMATOS[interpretar_id(exportacao_id)[2]][1]
+
+
+# ---------- geração (executada nos processos do pool) ----------
+
+def _lotes(cursor):
+    while True:
+        linhas = cursor.fetchmany(LINHAS_POR_LOTE)
+        if not linhas:
+            return
+        yield linhas
+
+
+def _escrever_xlsx(cursor, tabela, colunas, caminho):
+    import xlsxwriter
+
+    # constant_memory grava cada linha no disco assim que a próxima começa
+    workbook = xlsxwriter.Workbook(caminho, {'constant_memory': True})
+    planilha = workbook.add_worksheet(tabela)
+    formatos = {
+        'data': workbook.add_format({'num_format': 'dd/mm/yyyy'}),
+        'datahora': workbook.add_format({'num_format': 'dd/mm/yyyy hh:mm'}),
+        'decimal': workbook.add_format({'num_format': '#,##0.00'}),
+    }
+
+    cabecalho = workbook.add_format({'bold': True})
+    for coluna, (nome, _) in enumerate(colunas):
+        planilha.write_string(0, coluna, nome, cabecalho)
+
+    linha = 1
+    for lote in _lotes(cursor):
+        if linha + len(lote) > LIMITE_LINHAS_XLSX:
+            raise ValueError(f"Exportação excede o limite de {LIMITE_LINHAS_XLSX} linhas do XLSX; use parquet")
+        for registro in lote:
+            for coluna, valor in enumerate(registro):
+                if valor is None:
+                    continue
+                tipo = colunas[coluna][1]
+                if tipo in ('data', 'datahora'):
+                    planilha.write_datetime(linha, coluna, valor, formatos[tipo])
+                elif tipo == 'decimal':
+                    planilha.write_number(linha, coluna, float(valor), formatos['decimal'])
+                elif tipo == 'inteiro':
+                    planilha.write_number(linha, coluna, valor)
+                else:
+                    planilha.write_string(linha, coluna, str(valor))
+            linha += 1
+
+    planilha.freeze_panes(1, 0)
+    planilha.autofilter(0, 0, max(linha - 1, 1), len(colunas) - 1)
+    workbook.close()
+
+
+def _escrever_parquet(cursor, tabela, colunas, caminho):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {
+        'inteiro': pa.int64(),
+        'texto': pa.string(),
+        'decimal': pa.decimal128(10, 2),
+        'data': pa.date32(),
+        'datahora': pa.timestamp('s'),
+    }
+    schema = pa.schema([(nome, tipos[tipo]) for nome, tipo in colunas])
+
+    with pq.ParquetWriter(caminho, schema, compression='snappy') as writer:
+        for lote in _lotes(cursor):
+            valores = list(zip(*lote))
+            writer.write_batch(pa.record_batch(
+                [pa.array(valores[i], type=campo.type) for i, campo in enumerate(schema)],
+                schema=schema
+            ))
+
+
+ESCRITORES = {
+    'xlsx': _escrever_xlsx,
+    'parquet': _escrever_parquet,
+}
+
+
+def _remover_versoes_antigas(tabela, formato, exportacao_id):
+    for caminho in glob.glob(os.path.join(_diretorio(), f"{tabela}-*.{formato}")):
+        if os.path.basename(caminho) != exportacao_id:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+
+def gerar_exportacao(exportacao_id):
+    """Gera o arquivo da exportação. Roda num processo do pool."""
+    tabela, _, formato = interpretar_id(exportacao_id)
+    exportacao = EXPORTACOES[tabela]
+    destino = caminho_exportacao(exportacao_id)
+    fd, temporario = tempfile.mkstemp(dir=_diretorio(), suffix=".tmp")
+    os.close(fd)
+
+    conn = cursor = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(exportacao['consulta'])
+        ESCRITORES[formato](cursor, tabela, exportacao['colunas'], temporario)
+        os.replace(temporario, destino)
+        _remover_versoes_antigas(tabela, formato, exportacao_id)
+    except Exception as e:
+        with open(f"{destino}.erro", "w", encoding="utf-8") as arquivo:
+            arquivo.write(str(e))
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conn is not None:
+            conn.close()
+        for caminho in (temporario, f"{destino}.parcial"):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+
+# ---------- solicitação e acompanhamento (executados na API) ----------
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor(recriar=False):
+    global _executor, _executor_pid
+    with _executor_lock:
+        if recriar or _executor is None or _executor_pid != os.getpid():
+            # spawn: o processo filho não herda threads nem conexões da API
+            _executor = ProcessPoolExecutor(
+                max_workers=int(os.getenv("EXPORT_WORKERS", "2")),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def obter_situacao(exportacao_id):
+    """Situação de uma exportação (concluida, processando ou erro), ou None."""
+    if interpretar_id(exportacao_id) is None:
+        return None
+
+    destino = caminho_exportacao(exportacao_id)
+    if os.path.exists(destino):
+        return {
+            "id": exportacao_id,
+            "status": "concluida",
+            "tamanho": os.path.getsize(destino),
+            "data_geracao": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(destino))),
+        }
+
+    marcador = f"{destino}.parcial"
+    try:
+        if time.time() - os.path.getmtime(marcador) < TEMPO_MAXIMO_GERACAO:
+            return {"id": exportacao_id, "status": "processando"}
+        os.remove(marcador)
+    except FileNotFoundError:
+        pass
+
+    try:
+        with open(f"{destino}.erro", encoding="utf-8") as arquivo:
+            return {"id": exportacao_id, "status": "erro", "erro": arquivo.read()}
+    except FileNotFoundError:
+        return None
+
+
+def solicitar_exportacao(tabela, formato):
+    """
+    Retorna a situação da exportação dos dados atuais da tabela, disparando
+    a geração em segundo plano se o arquivo desta versão ainda não existe.
+    """
+    if tabela not in EXPORTACOES:
+        raise ValueError(f"Tabela inválida. Use: {', '.join(EXPORTACOES)}")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido. Use: {', '.join(FORMATOS)}")
+    if not formato_disponivel(formato):
+        raise FormatoIndisponivel(f"Exportação em {formato} requer o pacote {FORMATOS[formato][0]}")
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        tabelas = EXPORTACOES[tabela]['tabelas']
+        versoes = obter_versoes(cursor, tabelas)
+    finally:
+        cursor.close()
+        conn.close()
+
+    carimbo = '.'.join(str(versoes[t]) for t in tabelas)
+    exportacao_id = f"{tabela}-{carimbo}.{formato}"
+
+    situacao = obter_situacao(exportacao_id)
+    if situacao and situacao["status"] != "erro":
+        return situacao
+
+    # O marcador criado com O_EXCL garante uma única geração por versão,
+    # mesmo com vários processos da API recebendo a mesma solicitação
+    destino = caminho_exportacao(exportacao_id)
+    try:
+        os.close(os.open(f"{destino}.parcial", os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return obter_situacao(exportacao_id) or {"id": exportacao_id, "status": "processando"}
+    if os.path.exists(f"{destino}.erro"):
+        os.remove(f"{destino}.erro")
+
+    try:
+        _obter_executor().submit(gerar_exportacao, exportacao_id)
+    except BrokenProcessPool:
+        _obter_executor(recriar=True).submit(gerar_exportacao, exportacao_id)
+
+    return {"id": exportacao_id, "status": "processando"}
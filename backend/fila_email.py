@@ -0,0 +1,273 @@
+"""
+Fila de envio de emails.
+
+As requisições apenas gravam o email na tabela fila_emails; um worker em
+segundo plano envia usando uma sessão SMTP autenticada reaproveitada entre
+envios, com novas tentativas e backoff exponencial em caso de falha.
+"""
+import os
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from db import get_connection
+from email_config import EMAIL_CONFIG, FILA_EMAIL_CONFIG
+
+# Emails presos em 'enviando' por mais que isso (worker interrompido) voltam à fila
+TEMPO_MAXIMO_ENVIANDO_MINUTOS = 10
+TAMANHO_LOTE = 10
+
+# Consultas da fila, compartilhadas com o worker assíncrono (fila_email_async.py)
+SQL_INSERIR = """
+    INSERT INTO fila_emails (destinatario, assunto, corpo)
+    VALUES (%s, %s, %s)
+"""
+
+SQL_LIBERAR_PRESOS = """
+    UPDATE fila_emails SET status = 'pendente'
+    WHERE status = 'enviando'
+      AND proxima_tentativa < NOW() - INTERVAL %s MINUTE
+"""
+
+# SKIP LOCKED permite vários workers (processos/servidores) na mesma fila
+SQL_RESERVAR = """
+    SELECT id, destinatario, assunto, corpo, tentativas
+    FROM fila_emails
+    WHERE status = 'pendente' AND proxima_tentativa <= NOW()
+    ORDER BY proxima_tentativa, id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+SQL_ENVIADO = """
+    UPDATE fila_emails
+    SET status = 'enviado', tentativas = %s, ultimo_erro = NULL, data_envio = NOW()
+    WHERE id = %s
+"""
+
+SQL_FALHOU = """
+    UPDATE fila_emails SET status = 'falhou', tentativas = %s, ultimo_erro = %s
+    WHERE id = %s
+"""
+
+SQL_REAGENDAR = """
+    UPDATE fila_emails
+    SET status = 'pendente', tentativas = %s, ultimo_erro = %s,
+        proxima_tentativa = NOW() + INTERVAL %s SECOND
+    WHERE id = %s
+"""
+
+
+def sql_marcar_enviando(quantidade):
+    return f"""
+        UPDATE fila_emails SET status = 'enviando', proxima_tentativa = NOW()
+        WHERE id IN ({', '.join(['%s'] * quantidade)})
+    """
+
+
+def resultado_envio(email, erro):
+    """
+    Consulta que registra o resultado do envio de um email reservado:
+    enviado, nova tentativa com backoff ou falha definitiva.
+    """
+    tentativas = email['tentativas'] + 1
+    if erro is None:
+        return SQL_ENVIADO, (tentativas, email['id'])
+    if tentativas >= FILA_EMAIL_CONFIG['max_tentativas']:
+        return SQL_FALHOU, (tentativas, str(erro), email['id'])
+    return SQL_REAGENDAR, (tentativas, str(erro), calcular_espera(tentativas), email['id'])
+
+
+def enfileirar_email(destinatario, assunto, corpo):
+    """Grava o email na fila e retorna o id do job."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_INSERIR, (destinatario, assunto, corpo))
+        email_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    garantir_worker()
+    acordar_worker()
+    return email_id
+
+
+def obter_status_email(email_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT id, destinatario, assunto, status, tentativas, ultimo_erro,
+                   proxima_tentativa, data_criacao, data_envio
+            FROM fila_emails WHERE id = %s
+        """, (email_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def montar_mensagem(destinatario, assunto, corpo):
+    msg = MIMEMultipart()
+    msg['From'] = f"{EMAIL_CONFIG['sender_name']} <{EMAIL_CONFIG['sender_email']}>"
+    msg['To'] = destinatario
+    msg['Subject'] = assunto
+    msg.attach(MIMEText(corpo, 'html', 'utf-8'))
+    return msg.as_string()
+
+
+def calcular_espera(tentativas):
+    """Backoff exponencial: espera_inicial, 2x, 4x, ... até espera_maxima (segundos)."""
+    espera = FILA_EMAIL_CONFIG['espera_inicial'] * (2 ** max(tentativas - 1, 0))
+    return min(espera, FILA_EMAIL_CONFIG['espera_maxima'])
+
+
+class WorkerEmail:
+    """Thread que consome a fila_emails mantendo uma sessão SMTP aberta."""
+
+    def __init__(self):
+        self._smtp = None
+        self._smtp_usado_em = 0
+        self._evento = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # ---------- sessão SMTP ----------
+
+    def _conectar(self):
+        smtp = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'], timeout=30)
+        if EMAIL_CONFIG['usar_starttls']:
+            smtp.starttls()  # Habilitar criptografia TLS
+        if EMAIL_CONFIG['usar_login']:
+            smtp.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
+        return smtp
+
+    def _sessao(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._fechar_sessao()
+        self._smtp = self._conectar()
+        return self._smtp
+
+    def _fechar_sessao(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _enviar(self, destinatario, assunto, corpo):
+        texto = montar_mensagem(destinatario, assunto, corpo)
+        try:
+            self._sessao().sendmail(EMAIL_CONFIG['sender_email'], destinatario, texto)
+        except smtplib.SMTPServerDisconnected:
+            # O servidor encerrou a sessão entre o NOOP e o envio: tenta de novo
+            self._fechar_sessao()
+            self._sessao().sendmail(EMAIL_CONFIG['sender_email'], destinatario, texto)
+        self._smtp_usado_em = time.monotonic()
+
+    # ---------- fila ----------
+
+    def _reservar_lote(self, cursor):
+        cursor.execute(SQL_LIBERAR_PRESOS, (TEMPO_MAXIMO_ENVIANDO_MINUTOS,))
+        cursor.execute(SQL_RESERVAR, (TAMANHO_LOTE,))
+        lote = cursor.fetchall()
+        if lote:
+            cursor.execute(sql_marcar_enviando(len(lote)), [email['id'] for email in lote])
+        return lote
+
+    def processar_lote(self):
+        """Envia um lote de emails pendentes. Retorna quantos foram processados."""
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            lote = self._reservar_lote(cursor)
+            conn.commit()
+
+            for email in lote:
+                try:
+                    self._enviar(email['destinatario'], email['assunto'], email['corpo'])
+                    erro = None
+                except Exception as e:
+                    self._fechar_sessao()
+                    erro = e
+                cursor.execute(*resultado_envio(email, erro))
+                conn.commit()
+
+            return len(lote)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _executar(self):
+        while True:
+            try:
+                processados = self.processar_lote()
+            except Exception as e:
+                print(f"Erro no worker de email: {e}")
+                processados = 0
+
+            if processados:
+                continue
+
+            # Servidores SMTP derrubam sessões ociosas; fecha antes disso
+            if self._smtp is not None and time.monotonic() - self._smtp_usado_em > FILA_EMAIL_CONFIG['smtp_ocioso']:
+                self._fechar_sessao()
+
+            self._evento.wait(FILA_EMAIL_CONFIG['intervalo_verificacao'])
+            self._evento.clear()
+
+    def acordar(self):
+        self._evento.set()
+
+    def ativo(self):
+        # Threads não sobrevivem a um fork: cada processo precisa da sua
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def iniciar(self):
+        if self.ativo():
+            return
+        self._smtp = None
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._executar, name="worker-email", daemon=True)
+        self._thread.start()
+
+
+_worker = WorkerEmail()
+_worker_lock = threading.Lock()
+# Função que acorda um worker de fora desta thread (modo assíncrono)
+_acordar_externo = None
+
+
+def usar_worker_externo(acordar):
+    """
+    Entrega a fila a outro worker (ex.: o assíncrono de asgi.py): a thread
+    deste processo não é iniciada e enfileirar_email chama acordar().
+    """
+    global _acordar_externo
+    _acordar_externo = acordar
+
+
+def acordar_worker():
+    if _acordar_externo is not None:
+        _acordar_externo()
+    else:
+        _worker.acordar()
+
+
+def garantir_worker():
+    """Inicia o worker deste processo, se ainda não estiver rodando."""
+    if _acordar_externo is not None or _worker.ativo() or os.getenv("EMAIL_WORKER_ATIVO", "1") != "1":
+        return
+    with _worker_lock:
+        _worker.iniciar()
@@ -0,0 +1,156 @@
+"""
+Worker assíncrono da fila de emails (modo ASGI, asgi.py).
+
+Faz o mesmo que o WorkerEmail de fila_email.py, com as mesmas consultas,
+mas com aiomysql e aiosmtplib: roda como uma tarefa no loop do servidor,
+sem ocupar uma thread. Enquanto estiver ativo a thread de fila_email não é
+iniciada (usar_worker_externo), e os emails enfileirados pelas rotas do
+Flask também o acordam.
+"""
+import asyncio
+import time
+
+import aiomysql
+import aiosmtplib
+
+import fila_email
+from email_config import EMAIL_CONFIG, FILA_EMAIL_CONFIG
+
+
+class WorkerEmailAsync:
+    """Tarefa que consome a fila_emails mantendo uma sessão SMTP aberta."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._smtp = None
+        self._smtp_usado_em = 0
+        self._evento = asyncio.Event()
+        self._loop = None
+        self._tarefa = None
+
+    # ---------- sessão SMTP ----------
+
+    async def _conectar(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=EMAIL_CONFIG['smtp_server'],
+            port=EMAIL_CONFIG['smtp_port'],
+            timeout=30,
+            start_tls=False,
+        )
+        await smtp.connect()
+        if EMAIL_CONFIG['usar_starttls']:
+            await smtp.starttls()  # Habilitar criptografia TLS
+        if EMAIL_CONFIG['usar_login']:
+            await smtp.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
+        return smtp
+
+    async def _sessao(self):
+        if self._smtp is not None:
+            try:
+                if (await self._smtp.noop()).code == 250:
+                    return self._smtp
+            except (aiosmtplib.SMTPException, OSError):
+                pass
+            await self._fechar_sessao()
+        self._smtp = await self._conectar()
+        return self._smtp
+
+    async def _fechar_sessao(self):
+        if self._smtp is not None:
+            try:
+                await self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    async def _enviar(self, destinatario, assunto, corpo):
+        texto = fila_email.montar_mensagem(destinatario, assunto, corpo)
+        try:
+            await (await self._sessao()).sendmail(EMAIL_CONFIG['sender_email'], [destinatario], texto)
+        except aiosmtplib.SMTPServerDisconnected:
+            # O servidor encerrou a sessão entre o NOOP e o envio: tenta de novo
+            await self._fechar_sessao()
+            await (await self._sessao()).sendmail(EMAIL_CONFIG['sender_email'], [destinatario], texto)
+        self._smtp_usado_em = time.monotonic()
+
+    # ---------- fila ----------
+
+    async def processar_lote(self):
+        """Envia um lote de emails pendentes. Retorna quantos foram processados."""
+        async with self._pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await conn.begin()
+                try:
+                    await cursor.execute(fila_email.SQL_LIBERAR_PRESOS, (fila_email.TEMPO_MAXIMO_ENVIANDO_MINUTOS,))
+                    await cursor.execute(fila_email.SQL_RESERVAR, (fila_email.TAMANHO_LOTE,))
+                    lote = await cursor.fetchall()
+                    if lote:
+                        await cursor.execute(fila_email.sql_marcar_enviando(len(lote)),
+                                             [email['id'] for email in lote])
+                    await conn.commit()
+                except BaseException:
+                    await conn.rollback()
+                    raise
+
+                for email in lote:
+                    try:
+                        await self._enviar(email['destinatario'], email['assunto'], email['corpo'])
+                        erro = None
+                    except Exception as e:
+                        await self._fechar_sessao()
+                        erro = e
+                    # Conexão em autocommit: cada resultado é gravado na hora
+                    await cursor.execute(*fila_email.resultado_envio(email, erro))
+
+                return len(lote)
+
+    async def _executar(self):
+        while True:
+            try:
+                processados = await self.processar_lote()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro no worker de email: {e}")
+                processados = 0
+
+            if processados:
+                continue
+
+            # Servidores SMTP derrubam sessões ociosas; fecha antes disso
+            if self._smtp is not None and time.monotonic() - self._smtp_usado_em > FILA_EMAIL_CONFIG['smtp_ocioso']:
+                await self._fechar_sessao()
+
+            try:
+                await asyncio.wait_for(self._evento.wait(), FILA_EMAIL_CONFIG['intervalo_verificacao'])
+            except asyncio.TimeoutError:
+                pass
+            self._evento.clear()
+
+    def acordar(self):
+        # Pode ser chamado pelas threads das rotas do Flask
+        self._loop.call_soon_threadsafe(self._evento.set)
+
+    def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        self._tarefa = self._loop.create_task(self._executar(), name="worker-email")
+        fila_email.usar_worker_externo(self.acordar)
+
+    async def parar(self):
+        fila_email.usar_worker_externo(None)
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        await self._fechar_sessao()
+
+
+async def enfileirar_email(pool, destinatario, assunto, corpo):
+    """Grava o email na fila e retorna o id do job (acorda o worker ativo)."""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(fila_email.SQL_INSERIR, (destinatario, assunto, corpo))
+            email_id = cursor.lastrowid
+    fila_email.acordar_worker()
+    return email_id
@@ -0,0 +1,46 @@
+"""
+Configuração do gunicorn para produção (lida por servidor.py ou direto):
+    gunicorn -c gunicorn.conf.py Backend:app
+
+Vários processos com várias threads cada; tudo pode ser ajustado pelo
+.env. Para reiniciar os workers sem derrubar conexões: kill -HUP <pid do
+master>. Com preload_app o código é carregado uma vez no master, então
+uma versão nova do código exige reiniciar o master (ou kill -USR2 e, em
+seguida, -TERM no master antigo).
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("SERVIDOR_ENDERECO", "0.0.0.0:5000")
+
+# Processos e threads por processo. Cada thread pode usar uma conexão do
+# pool: mantenha SERVIDOR_THREADS <= DB_POOL_SIZE + DB_POOL_OVERFLOW
+workers = int(os.getenv("SERVIDOR_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("SERVIDOR_THREADS", "8"))
+
+# Carrega a aplicação antes do fork: workers sobem mais rápido e
+# compartilham a memória do código. Pool de conexões e threads de
+# segundo plano são criados por processo (verificam o pid)
+preload_app = True
+
+# Worker cujo processo não dá sinal de vida por mais que isso é reiniciado
+# (processo travado). No gthread o sinal vem do laço principal, não das
+# threads: uma requisição lenta não é interrompida por este timeout
+timeout = int(os.getenv("SERVIDOR_TIMEOUT", "60"))
+# Tempo para terminar as requisições em andamento num reload/desligamento
+graceful_timeout = int(os.getenv("SERVIDOR_GRACEFUL_TIMEOUT", "30"))
+# Segundos que uma conexão keep-alive ociosa fica aberta
+keepalive = int(os.getenv("SERVIDOR_KEEPALIVE", "5"))
+
+# Recicla os workers periodicamente (limita vazamentos de memória)
+max_requests = int(os.getenv("SERVIDOR_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("SERVIDOR_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("SERVIDOR_LOG_LEVEL", "info")
@@ -0,0 +1,135 @@
+"""
+Gravação do histórico de equipamentos e manutenções (historico_manutencoes).
+
+As rotas chamam registrar() depois do commit da alteração; os registros
+vão para uma fila em memória e uma thread os grava em lote com um único
+INSERT de várias linhas, sem custar uma ida ao banco por requisição. A
+fila é limitada: cheia, o registro é gravado na hora por quem chamou. No
+encerramento do processo o que restou na fila é gravado (atexit).
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from db import get_connection
+
+TAMANHO_FILA = int(os.getenv("HISTORICO_TAMANHO_FILA", "10000"))
+TAMANHO_LOTE = 500
+MAXIMO_TENTATIVAS = 3
+
+QUERY_INSERT = """
+    INSERT INTO historico_manutencoes (equipamento_id, manutencao_id, tipo_acao, descricao, usuario)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _gravar(registros):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # executemany envia um único INSERT com todas as linhas
+        cursor.executemany(QUERY_INSERT, registros)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class EscritorHistorico:
+    """Fila + thread de gravação do histórico (uma por processo)."""
+
+    def __init__(self):
+        self._fila = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem a um fork: cada processo precisa da sua
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._fila = queue.Queue(maxsize=TAMANHO_FILA)
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="historico", daemon=True)
+                self._thread.start()
+            self._pid = os.getpid()
+
+    def registrar(self, equipamento_id, manutencao_id, tipo_acao, descricao, usuario='Sistema'):
+        self._garantir_thread()
+        registro = (equipamento_id, manutencao_id, tipo_acao, descricao, usuario)
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            # Fila cheia: grava direto em vez de perder o registro
+            try:
+                _gravar([registro])
+            except Exception as e:
+                print(f"Erro ao gravar histórico: {e}")
+
+    def _coletar(self, esperar):
+        """Tira da fila o que estiver acumulado, até TAMANHO_LOTE registros."""
+        lote = []
+        try:
+            lote.append(self._fila.get() if esperar else self._fila.get_nowait())
+        except queue.Empty:
+            return lote
+        while len(lote) < TAMANHO_LOTE:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar_lote(self, lote):
+        try:
+            for tentativa in range(1, MAXIMO_TENTATIVAS + 1):
+                try:
+                    _gravar(lote)
+                    return
+                except Exception as e:
+                    if tentativa == MAXIMO_TENTATIVAS:
+                        print(f"Erro ao gravar histórico, {len(lote)} registro(s) descartado(s): {e}")
+                    else:
+                        time.sleep(tentativa)
+        finally:
+            for _ in lote:
+                self._fila.task_done()
+
+    def _executar(self):
+        # Enquanto um lote é gravado os novos registros se acumulam na
+        # fila e seguem juntos no próximo INSERT
+        while True:
+            self._gravar_lote(self._coletar(esperar=True))
+
+    def descarregar(self):
+        """Grava tudo o que ainda está na fila deste processo."""
+        if self._pid != os.getpid():
+            return
+        while True:
+            lote = self._coletar(esperar=False)
+            if not lote:
+                break
+            self._gravar_lote(lote)
+        # Espera o lote que a thread já tirou da fila
+        self._fila.join()
+
+
+_escritor = EscritorHistorico()
+atexit.register(_escritor.descarregar)
+
+
+def registrar(equipamento_id, manutencao_id, tipo_acao, descricao, usuario='Sistema'):
+    """
+    Agenda um registro no histórico. Chame depois do commit da alteração
+    (tipo_acao: criacao, atualizacao, conclusao, cancelamento ou exclusao).
+    """
+    _escritor.registrar(equipamento_id, manutencao_id, tipo_acao, descricao, usuario)
+
+
+def descarregar():
+    _escritor.descarregar()
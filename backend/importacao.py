@@ -0,0 +1,335 @@
+"""
+Importação em massa de materiais e equipamentos a partir de CSV.
+
+O arquivo é lido em fluxo (mesmo layout da exportação: separador ';',
+UTF-8 com ou sem BOM) e gravado em lotes com executemany, um lote por
+transação. Materiais são atualizados pelo código do material e
+equipamentos pelo código; só as colunas presentes no CSV são gravadas.
+
+Material sem código é inserido como novo. O ID da exportação só é usado
+para reconhecê-lo quando o material local com esse id também não tem
+código e tem o mesmo nome (reimportação de uma exportação desta base), ou
+com mesma_base=True (--mesma-base): o CSV veio desta base e os ids valem
+como estão. A planilha de outro laboratório traz ids de outro banco, que
+não podem sobrescrever materiais daqui.
+Linhas inválidas não interrompem a importação: são devolvidas com o
+número da linha e o motivo.
+
+Uso pela linha de comando:
+    python importacao.py materiais inventario.csv
+    python importacao.py materiais inventario.csv --mesma-base
+    python importacao.py equipamentos equipamentos.csv --lote 2000
+"""
+import argparse
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import mysql.connector
+
+from db import get_connection
+from eventos import registrar_alteracao
+import historico
+from versoes import incrementar_versao
+
+# Linhas gravadas por transação
+TAMANHO_LOTE = 1000
+
+# Erros detalhados na resposta; os demais são apenas contados
+MAXIMO_ERROS_LISTADOS = 1000
+
+STATUS_EQUIPAMENTO = ('ativo', 'inativo', 'manutencao', 'defeito')
+
+# campo: (tipo, obrigatório, cabeçalhos aceitos além do nome do campo)
+IMPORTACOES = {
+    'materiais': {
+        'chave': 'codigo_material',
+        # codigo_material aceita NULL: nessas linhas o id pode identificar
+        # o registro (ver _conferir_ids)
+        'chave_alternativa': 'id',
+        'campos': {
+            'id': ('inteiro', False, []),
+            'codigo_material': ('texto', False, ['código do material', 'codigo do material']),
+            'nome': ('texto', True, []),
+            'tipo': ('texto', False, []),
+            'fabricante': ('texto', False, []),
+            'quantidade': ('decimal', False, []),
+            'unidade': ('texto', False, []),
+            'validade': ('data', False, []),
+            'preco': ('decimal', False, ['preço (r$)', 'preço', 'preco (r$)']),
+            'estoque_atual': ('decimal', False, ['estoque atual']),
+            'estoque_minimo': ('decimal', False, ['estoque mínimo', 'estoque minimo']),
+        },
+    },
+    'equipamentos': {
+        'chave': 'codigo',
+        'campos': {
+            'codigo': ('texto', True, ['código']),
+            'nome': ('texto', True, []),
+            'modelo': ('texto', False, []),
+            'fabricante': ('texto', False, []),
+            'numero_serie': ('texto', False, ['número de série', 'numero de serie']),
+            'categoria': ('texto', False, []),
+            'localizacao': ('texto', False, ['localização']),
+            'status': ('status', False, []),
+            'data_aquisicao': ('data', False, ['data de aquisição']),
+            'valor_aquisicao': ('decimal', False, ['valor de aquisição']),
+            'garantia_ate': ('data', False, ['garantia até']),
+            'especificacoes_tecnicas': ('texto', False, ['especificações técnicas']),
+            'observacoes': ('texto', False, ['observações']),
+        },
+    },
+}
+
+
+class ImportacaoInvalida(ValueError):
+    """O arquivo não pode ser importado (cabeçalho ausente ou incompleto)."""
+
+
+def _converter_decimal(valor):
+    # Aceita "12.5", "12,50", "1.234,56" e "R$ 12,50" (formato da exportação)
+    valor = valor.replace('R$', '').replace(' ', '')
+    if ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValueError("valor numérico inválido")
+
+
+def _converter_inteiro(valor):
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError("número inteiro inválido")
+    if numero <= 0:
+        raise ValueError("deve ser maior que zero")
+    return numero
+
+
+def _converter_data(valor):
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError("data inválida (use dd/mm/aaaa ou aaaa-mm-dd)")
+
+
+def _converter_status(valor):
+    valor = valor.lower()
+    if valor not in STATUS_EQUIPAMENTO:
+        raise ValueError(f"status inválido (use {', '.join(STATUS_EQUIPAMENTO)})")
+    return valor
+
+
+CONVERSORES = {
+    'texto': lambda valor: valor,
+    'decimal': _converter_decimal,
+    'inteiro': _converter_inteiro,
+    'data': _converter_data,
+    'status': _converter_status,
+}
+
+
+def _mapear_cabecalho(cabecalho, campos):
+    """Retorna [(índice da coluna no CSV, campo)] das colunas reconhecidas."""
+    aliases = {}
+    for campo, (_, _, outros) in campos.items():
+        for nome in [campo] + outros:
+            aliases[nome] = campo
+
+    colunas = []
+    encontrados = set()
+    for indice, nome in enumerate(cabecalho):
+        campo = aliases.get(nome.strip().lower())
+        if campo and campo not in encontrados:
+            colunas.append((indice, campo))
+            encontrados.add(campo)
+
+    faltando = [campo for campo, (_, obrigatorio, _) in campos.items()
+                if obrigatorio and campo not in encontrados]
+    if faltando:
+        raise ImportacaoInvalida(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}")
+    return colunas
+
+
+def _montar_upsert(tabela, chaves, nomes):
+    atualizacoes = ", ".join(f"{nome} = VALUES({nome})" for nome in nomes if nome not in chaves)
+    return f"""
+        INSERT INTO {tabela} ({', '.join(nomes)})
+        VALUES ({', '.join(['%s'] * len(nomes))})
+        ON DUPLICATE KEY UPDATE {atualizacoes}
+    """
+
+
+def _gravar_lote(conn, cursor, tabela, query, lote, resultado):
+    """
+    Grava o lote numa transação; se falhar, regrava linha a linha para
+    achar as inválidas. Retorna os valores das linhas gravadas.
+    """
+    try:
+        cursor.executemany(query, [valores for _, valores in lote])
+        incrementar_versao(cursor, tabela)
+        registrar_alteracao(cursor, tabela, 'atualizacao')
+        conn.commit()
+        resultado["importadas"] += len(lote)
+        return [valores for _, valores in lote]
+    except mysql.connector.Error:
+        conn.rollback()
+
+    gravados = []
+    for numero_linha, valores in lote:
+        try:
+            cursor.execute(query, valores)
+            gravados.append(valores)
+        except mysql.connector.Error as e:
+            _registrar_erro(resultado, numero_linha, e.msg)
+    incrementar_versao(cursor, tabela)
+    registrar_alteracao(cursor, tabela, 'atualizacao')
+    conn.commit()
+    resultado["importadas"] += len(gravados)
+    return gravados
+
+
+def _conferir_ids(cursor, tabela, lote, indice_id, indice_chave, indice_nome):
+    """
+    Mantém o id das linhas sem chave só quando o registro local com esse id
+    também não tem chave e tem o mesmo nome; nas demais o id é descartado
+    e a linha é inserida como nova.
+    """
+    linhas = [valores for _, valores in lote
+              if valores[indice_id] is not None
+              and (indice_chave is None or valores[indice_chave] is None)]
+    if not linhas:
+        return
+    ids = list({valores[indice_id] for valores in linhas})
+    cursor.execute(f"""
+        SELECT id, nome FROM {tabela}
+        WHERE id IN ({', '.join(['%s'] * len(ids))}) AND codigo_material IS NULL
+        FOR UPDATE
+    """, ids)
+    nomes_locais = {registro_id: (nome or '').casefold() for registro_id, nome in cursor.fetchall()}
+    for valores in linhas:
+        if nomes_locais.get(valores[indice_id]) != valores[indice_nome].casefold():
+            valores[indice_id] = None
+
+
+def _registrar_historico_equipamentos(cursor, codigos):
+    cursor.execute(f"""
+        SELECT id FROM equipamentos WHERE codigo IN ({', '.join(['%s'] * len(codigos))})
+    """, codigos)
+    for (equipamento_id,) in cursor.fetchall():
+        historico.registrar(equipamento_id, None, 'atualizacao', 'Equipamento importado de CSV')
+
+
+def _registrar_erro(resultado, numero_linha, mensagem):
+    if len(resultado["erros"]) < MAXIMO_ERROS_LISTADOS:
+        resultado["erros"].append({"linha": numero_linha, "erro": mensagem})
+    else:
+        resultado["erros_omitidos"] += 1
+
+
+def importar_csv(tabela, arquivo, separador=';', tamanho_lote=TAMANHO_LOTE, mesma_base=False):
+    """
+    Importa o CSV do arquivo binário (upload ou arquivo aberto em 'rb').
+    mesma_base=True usa o id das linhas sem chave como está (o CSV é uma
+    exportação deste banco). Retorna o resumo com linhas lidas, importadas
+    e os erros por linha.
+    """
+    if tabela not in IMPORTACOES:
+        raise ValueError(f"Tabela inválida. Use: {', '.join(IMPORTACOES)}")
+    definicao = IMPORTACOES[tabela]
+    campos = definicao['campos']
+
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    leitor = csv.reader(texto, delimiter=separador)
+    cabecalho = next(leitor, None)
+    if not cabecalho:
+        raise ImportacaoInvalida("Arquivo CSV vazio")
+
+    colunas = _mapear_cabecalho(cabecalho, campos)
+    nomes = [campo for _, campo in colunas]
+    alternativa = definicao.get('chave_alternativa')
+    query = _montar_upsert(tabela, (definicao['chave'], alternativa), nomes)
+    indice_chave = nomes.index(definicao['chave']) if definicao['chave'] in nomes else None
+    indice_alternativa = nomes.index(alternativa) if alternativa in nomes else None
+
+    def gravar(lote):
+        if indice_alternativa is not None and not mesma_base:
+            _conferir_ids(cursor, tabela, lote, indice_alternativa, indice_chave, nomes.index('nome'))
+        gravados = _gravar_lote(conn, cursor, tabela, query, lote, resultado)
+        if tabela == 'equipamentos' and gravados:
+            _registrar_historico_equipamentos(cursor, [valores[indice_chave] for valores in gravados])
+
+    resultado = {"tabela": tabela, "linhas_lidas": 0, "importadas": 0, "erros": [], "erros_omitidos": 0}
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        lote = []
+        for registro in leitor:
+            numero_linha = leitor.line_num
+            if not any(valor.strip() for valor in registro):
+                continue
+            resultado["linhas_lidas"] += 1
+
+            try:
+                valores = []
+                for indice, campo in colunas:
+                    tipo, obrigatorio, _ = campos[campo]
+                    valor = registro[indice].strip() if indice < len(registro) else ''
+                    if not valor:
+                        if obrigatorio:
+                            raise ValueError(f"{campo} é obrigatório")
+                        valores.append(None)
+                        continue
+                    try:
+                        valores.append(CONVERSORES[tipo](valor))
+                    except ValueError as e:
+                        raise ValueError(f"{campo}: {e}")
+
+                if (indice_alternativa is not None and indice_chave is not None
+                        and valores[indice_chave] is not None):
+                    # Com a chave preenchida o registro é o dela: o id
+                    # não é gravado (nem conflita com outro registro)
+                    valores[indice_alternativa] = None
+            except ValueError as e:
+                _registrar_erro(resultado, numero_linha, str(e))
+                continue
+
+            lote.append((numero_linha, valores))
+            if len(lote) >= tamanho_lote:
+                gravar(lote)
+                lote = []
+
+        if lote:
+            gravar(lote)
+        return resultado
+    finally:
+        texto.detach()
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa materiais ou equipamentos de um arquivo CSV")
+    parser.add_argument("tabela", choices=list(IMPORTACOES))
+    parser.add_argument("arquivo")
+    parser.add_argument("--separador", default=';')
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas por transação")
+    parser.add_argument("--mesma-base", action="store_true",
+                        help="o CSV é uma exportação deste banco: materiais sem código são atualizados pelo ID")
+    args = parser.parse_args()
+
+    with open(args.arquivo, "rb") as arquivo:
+        resultado = importar_csv(args.tabela, arquivo, args.separador, args.lote, args.mesma_base)
+
+    print(f"Linhas lidas: {resultado['linhas_lidas']} | importadas: {resultado['importadas']} "
+          f"| com erro: {len(resultado['erros']) + resultado['erros_omitidos']}")
+    for erro in resultado["erros"]:
+        print(f"  linha {erro['linha']}: {erro['erro']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Move os PDFs (FISPQ) da coluna materiais.arquivo_pdf para o armazenamento
+de arquivos, deixando na tabela apenas o hash (pdf_hash).
+
+Uso:
+    python migrar_pdfs.py                 # migra em lotes de 10 materiais
+    python migrar_pdfs.py --lote 50
+    python migrar_pdfs.py --limpar-orfaos # remove arquivos sem material associado
+"""
+import argparse
+import time
+
+from db import get_connection
+from armazenamento_pdf import obter_armazenamento
+
+
+def migrar(tamanho_lote):
+    armazenamento = obter_armazenamento()
+    conn = get_connection()
+    cursor = conn.cursor()
+    ultimo_id = 0
+    total = 0
+
+    try:
+        while True:
+            # Busca apenas os ids do lote; cada PDF é lido individualmente
+            # para manter um único blob em memória por vez
+            cursor.execute("""
+                SELECT id FROM materiais
+                WHERE id > %s AND pdf_hash IS NULL AND arquivo_pdf IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (ultimo_id, tamanho_lote))
+            ids = [linha[0] for linha in cursor.fetchall()]
+            if not ids:
+                break
+
+            for material_id in ids:
+                # Leitura com bloqueio: um PUT que enviou outro PDF depois da
+                # busca dos ids já deixou o material sem blob (ou espera o
+                # commit do lote), e o hash novo não é sobrescrito pelo antigo
+                cursor.execute("""
+                    SELECT arquivo_pdf FROM materiais
+                    WHERE id = %s AND pdf_hash IS NULL AND arquivo_pdf IS NOT NULL
+                    FOR UPDATE
+                """, (material_id,))
+                linha = cursor.fetchone()
+                if not linha:
+                    continue
+                arquivo_pdf = linha[0]
+                pdf_hash = armazenamento.salvar(arquivo_pdf)
+                cursor.execute("""
+                    UPDATE materiais
+                    SET pdf_hash = %s, pdf_tamanho = %s, arquivo_pdf = NULL
+                    WHERE id = %s AND pdf_hash IS NULL AND arquivo_pdf IS NOT NULL
+                """, (pdf_hash, len(arquivo_pdf), material_id))
+                total += cursor.rowcount
+                del arquivo_pdf, linha
+
+            conn.commit()
+            ultimo_id = ids[-1]
+            print(f"{total} PDF(s) migrado(s) (último id: {ultimo_id})")
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"Migração concluída: {total} PDF(s) movido(s) para o armazenamento.")
+    if total:
+        print("Execute 'OPTIMIZE TABLE materiais' para devolver o espaço dos blobs ao InnoDB.")
+
+
+def limpar_orfaos(idade_minima_segundos=3600):
+    armazenamento = obter_armazenamento()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT DISTINCT pdf_hash FROM materiais WHERE pdf_hash IS NOT NULL")
+        referenciados = {linha[0] for linha in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    # Arquivos recentes são preservados: podem pertencer a um upload cujo
+    # INSERT/UPDATE ainda não foi confirmado (um upload de conteúdo já
+    # gravado também renova o timestamp do arquivo)
+    limite = time.time() - idade_minima_segundos
+    removidos = 0
+    for pdf_hash, modificado_em in list(armazenamento.listar()):
+        if pdf_hash not in referenciados and modificado_em < limite:
+            armazenamento.remover(pdf_hash)
+            removidos += 1
+
+    print(f"{removidos} arquivo(s) órfão(s) removido(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migração dos PDFs de materiais para o armazenamento de arquivos")
+    parser.add_argument("--lote", type=int, default=10, help="materiais por transação")
+    parser.add_argument("--limpar-orfaos", action="store_true", help="remove PDFs que nenhum material referencia")
+    args = parser.parse_args()
+
+    if args.limpar_orfaos:
+        limpar_orfaos()
+    else:
+        migrar(args.lote)
@@ -0,0 +1,476 @@
+"""
+Relatórios de equipamentos pré-calculados em relatorios_equipamentos.
+
+Para cada equipamento e para o parque inteiro (equipamento_id NULL) são
+gerados os relatórios de status, manutenção, calibração e inventário;
+as rotas apenas leem o último snapshot. A geração roda numa thread: as
+rotas marcam o equipamento alterado (marcar_alterado) e o relatório é
+refeito em poucos segundos; a cada RELATORIOS_INTERVALO tudo é refeito
+(datas como "atrasada" dependem do dia), se o dia ou as versões das
+tabelas de origem mudaram desde a última geração completa. Esse carimbo
+fica gravado em relatorios_carimbo, então um worker que sobe (ou é
+reciclado) não regera o parque inteiro à toa.
+
+Um relatório ainda não gerado não é calculado na requisição:
+obter_relatorio agenda a geração e levanta RelatorioPendente.
+
+Para gerar todos os relatórios pela linha de comando:
+    python relatorios.py
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import mysql.connector
+
+from db import get_connection
+from versoes import incrementar_versao, obter_versoes
+
+TIPOS_RELATORIO = ('status', 'manutencao', 'calibracao', 'inventario')
+
+# Segundos entre regenerações completas
+INTERVALO = float(os.getenv("RELATORIOS_INTERVALO", "3600"))
+# Espera após uma alteração, para agrupar alterações próximas
+ATRASO = float(os.getenv("RELATORIOS_ATRASO", "2"))
+# Equipamentos por lote na regeneração
+TAMANHO_LOTE = 200
+
+NOME_LOCK = "laboratorio.relatorios_equipamentos"
+STATUS_PENDENTES = ('agendada', 'em_andamento')
+TABELAS_ORIGEM = ('equipamentos', 'manutencoes')
+
+
+class RelatorioPendente(Exception):
+    """O relatório ainda não foi gerado; a geração foi agendada."""
+
+
+def _serializar(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor)}")
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+# ---------- relatórios por equipamento ----------
+
+def _relatorios_equipamentos(cursor, ids, hoje):
+    """Retorna {equipamento_id: {tipo: dados}} para os equipamentos existentes entre ids."""
+    cursor.execute(f"""
+        SELECT id, codigo, nome, status, categoria, localizacao, valor_aquisicao,
+               data_aquisicao, garantia_ate, total_manutencoes, manutencoes_pendentes
+        FROM equipamentos WHERE id IN ({_placeholders(ids)})
+    """, ids)
+    equipamentos = {linha[0]: linha for linha in cursor.fetchall()}
+    if not equipamentos:
+        return {}
+
+    ids = list(equipamentos)
+    cursor.execute(f"""
+        SELECT equipamento_id, tipo, status, COUNT(*), SUM(custo), MAX(data_realizada),
+               MIN(CASE WHEN status IN ('agendada', 'em_andamento') THEN data_agendada END),
+               SUM(status IN ('agendada', 'em_andamento') AND data_agendada < %s)
+        FROM manutencoes
+        WHERE equipamento_id IN ({_placeholders(ids)})
+        GROUP BY equipamento_id, tipo, status
+    """, [hoje] + ids)
+    grupos = cursor.fetchall()
+
+    cursor.execute(f"""
+        SELECT equipamento_id, frequencia_dias, ultima_realizada, proxima_agendada
+        FROM calendario_manutencoes
+        WHERE ativo = TRUE AND tipo_manutencao = 'calibracao' AND equipamento_id IN ({_placeholders(ids)})
+    """, ids)
+    calendario = {linha[0]: linha for linha in cursor.fetchall()}
+
+    manutencao = {i: {"por_status": {}, "por_tipo": {}, "custo_total": 0.0, "ultima_realizada": None,
+                      "proxima_agendada": None, "atrasadas": 0} for i in ids}
+    calibracao = {i: {"ultima_realizada": None, "proxima_agendada": None} for i in ids}
+    for equipamento_id, tipo, status, quantidade, custo, realizada, proxima, atrasadas in grupos:
+        m = manutencao[equipamento_id]
+        m["por_status"][status] = m["por_status"].get(status, 0) + quantidade
+        m["por_tipo"][tipo] = m["por_tipo"].get(tipo, 0) + quantidade
+        m["custo_total"] += float(custo or 0)
+        m["atrasadas"] += int(atrasadas or 0)
+        if realizada and (m["ultima_realizada"] is None or realizada > m["ultima_realizada"]):
+            m["ultima_realizada"] = realizada
+        if proxima and (m["proxima_agendada"] is None or proxima < m["proxima_agendada"]):
+            m["proxima_agendada"] = proxima
+        if tipo == 'calibracao':
+            c = calibracao[equipamento_id]
+            if status == 'concluida' and realizada and (c["ultima_realizada"] is None or realizada > c["ultima_realizada"]):
+                c["ultima_realizada"] = realizada
+            if proxima and (c["proxima_agendada"] is None or proxima < c["proxima_agendada"]):
+                c["proxima_agendada"] = proxima
+
+    relatorios = {}
+    for equipamento_id, (_, codigo, nome, status, categoria, localizacao, valor, aquisicao,
+                         garantia, total, pendentes) in equipamentos.items():
+        c = calibracao[equipamento_id]
+        agenda = calendario.get(equipamento_id)
+        if agenda:
+            c["frequencia_dias"] = agenda[1]
+            if agenda[2] and (c["ultima_realizada"] is None or agenda[2] > c["ultima_realizada"]):
+                c["ultima_realizada"] = agenda[2]
+            if c["proxima_agendada"] is None:
+                c["proxima_agendada"] = agenda[3]
+        c["vencida"] = bool(c["proxima_agendada"] and c["proxima_agendada"] < hoje)
+
+        relatorios[equipamento_id] = {
+            'status': {
+                "codigo": codigo, "nome": nome, "status": status,
+                "total_manutencoes": total, "manutencoes_pendentes": pendentes,
+                "manutencoes_atrasadas": manutencao[equipamento_id]["atrasadas"],
+            },
+            'manutencao': manutencao[equipamento_id],
+            'calibracao': c,
+            'inventario': {
+                "codigo": codigo, "nome": nome, "categoria": categoria, "localizacao": localizacao,
+                "valor_aquisicao": valor, "data_aquisicao": aquisicao, "garantia_ate": garantia,
+                "em_garantia": bool(garantia and garantia >= hoje),
+            },
+        }
+    return relatorios
+
+
+# ---------- relatórios do parque (todos os equipamentos) ----------
+
+def _relatorios_parque(cursor, hoje):
+    cursor.execute("SELECT status, COUNT(*), SUM(valor_aquisicao) FROM equipamentos GROUP BY status")
+    por_status = cursor.fetchall()
+    total = sum(quantidade for _, quantidade, _ in por_status)
+
+    cursor.execute("""
+        SELECT tipo, status, COUNT(*), SUM(custo),
+               SUM(status IN ('agendada', 'em_andamento') AND data_agendada < %s)
+        FROM manutencoes GROUP BY tipo, status
+    """, (hoje,))
+    manutencoes = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT COUNT(DISTINCT equipamento_id),
+               COUNT(DISTINCT CASE WHEN proxima_agendada < %s THEN equipamento_id END),
+               COUNT(DISTINCT CASE WHEN proxima_agendada BETWEEN %s AND %s THEN equipamento_id END)
+        FROM calendario_manutencoes
+        WHERE ativo = TRUE AND tipo_manutencao = 'calibracao'
+    """, (hoje, hoje, hoje + timedelta(days=30)))
+    com_calibracao, vencidas, proximas = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT categoria, COUNT(*), SUM(valor_aquisicao) FROM equipamentos GROUP BY categoria ORDER BY categoria
+    """)
+    por_categoria = cursor.fetchall()
+    cursor.execute("""
+        SELECT localizacao, COUNT(*), SUM(valor_aquisicao) FROM equipamentos GROUP BY localizacao ORDER BY localizacao
+    """)
+    por_localizacao = cursor.fetchall()
+    cursor.execute("SELECT COUNT(*) FROM equipamentos WHERE garantia_ate BETWEEN %s AND %s",
+                   (hoje, hoje + timedelta(days=90)))
+    garantias_vencendo = cursor.fetchone()[0]
+
+    manutencao = {"por_status": {}, "por_tipo": {}, "custo_total": 0.0, "atrasadas": 0}
+    for tipo, status, quantidade, custo, atrasadas in manutencoes:
+        manutencao["por_status"][status] = manutencao["por_status"].get(status, 0) + quantidade
+        manutencao["por_tipo"][tipo] = manutencao["por_tipo"].get(tipo, 0) + quantidade
+        manutencao["custo_total"] += float(custo or 0)
+        manutencao["atrasadas"] += int(atrasadas or 0)
+
+    return {
+        # Mesmo formato de GET /equipamentos/stats
+        'status': {
+            "total": total,
+            "status_stats": [{"status": status, "quantidade": quantidade} for status, quantidade, _ in por_status],
+            "manutencoes_pendentes": sum(quantidade for _, status, quantidade, _, _ in manutencoes
+                                         if status in STATUS_PENDENTES),
+            "valor_total": float(sum(valor or 0 for status, _, valor in por_status if status == 'ativo')),
+        },
+        'manutencao': manutencao,
+        'calibracao': {
+            "equipamentos_com_calibracao": com_calibracao,
+            "vencidas": vencidas,
+            "proximos_30_dias": proximas,
+        },
+        'inventario': {
+            "total": total,
+            "valor_total": float(sum(valor or 0 for _, _, valor in por_status)),
+            "por_categoria": [{"categoria": c, "quantidade": q, "valor": float(v or 0)} for c, q, v in por_categoria],
+            "por_localizacao": [{"localizacao": l, "quantidade": q, "valor": float(v or 0)} for l, q, v in por_localizacao],
+            "garantias_vencendo_90_dias": garantias_vencendo,
+        },
+    }
+
+
+# ---------- gravação ----------
+
+def _gravar(cursor, relatorios, ids_removidos=()):
+    """
+    Substitui os snapshots: relatorios = {equipamento_id ou None: {tipo: dados}}.
+    Só o último snapshot de cada (equipamento, tipo) é mantido.
+    """
+    ids = [i for i in relatorios if i is not None] + list(ids_removidos)
+    if ids:
+        cursor.execute(f"DELETE FROM relatorios_equipamentos WHERE equipamento_id IN ({_placeholders(ids)})", ids)
+    if None in relatorios:
+        cursor.execute("DELETE FROM relatorios_equipamentos WHERE equipamento_id IS NULL")
+
+    linhas = [
+        (equipamento_id, tipo, json.dumps(dados, default=_serializar))
+        for equipamento_id, por_tipo in relatorios.items()
+        for tipo, dados in por_tipo.items()
+    ]
+    if linhas:
+        cursor.executemany("""
+            INSERT INTO relatorios_equipamentos (equipamento_id, tipo_relatorio, dados_relatorio, gerado_por)
+            VALUES (%s, %s, %s, 'Sistema')
+        """, linhas)
+    # Invalida as respostas em cache das rotas de relatórios (cache_respostas.py)
+    incrementar_versao(cursor, 'relatorios_equipamentos')
+
+
+def _carimbo_gravado(cursor):
+    try:
+        cursor.execute("SELECT carimbo FROM relatorios_carimbo WHERE id = 1")
+    except mysql.connector.ProgrammingError:
+        return None  # executar_relatorios_carimbo.sql ainda não foi executado
+    linha = cursor.fetchone()
+    return linha[0] if linha else None
+
+
+def _gravar_carimbo(cursor, carimbo):
+    try:
+        cursor.execute("""
+            INSERT INTO relatorios_carimbo (id, carimbo) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE carimbo = VALUES(carimbo)
+        """, (carimbo,))
+    except mysql.connector.ProgrammingError as e:
+        print(f"Carimbo dos relatórios não gravado (execute executar_relatorios_carimbo.sql): {e}")
+
+
+def gerar_relatorios(equipamento_ids=None, carimbo=None, reaproveitar=False):
+    """
+    Regera os relatórios do parque e dos equipamentos informados (todos,
+    se equipamento_ids for None). Retorna quantos equipamentos foram processados.
+
+    carimbo (de carimbo_atual(), lido antes) é gravado ao fim de uma geração
+    completa. Com reaproveitar=True, se ele já for o gravado (outro processo
+    acabou de gerar tudo com os mesmos dados), nada é refeito.
+    """
+    hoje = date.today()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # Serializa gerações de processos diferentes sobre as mesmas linhas
+        cursor.execute("SELECT GET_LOCK(%s, 30)", (NOME_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Outra geração de relatórios não terminou a tempo")
+        try:
+            if reaproveitar and carimbo is not None and _carimbo_gravado(cursor) == carimbo:
+                return 0
+            if equipamento_ids is None:
+                cursor.execute("SELECT id FROM equipamentos ORDER BY id")
+                equipamento_ids = [linha[0] for linha in cursor.fetchall()]
+            equipamento_ids = sorted(set(equipamento_ids))
+
+            for inicio in range(0, len(equipamento_ids), TAMANHO_LOTE):
+                lote = equipamento_ids[inicio:inicio + TAMANHO_LOTE]
+                relatorios = _relatorios_equipamentos(cursor, lote, hoje)
+                _gravar(cursor, relatorios, [i for i in lote if i not in relatorios])
+                conn.commit()
+
+            _gravar(cursor, {None: _relatorios_parque(cursor, hoje)})
+            if carimbo is not None:
+                _gravar_carimbo(cursor, carimbo)
+            conn.commit()
+            return len(equipamento_ids)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (NOME_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def carimbo_atual():
+    """
+    Dia e versões das tabelas de origem: se não mudaram, os relatórios
+    continuam válidos. Retorna (carimbo atual, carimbo da última geração completa).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        atual = json.dumps([date.today().isoformat(), obter_versoes(cursor, TABELAS_ORIGEM)], sort_keys=True)
+        return atual, _carimbo_gravado(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _equipamento_existe(equipamento_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM equipamentos WHERE id = %s", (equipamento_id,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _ler_relatorio(tipo, equipamento_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT data_geracao, dados_relatorio FROM relatorios_equipamentos
+            WHERE equipamento_id <=> %s AND tipo_relatorio = %s
+            ORDER BY id DESC LIMIT 1
+        """, (equipamento_id, tipo))
+        linha = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+    return linha
+
+
+def obter_relatorio(tipo, equipamento_id=None):
+    """
+    Último snapshot do relatório: {tipo, equipamento_id, data_geracao, dados}.
+    Retorna None se o equipamento não existe. Se o relatório ainda não foi
+    gerado (ex.: logo após a instalação ou o cadastro), agenda a geração
+    e levanta RelatorioPendente, sem prender a requisição.
+    """
+    linha = _ler_relatorio(tipo, equipamento_id)
+    if linha is None:
+        if equipamento_id is not None and not _equipamento_existe(equipamento_id):
+            return None
+        marcar_alterado(equipamento_id)
+        raise RelatorioPendente("Relatório em geração, tente novamente em alguns segundos")
+    data_geracao, dados = linha
+    return {
+        "tipo": tipo,
+        "equipamento_id": equipamento_id,
+        "data_geracao": data_geracao.isoformat(),
+        "dados": json.loads(dados),
+    }
+
+
+# ---------- geração em segundo plano ----------
+
+class GeradorRelatorios:
+    """Thread que regera os relatórios alterados e, periodicamente, todos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._alterados = set()
+        self._completo = False
+        self._forcado = False  # geração completa pedida por marcar_alterado()
+        self._thread = None
+        self._pid = None
+
+    def marcar_alterado(self, equipamento_id):
+        with self._lock:
+            if equipamento_id is None:
+                self._completo = self._forcado = True
+            else:
+                self._alterados.add(equipamento_id)
+        self._evento.set()
+
+    def _executar(self):
+        # A primeira verificação é logo ao iniciar, contra o carimbo gravado
+        verificar = True
+        while True:
+            if not verificar:
+                if self._evento.wait(INTERVALO):
+                    # Agrupa as alterações que chegarem logo em seguida
+                    time.sleep(ATRASO)
+                else:
+                    verificar = True
+
+            carimbo = None
+            if verificar:
+                # Regeneração completa só se os dados ou o dia mudaram desde
+                # a última geração completa, feita por qualquer processo
+                # (inclui alterações feitas fora desta API)
+                verificar = False
+                try:
+                    carimbo, gravado = carimbo_atual()
+                    if carimbo != gravado:
+                        with self._lock:
+                            self._completo = True
+                except Exception as e:
+                    print(f"Erro ao consultar versões para os relatórios: {e}")
+                    with self._lock:
+                        self._completo = True
+            self._evento.clear()
+
+            with self._lock:
+                completo, forcado, alterados = self._completo, self._forcado, self._alterados
+                self._completo, self._forcado, self._alterados = False, False, set()
+            if not completo and not alterados:
+                continue
+
+            try:
+                if completo:
+                    if carimbo is None:
+                        carimbo = carimbo_atual()[0]
+                    # Vários workers que sobem juntos: só o primeiro regera
+                    gerar_relatorios(None, carimbo, reaproveitar=not forcado)
+                else:
+                    gerar_relatorios(alterados)
+            except Exception as e:
+                print(f"Erro ao gerar relatórios de equipamentos: {e}")
+                # Devolve o que faltou para a próxima rodada
+                with self._lock:
+                    self._completo = self._completo or completo
+                    self._forcado = self._forcado or forcado
+                    self._alterados |= alterados
+                time.sleep(ATRASO)
+
+    def ativo(self):
+        # Threads não sobrevivem a um fork: cada processo precisa da sua
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def iniciar(self):
+        if self.ativo():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._executar, name="relatorios", daemon=True)
+        self._thread.start()
+
+
+_gerador = GeradorRelatorios()
+_gerador_lock = threading.Lock()
+
+
+def garantir_gerador():
+    """Inicia o gerador de relatórios deste processo, se ainda não estiver rodando."""
+    if _gerador.ativo() or os.getenv("RELATORIOS_ATIVO", "1") != "1":
+        return
+    with _gerador_lock:
+        _gerador.iniciar()
+
+
+def marcar_alterado(equipamento_id=None):
+    """
+    Agenda a regeneração dos relatórios do equipamento (e do parque).
+    Sem equipamento_id, regera todos. Chame depois do commit da alteração.
+    """
+    _gerador.marcar_alterado(equipamento_id)
+
+
+if __name__ == "__main__":
+    inicio = time.monotonic()
+    processados = gerar_relatorios(carimbo=carimbo_atual()[0])
+    print(f"Relatórios gerados para {processados} equipamento(s) e o parque em {time.monotonic() - inicio:.1f}s")
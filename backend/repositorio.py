@@ -0,0 +1,114 @@
+"""
+Conversão das linhas do banco em dicionários prontos para JSON.
+
+As rotas leem com cursores de tuplas (mais baratos que dictionary=True) e
+convertem as linhas com o Mapeador da tabela: Decimal vira float, DATE vira
+"AAAA-MM-DD" e DATETIME/TIMESTAMP vira a data HTTP que o jsonify já usava.
+O conversor de cada coluna é escolhido uma vez por formato de resultado
+(cursor.description), e não a cada valor com isinstance: o Mapeador gera
+e guarda uma função que monta os dicionários daquele formato. Como cada
+projeção de fields= é um formato, só os MAXIMO_FORMATOS mais usados de
+cada Mapeador ficam guardados (LRU).
+
+Os códigos de tipo de cursor.description são os do protocolo do MySQL,
+iguais no mysql.connector e no PyMySQL/aiomysql (modo assíncrono).
+"""
+import functools
+
+from werkzeug.http import http_date
+
+# Formatos de resultado com a função gerada guardada, por Mapeador
+MAXIMO_FORMATOS = 64
+
+# Códigos de tipo do protocolo MySQL
+_TIPOS_DECIMAL = (0, 246)          # DECIMAL, NEWDECIMAL
+_TIPOS_DATA = (10, 14)             # DATE, NEWDATE
+_TIPOS_DATA_HORA = (7, 12)         # TIMESTAMP, DATETIME
+
+
+def _data(valor):
+    return valor.isoformat()
+
+
+CONVERSORES_TIPO = {}
+CONVERSORES_TIPO.update(dict.fromkeys(_TIPOS_DECIMAL, float))
+CONVERSORES_TIPO.update(dict.fromkeys(_TIPOS_DATA, _data))
+CONVERSORES_TIPO.update(dict.fromkeys(_TIPOS_DATA_HORA, http_date))
+
+
+class Mapeador:
+    """
+    Mapeia as linhas de um cursor de tuplas para dicionários.
+
+    conversores substitui o conversor do tipo para colunas específicas;
+    padroes define o valor usado no lugar de NULL (o padrão é None).
+    """
+
+    def __init__(self, conversores=None, padroes=None):
+        self.conversores = dict(conversores or {})
+        self.padroes = dict(padroes or {})
+        # lru_cache é thread-safe e limita o número de funções geradas
+        self._compilados = functools.lru_cache(maxsize=MAXIMO_FORMATOS)(self._gerar)
+
+    def _compilar(self, descricao):
+        return self._compilados(tuple((coluna[0], coluna[1]) for coluna in descricao))
+
+    def _gerar(self, colunas):
+        # Monta uma única expressão que cria o dicionário da linha: nenhuma
+        # decisão sobre tipo ou NULL padrão fica para ser tomada por valor
+        campos = []
+        ambiente = {}
+        for posicao, (nome, tipo) in enumerate(colunas):
+            conversor = self.conversores.get(nome, CONVERSORES_TIPO.get(tipo))
+            valor = f"l[{posicao}]"
+            if conversor is None and nome not in self.padroes:
+                campos.append(f"{nome!r}: {valor}")
+                continue
+            ambiente[f"p{posicao}"] = self.padroes.get(nome)
+            if conversor is not None:
+                ambiente[f"c{posicao}"] = conversor
+                campos.append(f"{nome!r}: p{posicao} if {valor} is None else c{posicao}({valor})")
+            else:
+                campos.append(f"{nome!r}: p{posicao} if {valor} is None else {valor}")
+        return eval("lambda linhas: [{" + ", ".join(campos) + "} for l in linhas]", ambiente)
+
+    def mapear(self, descricao, linhas):
+        return self._compilar(descricao)(linhas)
+
+    def mapear_uma(self, descricao, linha):
+        return None if linha is None else self.mapear(descricao, (linha,))[0]
+
+
+# ---------- mapeadores por tabela ----------
+
+# Resultados sem tratamento especial (agregações, contagens)
+GERAL = Mapeador()
+
+MATERIAL = Mapeador()
+
+# /materiaisList: a tela de listagem espera textos e números sem NULL
+MATERIAL_LISTA = Mapeador(
+    conversores={'tem_pdf': bool},
+    padroes={
+        'codigo_material': '', 'nome': '', 'tipo': '', 'fabricante': '', 'unidade': '',
+        'quantidade': 0, 'preco': 0, 'estoque_atual': 0, 'estoque_minimo': 0,
+    },
+)
+
+EQUIPAMENTO = Mapeador()
+
+MANUTENCAO = Mapeador()
+
+
+# ---------- leitura ----------
+
+def buscar_todos(cursor, sql, parametros=(), mapeador=GERAL):
+    """Executa a consulta num cursor de tuplas e retorna a lista de dicionários."""
+    cursor.execute(sql, parametros)
+    return mapeador.mapear(cursor.description, cursor.fetchall())
+
+
+def buscar_um(cursor, sql, parametros=(), mapeador=GERAL):
+    """Como buscar_todos, mas retorna só a primeira linha (ou None)."""
+    cursor.execute(sql, parametros)
+    return mapeador.mapear_uma(cursor.description, cursor.fetchone())
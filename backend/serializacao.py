@@ -0,0 +1,82 @@
+"""
+Serialização das respostas.
+
+JSON (jsonify) com o orjson, se instalado:
+    pip install orjson
+
+O orjson escreve direto em bytes e é bem mais rápido que o json da
+biblioteca padrão nas listas grandes. O resultado é o mesmo JSON (chaves
+ordenadas, datas no formato do Flask), só sem escapar os caracteres não
+ASCII. Sem o orjson, em modo debug (saída indentada) ou para valores que
+ele não suporta, usa o serializador padrão do Flask.
+
+As rotas de listagem aceitam ainda ?formato=colunar (nomes das colunas uma
+vez e cada registro como lista de valores) e ?formato=msgpack (o mesmo
+layout em MessagePack; requer pip install msgpack).
+"""
+from flask.json.provider import DefaultJSONProvider
+
+from consultas import ParametroInvalido
+from exportacao import FormatoIndisponivel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATOS_LISTA = ('json', 'colunar', 'msgpack')
+MIMETYPE_MSGPACK = 'application/x-msgpack'
+
+if orjson is not None:
+    # Datas e dataclasses passam pelo default do Flask (mesmo formato do jsonify)
+    _OPCOES = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class ProvedorJSON(DefaultJSONProvider):
+
+    def response(self, *args, **kwargs):
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or indentar:
+            return super().response(*args, **kwargs)
+
+        opcoes = _OPCOES | orjson.OPT_SORT_KEYS if self.sort_keys else _OPCOES
+        try:
+            corpo = orjson.dumps(self._prepare_response_obj(args, kwargs), default=self.default, option=opcoes)
+        except TypeError:
+            # JSONEncodeError (ex.: inteiro maior que 64 bits)
+            return super().response(*args, **kwargs)
+        return self._app.response_class(corpo + b"\n", mimetype=self.mimetype)
+
+
+def formato_lista(args):
+    """Formato pedido em ?formato= (padrão json)."""
+    formato = args.get("formato") or "json"
+    if formato not in FORMATOS_LISTA:
+        raise ParametroInvalido(f"Formato inválido. Use: {', '.join(FORMATOS_LISTA)}")
+    if formato == "msgpack" and msgpack is None:
+        raise FormatoIndisponivel("O formato msgpack requer o pacote msgpack")
+    return formato
+
+
+def colunar(registros):
+    """[{coluna: valor}, ...] -> {"colunas": [...], "linhas": [[valor, ...], ...]}"""
+    # Todos os registros vêm do mesmo mapeador, com as chaves na mesma ordem
+    colunas = list(registros[0]) if registros else []
+    return {"colunas": colunas, "linhas": [list(registro.values()) for registro in registros]}
+
+
+def codificar_lista(provedor, dados, formato, chave=None):
+    """
+    Corpo e mimetype da resposta de uma listagem. chave é o campo de dados
+    que contém a lista (None quando dados já é a lista).
+    """
+    if formato != "json":
+        dados = colunar(dados) if chave is None else {**dados, chave: colunar(dados[chave])}
+    if formato == "msgpack":
+        return msgpack.packb(dados), MIMETYPE_MSGPACK
+    return provedor.response(dados).get_data(), provedor.mimetype
@@ -0,0 +1,85 @@
+"""
+Ponto de entrada de produção da API.
+
+Usa o gunicorn (Linux/macOS) com a configuração de gunicorn.conf.py; se o
+gunicorn não estiver disponível (ex.: Windows), usa o waitress com várias
+threads num único processo:
+    pip install gunicorn      # ou: pip install waitress
+    python servidor.py
+
+Com SERVIDOR_MODO=asgi no .env, usa o uvicorn com asgi.py (rotas de
+leitura mais usadas, emails e /events assíncronos; veja SERVIDOR_PRODUCAO.md).
+
+O `python Backend.py` continua existindo para desenvolvimento.
+"""
+import multiprocessing
+import os
+import sys
+from importlib.util import find_spec
+
+from dotenv import load_dotenv
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+CONFIGURACAO_GUNICORN = os.path.join(DIRETORIO, "gunicorn.conf.py")
+
+
+def _executar_gunicorn():
+    from gunicorn.app.wsgiapp import WSGIApplication
+
+    sys.argv = [sys.argv[0], "--config", CONFIGURACAO_GUNICORN, "--chdir", DIRETORIO, "Backend:app"]
+    WSGIApplication("%(prog)s [OPTIONS]").run()
+
+
+def _executar_waitress():
+    from waitress import serve
+
+    from Backend import app
+
+    endereco = os.getenv("SERVIDOR_ENDERECO", "0.0.0.0:5000")
+    serve(
+        app,
+        listen=endereco,
+        threads=int(os.getenv("SERVIDOR_THREADS", "8")),
+        channel_timeout=int(os.getenv("SERVIDOR_TIMEOUT", "60")),
+    )
+
+
+def _executar_uvicorn():
+    import uvicorn
+
+    host, _, porta = os.getenv("SERVIDOR_ENDERECO", "0.0.0.0:5000").rpartition(":")
+    uvicorn.run(
+        "asgi:app",
+        app_dir=DIRETORIO,
+        host=host or "0.0.0.0",
+        port=int(porta),
+        # Cada processo atende milhares de conexões: bem menos processos que no gthread
+        workers=int(os.getenv("SERVIDOR_WORKERS", str(multiprocessing.cpu_count()))),
+        timeout_keep_alive=int(os.getenv("SERVIDOR_KEEPALIVE", "5")),
+        timeout_graceful_shutdown=int(os.getenv("SERVIDOR_GRACEFUL_TIMEOUT", "30")),
+        limit_max_requests=int(os.getenv("SERVIDOR_MAX_REQUESTS", "0")) or None,
+        log_level=os.getenv("SERVIDOR_LOG_LEVEL", "info"),
+    )
+
+
+def main():
+    load_dotenv()
+    if os.getenv("SERVIDOR_MODO", "wsgi") == "asgi":
+        faltando = [m for m in ("uvicorn", "starlette", "aiomysql", "aiosmtplib") if not find_spec(m)]
+        if faltando:
+            sys.exit(f"Instale o modo assíncrono: pip install {' '.join(faltando)}")
+        _executar_uvicorn()
+        return
+
+    if os.name != "nt" and find_spec("gunicorn"):
+        _executar_gunicorn()
+        return
+
+    if not find_spec("waitress"):
+        sys.exit("Instale um servidor de produção: pip install gunicorn (ou waitress)")
+    print("gunicorn indisponível: usando waitress (um processo, várias threads)")
+    _executar_waitress()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Sincronização incremental para clientes offline (GET /sync).
+
+A primeira chamada (sem since) retorna todos os registros das tabelas e um
+token; as seguintes, com since=<token>, retornam só os registros alterados
+desde então (pelo índice de data_atualizacao) e os ids excluídos, lidos de
+registros_excluidos. O cliente aplica as alterações sobre a cópia local e
+guarda o novo token.
+
+As datas são do relógio do banco. Uma alteração recebe data_atualizacao ao
+ser executada, não no commit: por isso cada sincronização relê os últimos
+SYNC_JANELA_SEGUNDOS antes do token, e um registro pode vir repetido (o
+cliente substitui pelo mais recente). Um token mais antigo que
+SYNC_RETENCAO_DIAS, cujas exclusões já foram removidas, recebe a carga
+completa (completo=true): o cliente descarta a cópia local.
+
+As rotas de exclusão chamam registrar_exclusao() na mesma transação.
+Exclusões feitas por fora da API (SQL manual) não chegam aos clientes.
+"""
+import base64
+import json
+import os
+import time
+
+import repositorio
+from consultas import COLUNAS_BUSCA_MATERIAL, Consulta, ParametroInvalido
+
+TABELAS = ('materiais', 'equipamentos', 'manutencoes')
+
+# Segundos relidos antes do token (transações confirmadas depois de alterar)
+JANELA = int(os.getenv("SYNC_JANELA_SEGUNDOS", "60"))
+# Dias que as exclusões ficam guardadas
+RETENCAO_DIAS = int(os.getenv("SYNC_RETENCAO_DIAS", "30"))
+
+# Segundos entre limpezas das exclusões antigas (por processo)
+INTERVALO_LIMPEZA = 3600
+
+# Mesmas colunas e conversões das listagens (manutenções sem os dados do
+# equipamento: o cliente junta com os equipamentos sincronizados)
+_CONSULTAS = {
+    'materiais': (f"SELECT {COLUNAS_BUSCA_MATERIAL}, data_atualizacao FROM materiais",
+                  repositorio.MATERIAL_LISTA),
+    'equipamentos': ("SELECT * FROM equipamentos", repositorio.EQUIPAMENTO),
+    'manutencoes': ("SELECT * FROM manutencoes", repositorio.MANUTENCAO),
+}
+
+_proxima_limpeza = 0
+
+
+def registrar_exclusao(cursor, tabela, *registro_ids):
+    """Guarda os ids excluídos, na transação do chamador."""
+    global _proxima_limpeza
+    cursor.executemany(
+        "INSERT INTO registros_excluidos (tabela, registro_id) VALUES (%s, %s)",
+        [(tabela, registro_id) for registro_id in registro_ids],
+    )
+    if time.monotonic() >= _proxima_limpeza:
+        _proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+        cursor.execute("""
+            DELETE FROM registros_excluidos
+            WHERE data_exclusao < NOW() - INTERVAL %s DAY
+            LIMIT 10000
+        """, (RETENCAO_DIAS,))
+
+
+def _codificar_token(instante):
+    return base64.urlsafe_b64encode(json.dumps([instante]).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_token(token):
+    try:
+        instante, = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+        return int(instante)
+    except Exception:
+        raise ParametroInvalido("Token de sincronização inválido")
+
+
+def sincronizar(args):
+    """
+    Plano de /sync. Parâmetros: since (token da sincronização anterior) e
+    tabelas (separadas por vírgula; padrão: todas).
+    """
+    tabelas = [t.strip() for t in (args.get("tabelas") or "").split(",") if t.strip()] or list(TABELAS)
+    invalidas = sorted(set(tabelas) - set(TABELAS))
+    if invalidas:
+        raise ParametroInvalido(f"Tabela(s) inválida(s): {', '.join(invalidas)}")
+    desde = _decodificar_token(args.get("since")) if args.get("since") else None
+    return _plano_sincronizacao(list(dict.fromkeys(tabelas)), desde)
+
+
+def _plano_sincronizacao(tabelas, desde):
+    # O token da resposta é lido antes das consultas: o que for alterado
+    # durante a leitura vem de novo na próxima sincronização
+    agora = (yield Consulta("SELECT UNIX_TIMESTAMP()", unica=True))[0]
+    completo = desde is None or agora - desde > RETENCAO_DIAS * 86400
+
+    resposta = {"token": _codificar_token(agora), "completo": completo}
+    for tabela in tabelas:
+        query, mapeador = _CONSULTAS[tabela]
+        parametros = []
+        if not completo:
+            query += " WHERE data_atualizacao >= FROM_UNIXTIME(%s)"
+            parametros.append(desde - JANELA)
+        query += " ORDER BY data_atualizacao, id"
+        resposta[tabela] = {"alterados": (yield Consulta(query, parametros, mapeador=mapeador)), "excluidos": []}
+
+    if not completo:
+        linhas = yield Consulta(f"""
+            SELECT tabela, registro_id FROM registros_excluidos
+            WHERE tabela IN ({', '.join(['%s'] * len(tabelas))})
+              AND data_exclusao >= FROM_UNIXTIME(%s)
+            ORDER BY id
+        """, [*tabelas, desde - JANELA])
+        for tabela, registro_id in linhas:
+            resposta[tabela]["excluidos"].append(registro_id)
+
+    return resposta
@@ -0,0 +1,50 @@
+"""
+Versão dos dados de cada tabela. Toda transação que altera uma tabela
+incrementa a versão dela; quem guarda resultados derivados (exportações,
+caches) usa as versões como carimbo para saber se ainda estão válidos.
+
+A versão de uma tabela é a soma das suas VERSOES_FATIAS linhas em
+versoes_tabelas, e cada transação incrementa uma fatia sorteada. Com uma
+linha só, o bloqueio dela (mantido até o commit) enfileiraria todas as
+escritas na tabela, mesmo em registros diferentes (ex.: baixas de
+materiais distintos). A soma só cresce, então dois estados dos dados
+nunca têm a mesma versão.
+"""
+import os
+import random
+
+FATIAS = int(os.getenv("VERSOES_FATIAS", "16"))
+
+
+def incrementar_versao(cursor, *tabelas):
+    """Incrementa a versão das tabelas dentro da transação do chamador."""
+    # Sempre na mesma ordem: transações que alteram as mesmas tabelas
+    # bloqueiam as linhas de versoes_tabelas sem risco de deadlock
+    for tabela in sorted(set(tabelas)):
+        cursor.execute("""
+            INSERT INTO versoes_tabelas (tabela, fatia, versao) VALUES (%s, %s, 1)
+            ON DUPLICATE KEY UPDATE versao = versao + 1
+        """, (tabela, random.randrange(FATIAS)))
+
+
+def consulta_versoes(tabelas):
+    """SQL e parâmetros da leitura das versões (usados também pelo modo assíncrono)."""
+    return f"""
+        SELECT tabela, SUM(versao) FROM versoes_tabelas
+        WHERE tabela IN ({', '.join(['%s'] * len(tabelas))})
+        GROUP BY tabela
+    """, list(tabelas)
+
+
+def montar_versoes(tabelas, linhas):
+    """Retorna {tabela: versão}; tabelas nunca alteradas têm versão 0."""
+    versoes = dict.fromkeys(tabelas, 0)
+    for tabela, versao in linhas:
+        versoes[tabela] = int(versao)
+    return versoes
+
+
+def obter_versoes(cursor, tabelas):
+    """Lê as versões das tabelas (ver montar_versoes)."""
+    cursor.execute(*consulta_versoes(tabelas))
+    return montar_versoes(tabelas, cursor.fetchall())
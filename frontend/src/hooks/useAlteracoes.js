@@ -0,0 +1,75 @@
+import { useEffect, useRef } from "react";
+
+const EVENTS_URL = "http://localhost:5000/events";
+
+// Tempo para agrupar alterações próximas (ex.: baixa em lote) numa única atualização
+const ESPERA_MS = 300;
+// O EventSource não reconecta sozinho após uma resposta de erro (ex.: 503
+// quando o servidor atingiu o limite de conexões)
+const NOVA_TENTATIVA_MS = 30000;
+
+/**
+ * Assina o feed de alterações do backend (/events) para as tabelas
+ * informadas. aoAlterar recebe a lista de alterações
+ * [{ tabela, id, operacao, versao }] ou null quando a página deve
+ * recarregar tudo (reconexão sem como recuperar o que foi perdido).
+ * Alterações com id null valem para a tabela inteira.
+ */
+function useAlteracoes(tabelas, aoAlterar) {
+  const callbackRef = useRef(aoAlterar);
+  callbackRef.current = aoAlterar;
+  const chaveTabelas = tabelas.join(",");
+
+  useEffect(() => {
+    let fonte = null;
+    let pendentes = [];
+    let recarregar = false;
+    let timer = null;
+    let timerConexao = null;
+
+    const agendar = () => {
+      if (timer) return;
+      timer = setTimeout(() => {
+        const lista = recarregar ? null : pendentes;
+        pendentes = [];
+        recarregar = false;
+        timer = null;
+        callbackRef.current(lista);
+      }, ESPERA_MS);
+    };
+
+    const conectar = (reconexao) => {
+      fonte = new EventSource(`${EVENTS_URL}?tabelas=${chaveTabelas}`);
+      fonte.addEventListener("alteracao", (evento) => {
+        pendentes.push(JSON.parse(evento.data));
+        agendar();
+      });
+      fonte.addEventListener("reset", () => {
+        recarregar = true;
+        agendar();
+      });
+      fonte.addEventListener("open", () => {
+        // Alterações feitas enquanto estava desconectado não chegam
+        if (reconexao) {
+          reconexao = false;
+          recarregar = true;
+          agendar();
+        }
+      });
+      fonte.onerror = () => {
+        if (fonte.readyState === EventSource.CLOSED) {
+          timerConexao = setTimeout(() => conectar(true), NOVA_TENTATIVA_MS);
+        }
+      };
+    };
+    conectar(false);
+
+    return () => {
+      clearTimeout(timer);
+      clearTimeout(timerConexao);
+      fonte.close();
+    };
+  }, [chaveTabelas]);
+}
+
+export default useAlteracoes;
@@ -50,7 +50,7 @@ const CadastroManutencaoPage = () => {
 
   const fetchEquipamentos = async () => {
     try {
-      const response = await fetch('http://localhost:5000/equipamentos');
+      const response = await fetch('http://localhost:5000/equipamentos?fields=id,codigo,nome');
       if (response.ok) {
         const data = await response.json();
         setEquipamentos(data);
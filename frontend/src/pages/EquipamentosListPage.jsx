@@ -17,7 +17,7 @@ const EquipamentosListPage = () => {
 
   const fetchEquipamentos = async () => {
     try {
-      const response = await fetch('http://localhost:5000/equipamentos');
+      const response = await fetch('http://localhost:5000/equipamentos?fields=id,codigo,nome,modelo,fabricante,categoria,localizacao,status,data_aquisicao,valor_aquisicao,manutencoes_pendentes');
       if (response.ok) {
         const data = await response.json();
         setEquipamentos(data);
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import axios from "axios";
 import Sidebar from "../components/Sidebar";
 import Header from "../components/Header";
+import useAlteracoes from "../hooks/useAlteracoes";
 import "../styles/HomePage.css";
 
 function HomePage() {
@@ -19,29 +20,38 @@ function HomePage() {
     estoqueBaixo: 0
   });
 
+  const fetchData = async (mostrarLoading = true) => {
+    try {
+      if (mostrarLoading) setLoading(true);
+
+      // Todos os indicadores vêm de uma única requisição
+      const { data } = await axios.get("http://localhost:5000/dashboard");
+
+      setStats({
+        total: data.total,
+        vencidos: data.vencidos,
+        proximosVencimento: data.proximosVencimento,
+        estoqueBaixo: data.estoqueBaixo
+      });
+      setMateriaisVencidos(data.materiais_vencidos);
+      setValorEstoque({
+        valor_total: data.valor_total,
+        total_materiais: data.total_materiais,
+        preco_medio: data.preco_medio
+      });
+    } catch (error) {
+      console.error("Erro ao buscar dados:", error);
+    } finally {
+      if (mostrarLoading) setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        setLoading(true);
-  
-        const [statsRes, vencidosRes, valorEstoqueRes] = await Promise.all([
-          axios.get("http://localhost:5000/materiais/stats"),
-          axios.get("http://localhost:5000/materiais/vencidos"),
-          axios.get("http://localhost:5000/materiais/valor-estoque")
-        ]);
-  
-        setStats(statsRes.data);
-        setMateriaisVencidos(vencidosRes.data);
-        setValorEstoque(valorEstoqueRes.data);
-      } catch (error) {
-        console.error("Erro ao buscar dados:", error);
-      } finally {
-        setLoading(false);
-      }
-    };
-  
     fetchData();
   }, []);
+
+  // Indicadores são atualizados quando algum material muda
+  useAlteracoes(["materiais"], () => fetchData(false));
   
 
   const formatDate = (dateString) => {
@@ -169,7 +179,7 @@ function HomePage() {
                   </div>
                 </div>
                 <div className="section-badge">
-                  <span>{materiaisVencidos.length}</span>
+                  <span>{stats.vencidos}</span>
                 </div>
               </div>
 
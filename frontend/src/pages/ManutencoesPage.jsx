@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useParams } from 'react-router-dom';
 import Sidebar from '../components/Sidebar';
 import Header from '../components/Header';
+import useAlteracoes from '../hooks/useAlteracoes';
 import '../styles/ManutencoesPage.css';
 
 const ManutencoesPage = () => {
@@ -13,15 +14,22 @@ const ManutencoesPage = () => {
   const [statusFilter, setStatusFilter] = useState('');
   const [tipoFilter, setTipoFilter] = useState('');
   const [selectedEquipamento, setSelectedEquipamento] = useState(null);
+  const [proximoCursor, setProximoCursor] = useState(null);
+  const [totalManutencoes, setTotalManutencoes] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchEquipamentos();
-    fetchManutencoes();
   }, [equipamentoId]);
 
+  useEffect(() => {
+    fetchManutencoes();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [equipamentoId, statusFilter, tipoFilter]);
+
   const fetchEquipamentos = async () => {
     try {
-      const response = await fetch('http://localhost:5000/equipamentos');
+      const response = await fetch('http://localhost:5000/equipamentos?fields=id,codigo,nome,categoria,status');
       if (response.ok) {
         const data = await response.json();
         setEquipamentos(data);
@@ -36,16 +44,31 @@ const ManutencoesPage = () => {
     }
   };
 
+  // Status, tipo e equipamento são filtrados no servidor, página a página
+  const fetchPagina = async (cursor) => {
+    const params = new URLSearchParams({ limite: 50 });
+    if (statusFilter) params.append('status', statusFilter);
+    if (tipoFilter) params.append('tipo', tipoFilter);
+    if (equipamentoId) params.append('equipamento_id', equipamentoId);
+    if (cursor) {
+      params.append('cursor', cursor);
+    } else {
+      params.append('incluir_total', 1);
+    }
+    const response = await fetch(`http://localhost:5000/manutencoes?${params}`);
+    if (!response.ok) {
+      throw new Error('Erro ao buscar manutenções');
+    }
+    return response.json();
+  };
+
   const fetchManutencoes = async () => {
     try {
       setLoading(true);
-      const response = await fetch('http://localhost:5000/manutencoes');
-      if (response.ok) {
-        const data = await response.json();
-        setManutencoes(data);
-      } else {
-        console.error('Erro ao buscar manutenções');
-      }
+      const data = await fetchPagina(null);
+      setManutencoes(data.manutencoes);
+      setProximoCursor(data.proximo_cursor);
+      setTotalManutencoes(data.total);
     } catch (error) {
       console.error('Erro na requisição:', error);
     } finally {
@@ -53,6 +76,63 @@ const ManutencoesPage = () => {
     }
   };
 
+  // Carrega a próxima página a partir do cursor retornado pelo servidor
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await fetchPagina(proximoCursor);
+      setManutencoes(prevManutencoes => [...prevManutencoes, ...data.manutencoes]);
+      setProximoCursor(data.proximo_cursor);
+    } catch (error) {
+      console.error('Erro na requisição:', error);
+      alert('Erro ao carregar mais manutenções');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Uma manutenção alterada pode deixar de atender aos filtros da tela
+  const atendeFiltros = (manutencao) =>
+    (!statusFilter || statusFilter.split(',').includes(manutencao.status)) &&
+    (!tipoFilter || tipoFilter.split(',').includes(manutencao.tipo));
+
+  // Alterações feitas em outras telas ou por outros usuários: busca só as
+  // manutenções alteradas; inclusões mudam a ordem e recarregam a lista
+  useAlteracoes(['manutencoes'], async (alteracoes) => {
+    if (alteracoes === null || alteracoes.some(a => a.id === null || a.operacao === 'criacao')) {
+      fetchManutencoes();
+      return;
+    }
+
+    const removidas = new Set(alteracoes.filter(a => a.operacao === 'exclusao').map(a => a.id));
+    const carregadas = new Set(manutencoes.map(m => m.id));
+    const alteradas = [...new Set(alteracoes.map(a => a.id))]
+      .filter(id => carregadas.has(id) && !removidas.has(id));
+
+    const atualizadas = {};
+    await Promise.all(alteradas.map(async (id) => {
+      try {
+        const response = await fetch(`http://localhost:5000/manutencoes/${id}`);
+        if (response.ok) {
+          const manutencao = await response.json();
+          if (atendeFiltros(manutencao)) {
+            atualizadas[id] = manutencao;
+          } else {
+            removidas.add(id);
+          }
+        } else if (response.status === 404) {
+          removidas.add(id);
+        }
+      } catch (error) {
+        console.error('Erro ao atualizar manutenção:', error);
+      }
+    }));
+
+    setManutencoes(prevManutencoes => prevManutencoes
+      .filter(manutencao => !removidas.has(manutencao.id))
+      .map(manutencao => atualizadas[manutencao.id] || manutencao));
+  });
+
   const handleConcluirManutencao = async (id) => {
     try {
       const response = await fetch(`http://localhost:5000/manutencoes/${id}/concluir`, {
@@ -176,11 +256,7 @@ const ManutencoesPage = () => {
       manutencao.codigo_equipamento?.toLowerCase().includes(searchTerm.toLowerCase()) ||
       manutencao.responsavel?.toLowerCase().includes(searchTerm.toLowerCase());
     
-    const matchesStatus = !statusFilter || manutencao.status === statusFilter;
-    const matchesTipo = !tipoFilter || manutencao.tipo === tipoFilter;
-    const matchesEquipamento = !equipamentoId || manutencao.equipamento_id == equipamentoId;
-    
-    return matchesSearch && matchesStatus && matchesTipo && matchesEquipamento;
+    return matchesSearch;
   });
 
   return (
@@ -385,9 +461,16 @@ const ManutencoesPage = () => {
           ))
         )}
       </div>
+      {!loading && proximoCursor && (
+        <div className="load-more-container">
+          <button className="btn-secondary" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Carregando...' : 'Carregar mais'}
+          </button>
+        </div>
+      )}
 
           <div className="stats-footer">
-            <p>Total de manutenções: {filteredManutencoes.length}</p>
+            <p>Total de manutenções: {searchTerm ? filteredManutencoes.length : totalManutencoes}</p>
             {filteredManutencoes.length > 0 && (
               <div className="stats-details">
                 <span>Agendadas: {filteredManutencoes.filter(m => m.status === 'agendada').length}</span>
@@ -4,6 +4,7 @@ import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import Sidebar from "../components/Sidebar";
 import Header from "../components/Header";
+import useAlteracoes from "../hooks/useAlteracoes";
 import "../styles/MateriaisListPage.css";
 
 function MateriaisListPage() {
@@ -16,25 +17,116 @@ function MateriaisListPage() {
   const [sortBy, setSortBy] = useState("nome");
   const [deletingId, setDeletingId] = useState(null);
   const [exporting, setExporting] = useState(false);
+  const [proximoCursor, setProximoCursor] = useState(null);
+  const [totalMateriais, setTotalMateriais] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState(null);
 
-  useEffect(() => {
-    const fetchMateriais = async () => {
-      try {
-        setLoading(true);
-        const response = await axios.get("http://localhost:5000/materiaisList");
-        setMateriais(response.data);
-        setErro("");
-      } catch (err) {
-        console.error(err);
-        setErro("Erro ao carregar os materiais. Tente novamente.");
-      } finally {
-        setLoading(false);
-      }
-    };
+  // Filtros aplicados no servidor (a lista é paginada)
+  const getFiltrosServidor = () => {
+    const formatar = (data) => data.toISOString().slice(0, 10);
+    const dia = 24 * 60 * 60 * 1000;
+    const hoje = new Date();
+
+    if (filterType === "estoque_baixo") {
+      return { estoque_baixo: 1 };
+    } else if (filterType === "vencidos") {
+      return { validade_ate: formatar(new Date(hoje.getTime() - dia)) };
+    } else if (filterType === "proximos_vencimento") {
+      return {
+        validade_de: formatar(new Date(hoje.getTime() + dia)),
+        validade_ate: formatar(new Date(hoje.getTime() + 30 * dia))
+      };
+    }
+    return {};
+  };
 
+  const fetchPagina = async (cursor) => {
+    const params = { ...getFiltrosServidor(), limite: 50, incluir_total: cursor ? 0 : 1 };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await axios.get("http://localhost:5000/materiaisList", { params });
+    return response.data;
+  };
+
+  const fetchMateriais = async (mostrarLoading = true) => {
+    try {
+      if (mostrarLoading) setLoading(true);
+      const data = await fetchPagina(null);
+      setMateriais(data.materiais);
+      setProximoCursor(data.proximo_cursor);
+      setTotalMateriais(data.total);
+      setErro("");
+    } catch (err) {
+      console.error(err);
+      setErro("Erro ao carregar os materiais. Tente novamente.");
+    } finally {
+      if (mostrarLoading) setLoading(false);
+    }
+  };
+
+  const fetchStats = () => {
+    axios.get("http://localhost:5000/materiais/stats")
+      .then((response) => setStats(response.data))
+      .catch((err) => console.error(err));
+  };
+
+  useEffect(() => {
     fetchMateriais();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [filterType]);
+
+  useEffect(() => {
+    fetchStats();
   }, []);
 
+  // Alterações feitas em outras telas ou por outros usuários: atualiza só
+  // os materiais alterados; inclusões mudam a ordem e recarregam a lista
+  useAlteracoes(["materiais"], async (alteracoes) => {
+    fetchStats();
+    if (alteracoes === null || alteracoes.some(a => a.id === null || a.operacao === "criacao")) {
+      fetchMateriais(false);
+      return;
+    }
+
+    const excluidos = new Set(alteracoes.filter(a => a.operacao === "exclusao").map(a => a.id));
+    const carregados = new Set(materiais.map(m => m.id));
+    const alterados = [...new Set(alteracoes.map(a => a.id))]
+      .filter(id => carregados.has(id) && !excluidos.has(id));
+
+    const respostas = await Promise.allSettled(
+      alterados.map(id => axios.get(`http://localhost:5000/materiais/${id}`))
+    );
+    const atualizados = {};
+    respostas.forEach((resposta, i) => {
+      if (resposta.status === "fulfilled") {
+        atualizados[alterados[i]] = resposta.value.data;
+      } else if (resposta.reason.response?.status === 404) {
+        excluidos.add(alterados[i]);
+      }
+    });
+
+    setMateriais(prevMateriais => prevMateriais
+      .filter(material => !excluidos.has(material.id))
+      .map(material => (atualizados[material.id] ? { ...material, ...atualizados[material.id] } : material)));
+  });
+
+  // Carrega a próxima página a partir do cursor retornado pelo servidor
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await fetchPagina(proximoCursor);
+      setMateriais(prevMateriais => [...prevMateriais, ...data.materiais]);
+      setProximoCursor(data.proximo_cursor);
+    } catch (err) {
+      console.error(err);
+      alert("Erro ao carregar mais materiais.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Função para filtrar materiais
   const filteredMateriais = materiais.filter(material => {
     const matchesSearch = material.nome.toLowerCase().includes(searchTerm.toLowerCase()) ||
@@ -150,6 +242,7 @@ function MateriaisListPage() {
       
       // Atualiza a lista removendo o material excluído
       setMateriais(prevMateriais => prevMateriais.filter(material => material.id !== materialId));
+      setTotalMateriais(prevTotal => (prevTotal == null ? prevTotal : prevTotal - 1));
       
       // Mostra mensagem de sucesso
       alert("Material excluído com sucesso!");
@@ -283,7 +376,7 @@ function MateriaisListPage() {
                 </svg>
               </div>
               <div className="stat-content">
-                <h3>{materiais.length}</h3>
+                <h3>{totalMateriais ?? materiais.length}</h3>
                 <p>Total de Materiais</p>
               </div>
             </div>
@@ -296,7 +389,7 @@ function MateriaisListPage() {
                 </svg>
               </div>
               <div className="stat-content">
-                <h3>{materiais.filter(m => m.estoque_atual <= m.estoque_minimo).length}</h3>
+                <h3>{stats ? stats.estoqueBaixo : materiais.filter(m => m.estoque_atual <= m.estoque_minimo).length}</h3>
                 <p>Estoque Baixo</p>
               </div>
             </div>
@@ -309,7 +402,7 @@ function MateriaisListPage() {
                 </svg>
               </div>
               <div className="stat-content">
-                <h3>{materiais.filter(m => new Date(m.validade) < new Date()).length}</h3>
+                <h3>{stats ? stats.vencidos : materiais.filter(m => new Date(m.validade) < new Date()).length}</h3>
                 <p>Vencidos</p>
               </div>
             </div>
@@ -321,7 +414,7 @@ function MateriaisListPage() {
                 </svg>
               </div>
               <div className="stat-content">
-                <h3>{materiais.filter(m => {
+                <h3>{stats ? stats.proximosVencimento : materiais.filter(m => {
                   const days = getDaysUntilExpiry(m.validade);
                   return days <= 30 && days > 0;
                 }).length}</h3>
@@ -485,6 +578,13 @@ function MateriaisListPage() {
                 })}
               </div>
             )}
+            {!loading && !erro && proximoCursor && (
+              <div className="load-more-container">
+                <button className="btn-retry" onClick={handleLoadMore} disabled={loadingMore}>
+                  {loadingMore ? "Carregando..." : "Carregar mais"}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </div>